@@ -0,0 +1,132 @@
+"""
+Index des alias d'équipes : résolution O(1) d'un nom vers sa forme canonique
+sur des clés sans casse ni accents, repli approximatif borné par trigrammes et
+détection des équipes citées dans un texte libre.
+
+Utilisé à l'ingestion (load_docs.py) comme à la requête (analyse de question).
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import TEAM_ALIASES
+
+# Apostrophes et tirets sont supprimés : "Côte d'Ivoire" == "cote divoire"
+_JOINERS = re.compile(r"['’`\-]")
+_SEPARATORS = re.compile(r"[^\w]+")
+
+def strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def _fold(text: str) -> str:
+    return strip_accents(text).casefold().replace("œ", "oe")
+
+def normalize_key(text: str) -> str:
+    """Clé de comparaison : sans accents, casse, apostrophes ni ponctuation."""
+    text = _JOINERS.sub("", _fold(text))
+    return " ".join(_SEPARATORS.sub(" ", text).split())
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class AliasIndex:
+    """
+    Table précalculée alias normalisé -> nom canonique.
+    Les codes courts en majuscules (MAR, SEN...) ne sont reconnus dans un
+    texte libre que s'ils y figurent en majuscules.
+    """
+
+    def __init__(self, aliases: Dict[str, List[str]], fuzzy_threshold: float = 0.6,
+                 min_fuzzy_length: int = 4, fuzzy_cache_size: int = 4096):
+        self._aliases = {canonical: list(names) for canonical, names in aliases.items()}
+        self._by_key: Dict[str, str] = {}
+        self._codes: Set[str] = set()
+        self._trigram_index: Dict[str, Set[str]] = defaultdict(set)
+        self.fuzzy_threshold = fuzzy_threshold
+        self.min_fuzzy_length = min_fuzzy_length
+
+        for canonical, names in self._aliases.items():
+            for name in [canonical] + names:
+                key = normalize_key(name)
+                if not key:
+                    continue
+                self._by_key.setdefault(key, canonical)
+                if len(name) <= 3 and name.isupper():
+                    self._codes.add(key)
+                for gram in _trigrams(key):
+                    self._trigram_index[gram].add(key)
+
+        self.max_ngram = max((len(k.split()) for k in self._by_key), default=1)
+        self._fuzzy = lru_cache(maxsize=fuzzy_cache_size)(self._fuzzy_lookup)
+
+    # ------------------------------------------------------------------
+    # Résolution d'un nom
+    # ------------------------------------------------------------------
+
+    def canonical(self, name: str, fuzzy: bool = False) -> Optional[str]:
+        """Nom canonique d'une équipe, ou None si inconnu."""
+        key = normalize_key(name)
+        found = self._by_key.get(key)
+        if found is None and fuzzy and len(key) >= self.min_fuzzy_length:
+            found = self._fuzzy(key)
+        return found
+
+    def aliases(self, canonical: str) -> List[str]:
+        return self._aliases.get(canonical, [])
+
+    def _fuzzy_lookup(self, key: str) -> Optional[str]:
+        """Meilleur alias par similarité de Dice sur les trigrammes, au-dessus du seuil."""
+        grams = _trigrams(key)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for candidate in self._trigram_index.get(gram, ()):
+                shared[candidate] += 1
+
+        best_key, best_score = None, 0.0
+        for candidate, count in shared.items():
+            score = 2 * count / (len(grams) + len(_trigrams(candidate)))
+            if score > best_score:
+                best_key, best_score = candidate, score
+        if best_key is None or best_score < self.fuzzy_threshold:
+            return None
+        return self._by_key[best_key]
+
+    # ------------------------------------------------------------------
+    # Détection dans un texte libre
+    # ------------------------------------------------------------------
+
+    def find_in_text(self, text: str, fuzzy: bool = False) -> List[str]:
+        """Équipes citées dans un texte, dans l'ordre d'apparition, sans doublon."""
+        tokens: List[Tuple[str, str]] = []
+        for raw in _SEPARATORS.sub(" ", _JOINERS.sub("", strip_accents(text))).split():
+            tokens.append((raw, _fold(raw)))
+
+        found: List[str] = []
+        i = 0
+        while i < len(tokens):
+            match = None
+            # Plus longue correspondance d'abord ("guinee equatoriale" avant "guinee")
+            for size in range(min(self.max_ngram, len(tokens) - i), 0, -1):
+                key = " ".join(norm for _, norm in tokens[i:i + size])
+                canonical = self._by_key.get(key)
+                if canonical is not None and key in self._codes and not tokens[i][0].isupper():
+                    canonical = None
+                if canonical is None and fuzzy and size == 1 and len(key) >= self.min_fuzzy_length + 1:
+                    canonical = self._fuzzy(key)
+                if canonical is not None:
+                    match = (canonical, size)
+                    break
+            if match:
+                if match[0] not in found:
+                    found.append(match[0])
+                i += match[1]
+            else:
+                i += 1
+        return found
+
+# Index partagé construit une seule fois à l'import
+TEAM_INDEX = AliasIndex(TEAM_ALIASES)
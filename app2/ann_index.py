@@ -0,0 +1,120 @@
+"""
+Choix du type d'index FAISS (exact ou approximatif) à la construction et
+paramètres de recherche appliqués au chargement.
+
+    flat   recherche exacte (IndexFlatL2), référence
+    hnsw   graphe HNSW, vecteurs complets (IndexHNSWFlat)
+    ivfpq  listes inversées + quantification produit (IndexIVFPQ), compact
+    sq8    quantification scalaire 8 bits (IndexScalarQuantizer), 4x plus petit
+
+Les paramètres effectifs sont enregistrés dans le manifeste (clé "index") :
+efSearch (HNSW) n'est pas sérialisé par FAISS et doit être ré-appliqué.
+"""
+import math
+from typing import Dict, Optional
+
+import numpy as np
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq", "sq8")
+FLAT_SETTINGS = {"type": "flat"}
+
+# FAISS recommande au moins 39 points d'entraînement par centroïde
+_MIN_POINTS_PER_CENTROID = 39
+
+def _faiss():
+    import faiss
+    return faiss
+
+def effective_settings(config: Dict, count: int, dim: int) -> Dict:
+    """
+    Paramètres réellement utilisables pour `count` vecteurs de dimension `dim`.
+    IVF-PQ a besoin d'assez de points pour entraîner ses centroïdes : en
+    dessous, repli sur la recherche exacte.
+    """
+    index_type = config.get("type", "flat")
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Type d'index inconnu : {index_type} (attendu : {', '.join(INDEX_TYPES)})")
+
+    if index_type == "hnsw":
+        return {"type": "hnsw", "m": config["hnsw_m"], "ef_construction": config["hnsw_ef_construction"],
+                "ef_search": config["hnsw_ef_search"]}
+    if index_type == "sq8":
+        return {"type": "sq8"}
+    if index_type == "ivfpq":
+        nlist = config["ivf_nlist"] or int(4 * math.sqrt(count))
+        nlist = max(1, min(nlist, count // _MIN_POINTS_PER_CENTROID))
+        bits = min(8, int(math.log2(max(1, count // _MIN_POINTS_PER_CENTROID))))
+        pq_m = config["pq_m"]
+        if nlist < 2 or bits < 4 or dim % pq_m:
+            print(f"⚠️ IVF-PQ impossible avec {count} vecteurs (dim {dim}, pq_m {pq_m}) : index exact.")
+            return dict(FLAT_SETTINGS)
+        return {"type": "ivfpq", "nlist": nlist, "nprobe": min(config["ivf_nprobe"], nlist),
+                "pq_m": pq_m, "pq_bits": bits}
+    return dict(FLAT_SETTINGS)
+
+def build_index(vectors: np.ndarray, settings: Dict):
+    """Construit et remplit l'index FAISS décrit par `settings` (positions = ordre des vecteurs)."""
+    faiss = _faiss()
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    dim = vectors.shape[1]
+    index_type = settings["type"]
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, settings["m"])
+        index.hnsw.efConstruction = settings["ef_construction"]
+    elif index_type == "ivfpq":
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, settings["nlist"],
+                                 settings["pq_m"], settings["pq_bits"])
+        index.train(vectors)
+    elif index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+        index.train(vectors)
+    else:
+        index = faiss.IndexFlatL2(dim)
+    index.add(vectors)
+    apply_search_settings(index, settings)
+    return index
+
+def read_index(path: str, mmap: bool = False):
+    """
+    Lit index.faiss. Avec `mmap`, les codes des vecteurs (flat, sq8, stockage
+    de HNSW) restent dans le fichier mappé en lecture seule (IO_FLAG_MMAP_IFC,
+    FAISS >= 1.10) : le cache de pages du système les partage entre les
+    workers au lieu d'une copie privée par processus. Les listes IVF-PQ,
+    compactes, sont toujours lues en mémoire.
+    """
+    faiss = _faiss()
+    if mmap:
+        flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+        if flag is not None:
+            return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+        print(f"⚠️ FAISS {faiss.__version__} ne sait pas mapper l'index : lecture en mémoire")
+    return faiss.read_index(path)
+
+def apply_search_settings(index, settings: Optional[Dict]):
+    """Ré-applique les paramètres de recherche non sérialisés par FAISS."""
+    if not settings:
+        return
+    faiss = _faiss()
+    if isinstance(index, faiss.IndexHNSW) and "ef_search" in settings:
+        index.hnsw.efSearch = settings["ef_search"]
+    if isinstance(index, faiss.IndexIVF) and "nprobe" in settings:
+        index.nprobe = settings["nprobe"]
+
+def search_subset(index, query: np.ndarray, k: int, ids: np.ndarray):
+    """
+    Recherche restreinte aux positions `ids`. HNSW filtre mal les petits
+    sous-ensembles (le graphe peut ne pas les atteindre) : la recherche se fait
+    alors sur ses vecteurs stockés, exacte. IVF parcourt toutes ses listes,
+    seuls les candidats sont évalués.
+    """
+    faiss = _faiss()
+    selector = faiss.IDSelectorBatch(ids)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+        params = faiss.SearchParameters(sel=selector)
+    elif isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=index.nlist)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    return index.search(query, k, params=params)
@@ -0,0 +1,184 @@
+"""
+Cache de réponses à deux niveaux devant la chaîne RAG :
+  1. exact    : question normalisée (casse, accents, ponctuation)
+  2. sémantique : similarité cosinus entre l'embedding de la question et
+                  ceux des questions déjà servies, à signature égale
+                  (mêmes entités, mêmes nombres)
+Éviction LRU + TTL, plafond mémoire, invalidation au changement d'index.
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable, List, Optional
+
+import numpy as np
+
+from metrics import REGISTRY
+
+CACHE_LOOKUPS = REGISTRY.counter(
+    "rag_cache_lookups_total", "Consultations du cache de réponses", ["tier", "result"]
+)
+CACHE_EVICTIONS = REGISTRY.counter(
+    "rag_cache_evictions_total", "Entrées retirées du cache de réponses", ["reason"]
+)
+
+def normalize_query(query: str) -> str:
+    """Clé exacte : minuscules, sans accents ni ponctuation, espaces compactés."""
+    text = unicodedata.normalize("NFKD", query.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w]+", " ", text)
+    return " ".join(text.split())
+
+def query_numbers(query: str) -> tuple:
+    """Nombres cités (années, numéros de match, scores) : deux questions proches
+    qui n'en citent pas les mêmes n'ont pas la même réponse."""
+    return tuple(re.findall(r"\d+", normalize_query(query)))
+
+@dataclass
+class CacheEntry:
+    key: str
+    answer: str
+    vector: Optional[np.ndarray]
+    created_at: float
+    size: int
+    signature: Hashable = None
+
+class AnswerCache:
+    """
+    Cache LRU + TTL des réponses, avec recherche sémantique sur les embeddings.
+    `signature(query)` résume ce qui distingue deux questions voisines
+    (entités, nombres) : un succès sémantique exige la même signature.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float,
+                 semantic_threshold: float, index_version: str = "",
+                 clock: Callable[[], float] = time.monotonic,
+                 signature: Callable[[str], Hashable] = query_numbers):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self.index_version = index_version
+        self._clock = clock
+        self._signature = signature
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Matrice des embeddings (normalisés) reconstruite à la demande
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def get_exact(self, query: str) -> Optional[str]:
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._lookup(key)
+        CACHE_LOOKUPS.inc(tier="exact", result="hit" if entry else "miss")
+        return entry.answer if entry else None
+
+    def get_semantic(self, vector, query: str) -> Optional[str]:
+        """Réponse la plus proche de `vector` parmi celles de même signature que `query`."""
+        query_vector = self._normalize_vector(vector)
+        signature = self._signature(query)
+        entry = None
+        with self._lock:
+            matrix, keys = self._semantic_matrix()
+            if matrix is not None:
+                scores = matrix @ query_vector
+                # « match 2 » ne doit pas servir la réponse de « match 1 », si proches soient-elles
+                for i, key in enumerate(keys):
+                    if self._entries[key].signature != signature:
+                        scores[i] = -np.inf
+                best = int(np.argmax(scores))
+                if scores[best] >= self.semantic_threshold:
+                    entry = self._lookup(keys[best])
+        CACHE_LOOKUPS.inc(tier="semantic", result="hit" if entry else "miss")
+        return entry.answer if entry else None
+
+    def _lookup(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._clock() - entry.created_at > self.ttl_seconds:
+            self._remove(key, reason="ttl")
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _semantic_matrix(self):
+        if self._matrix is None:
+            keys = [k for k, e in self._entries.items() if e.vector is not None]
+            if not keys:
+                return None, []
+            self._matrix = np.stack([self._entries[k].vector for k in keys])
+            self._matrix_keys = keys
+        return self._matrix, self._matrix_keys
+
+    # ------------------------------------------------------------------
+    # Écriture et éviction
+    # ------------------------------------------------------------------
+
+    def put(self, query: str, answer: str, vector=None, index_version: Optional[str] = None):
+        """`index_version` : version qui a produit la réponse, ignorée si l'index a changé depuis."""
+        if index_version is not None and index_version != self.index_version:
+            return
+        key = normalize_query(query)
+        vec = self._normalize_vector(vector) if vector is not None else None
+        signature = self._signature(query) if vec is not None else None
+        size = len(key.encode("utf-8")) + len(answer.encode("utf-8")) + (vec.nbytes if vec is not None else 0)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, reason="replaced")
+            self._entries[key] = CacheEntry(key, answer, vec, self._clock(), size, signature)
+            self._bytes += size
+            self._matrix = None
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)), reason="lru")
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)), reason="memory")
+
+    def _remove(self, key: str, reason: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        self._matrix = None
+        if reason != "replaced":
+            CACHE_EVICTIONS.inc(reason=reason)
+
+    def set_index_version(self, version: str):
+        """Vide le cache si l'index FAISS a changé : les réponses ne sont plus fiables."""
+        with self._lock:
+            if version == self.index_version:
+                return
+            self.index_version = version
+            for key in list(self._entries):
+                self._remove(key, reason="index_version")
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key, reason="cleared")
+
+    # ------------------------------------------------------------------
+    # Utilitaires
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _normalize_vector(vector) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
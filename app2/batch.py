@@ -0,0 +1,98 @@
+"""
+Traitement par lots pour /chat/batch : dédoublonnage des questions et suivi
+des lots exécutés en tâche de fond (jobs interrogés par polling).
+
+Les jobs sont gardés en mémoire du processus : un lot soumis à un worker
+doit être suivi sur ce même worker.
+"""
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from answer_cache import normalize_query
+
+def dedupe_queries(queries: List[str]) -> Tuple[List[str], List[int]]:
+    """
+    Questions distinctes (même clé que le cache exact : casse, accents et
+    ponctuation ignorés) et, pour chaque question reçue, l'indice de sa
+    question distincte.
+    """
+    unique: List[str] = []
+    seen: Dict[str, int] = {}
+    positions = []
+    for query in queries:
+        key = normalize_query(query)
+        if key not in seen:
+            seen[key] = len(unique)
+            unique.append(query)
+        positions.append(seen[key])
+    return unique, positions
+
+@dataclass
+class BatchJob:
+    """Lot exécuté en arrière-plan. États : pending -> running -> done | failed."""
+    id: str
+    total: int
+    status: str = "pending"
+    completed: int = 0
+    results: Optional[List[Dict]] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def as_dict(self) -> Dict:
+        payload = {"job_id": self.id, "status": self.status, "total": self.total, "completed": self.completed}
+        if self.error:
+            payload["error"] = self.error
+        if self.results is not None:
+            payload["results"] = self.results
+        return payload
+
+class BatchJobStore:
+    """
+    Jobs en mémoire ; les jobs terminés sont oubliés après `ttl_seconds` et
+    les plus anciens au-delà de `max_jobs`.
+    """
+
+    def __init__(self, max_jobs: int = 100, ttl_seconds: float = 3600,
+                 clock: Callable[[], float] = time.time):
+        self.max_jobs = max_jobs
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._jobs: Dict[str, BatchJob] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def create(self, total: int) -> BatchJob:
+        job = BatchJob(id=uuid.uuid4().hex, total=total, created_at=self._clock())
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def finish(self, job: BatchJob, results: Optional[List[Dict]] = None, error: Optional[str] = None):
+        job.results = results
+        job.error = error
+        job.status = "failed" if error else "done"
+        job.finished_at = self._clock()
+
+    def _prune(self):
+        now = self._clock()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and now - job.finished_at > self.ttl_seconds]
+        for job_id in expired:
+            del self._jobs[job_id]
+        # Les plus anciens d'abord (ordre d'insertion), jamais un job en cours
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at is not None]:
+            if len(self._jobs) < self.max_jobs:
+                break
+            del self._jobs[job_id]
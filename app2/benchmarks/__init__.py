@@ -0,0 +1,4 @@
+"""
+Benchmarks de performance du pipeline RAG CAN 2025.
+À lancer depuis app2 : python -m benchmarks.<nom>
+"""
@@ -0,0 +1,75 @@
+"""
+Comparaison des types d'index FAISS (ann_index.py) sur des vecteurs
+synthétiques regroupés en thèmes, à la dimension de MiniLM : temps de
+construction, taille sur disque, latence p50/p99 d'une requête et
+recall@20 par rapport à la recherche exacte. Lancer depuis app2 :
+
+    python -m benchmarks.ann --n 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from ann_index import INDEX_TYPES, build_index, effective_settings
+from config import INDEX_CONFIG
+
+def clustered_vectors(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Vecteurs normalisés autour de `clusters` centres (documents d'un même thème)."""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def disk_size(index) -> int:
+    import faiss
+    fd, path = tempfile.mkstemp(suffix=".faiss")
+    os.close(fd)
+    try:
+        faiss.write_index(index, path)
+        return os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des types d'index FAISS")
+    parser.add_argument("--n", type=int, default=100000, help="nombre de vecteurs indexés")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(2025)
+    vectors = clustered_vectors(args.n, args.dim, clusters=max(8, args.n // 500), rng=rng)
+    queries = vectors[rng.integers(0, args.n, args.queries)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    print(f"\n🧭 {args.n} vecteurs de dimension {args.dim}, {args.queries} requêtes, recall@{args.k}\n")
+    print(f"{'Index':<8}{'Construction':<15}{'Disque':<12}{'p50':<11}{'p99':<11}{'Recall@' + str(args.k)}")
+    print("-" * 68)
+    truth = None
+    for index_type in ["flat"] + [t for t in args.types if t != "flat"]:
+        settings = effective_settings({**INDEX_CONFIG, "type": index_type}, args.n, args.dim)
+        start = time.perf_counter()
+        index = build_index(vectors, settings)
+        build_s = time.perf_counter() - start
+
+        latencies, results = [], []
+        for query in queries:
+            start = time.perf_counter()
+            _, ids = index.search(query[None, :], args.k)
+            latencies.append(time.perf_counter() - start)
+            results.append(set(ids[0].tolist()))
+        if truth is None:
+            truth = results
+        recall = np.mean([len(r & t) / args.k for r, t in zip(results, truth)])
+
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        print(f"{settings['type']:<8}{build_s:<15.2f}{disk_size(index) / 2**20:<12.1f}"
+              f"{p50:<11.3f}{p99:<11.3f}{recall:.3f}")
+    print("\n(construction en s, disque en Mo, latences en ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Lot de questions (/chat/batch) vs la même charge question par question, avec
+un LLM simulé : dédoublonnage, encodage en un lot, recherche FAISS
+multi-requêtes puis générations via abatch bornées par la concurrence. Le
+lot rejoue le jeu de questions annotées plusieurs fois (doublons inclus).
+Lancer depuis app2 :
+
+    python -m benchmarks.batch --repeat 4 --concurrency 8
+"""
+import argparse
+import asyncio
+import time
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+from batch import dedupe_queries
+from benchmarks.fixtures import load_benchmark_documents
+from benchmarks.retrieval import load_questions
+from benchmarks.stubs import HashingEmbeddings, StubChatModel
+from context_packing import ContextPacker
+from lexical_index import BM25Index
+from query_encoder import CachedEmbeddings
+from retrieval import HybridRetriever
+
+PROMPT = ChatPromptTemplate.from_template("CONTEXTE :\n{context}\n\nQUESTION :\n{question}")
+
+def build_chain(retriever: HybridRetriever, embeddings, llm):
+    packer = ContextPacker(max_tokens=1500)
+
+    def context(inputs: dict) -> str:
+        docs = inputs.get("docs")
+        if docs is None:
+            docs = retriever.search(inputs["question"], embeddings.embed_query(inputs["question"]))
+        return packer.pack(docs)[0]
+
+    return RunnablePassthrough.assign(context=RunnableLambda(context)) | PROMPT | llm | StrOutputParser()
+
+async def one_by_one(chain, queries) -> None:
+    for query in queries:
+        await chain.ainvoke({"question": query})
+
+async def batched(chain, retriever, embeddings, queries, concurrency: int) -> None:
+    unique, _ = dedupe_queries(queries)
+    vectors = embeddings.embed_queries(unique)
+    docs = retriever.search_batch(unique, vectors)
+    inputs = [{"question": q, "docs": d} for q, d in zip(unique, docs)]
+    await chain.abatch(inputs, config={"max_concurrency": concurrency})
+
+def main():
+    parser = argparse.ArgumentParser(description="Lot de questions vs questions une à une")
+    parser.add_argument("--repeat", type=int, default=4, help="répétitions du jeu de questions")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="latence simulée d'une génération (s)")
+    args = parser.parse_args()
+
+    documents = load_benchmark_documents()
+    queries = [item["question"] for item in load_questions()] * args.repeat
+    retriever = HybridRetriever(FAISS.from_documents(documents, HashingEmbeddings()),
+                                lexical_index=BM25Index.from_documents(documents))
+
+    print(f"\n📚 {len(queries)} questions ({len(dedupe_queries(queries)[0])} distinctes), "
+          f"génération simulée {args.llm_latency * 1000:.0f} ms\n")
+    print(f"{'Mode':<28}{'Durée (s)':<12}{'Appels LLM':<12}{'Questions/s'}")
+    print("-" * 64)
+    for name in ("une à une", f"lot (concurrence {args.concurrency})"):
+        # Encodeur simulé (≈ 2 ms par texte) et cache de vecteurs neufs pour chaque mode
+        embeddings = CachedEmbeddings(HashingEmbeddings(cost=0.002), max_entries=0)
+        llm = StubChatModel(first_token_latency=args.llm_latency, token_latency=0.0, answer_tokens=20)
+        chain = build_chain(retriever, embeddings, llm)
+        start = time.perf_counter()
+        if name == "une à une":
+            asyncio.run(one_by_one(chain, queries))
+        else:
+            asyncio.run(batched(chain, retriever, embeddings, queries, args.concurrency))
+        elapsed = time.perf_counter() - start
+        print(f"{name:<28}{elapsed:<12.2f}{llm.calls:<12}{len(queries) / elapsed:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Coalescence des questions identiques simultanées, avec un LLM simulé.
+
+Des clients posent en rafale quelques questions « chaudes » (loi de Zipf,
+variantes de casse et de ponctuation comprises) pendant qu'elles sont en
+cours de calcul. Compare le nombre d'appels au LLM, la latence et le
+délai avant le premier token sans puis avec coalescence. Lancer depuis
+app2 :
+
+    python -m benchmarks.coalescing --clients 64 --questions 8
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from answer_cache import normalize_query
+from benchmarks.concurrency import build_chain
+from benchmarks.stubs import StubChatModel, StubRetriever
+from coalescing import COALESCED, SingleFlight
+from serving import ConcurrencyLimiter, create_executor
+
+VARIANTS = (str, str.upper, lambda q: q + " ?", lambda q: q.replace(" ", "  "))
+
+def make_queries(clients: int, questions: int, seed: int = 0) -> list:
+    """Questions tirées selon une loi de Zipf, écrites de façons différentes."""
+    rng = random.Random(seed)
+    topics = [f"Qui a marqué en match {i} de la CAN 2025" for i in range(questions)]
+    weights = [1 / (rank + 1) for rank in range(questions)]
+    return [rng.choice(VARIANTS)(rng.choices(topics, weights)[0]) for _ in range(clients)]
+
+async def run_burst(chain, queries: list, limiter: ConcurrencyLimiter, coalesce: bool,
+                    spread: float) -> dict:
+    """Un client par question, arrivées réparties sur `spread` secondes."""
+    flights = SingleFlight()
+    latencies, ttfts = [], []
+
+    async def produce(query, publish):
+        try:
+            tokens = []
+            async for token in chain.astream(query):
+                tokens.append(token)
+                await publish(token)
+            return "".join(tokens)
+        finally:
+            limiter.release()
+
+    async def client(query: str, delay: float):
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        key = normalize_query(query) if coalesce else None
+        # Même protocole que rag_chain.answer_flight : clé réservée avant l'attente du limiteur
+        flight = flights.join(key)
+        if flight is None:
+            flight = flights.reserve(key)
+            await limiter.acquire()
+            flights.run(flight, lambda publish: produce(query, publish))
+        first = None
+        async for _ in flight.stream():
+            if first is None:
+                first = time.perf_counter() - start
+        latencies.append(time.perf_counter() - start)
+        ttfts.append(first)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(q, random.uniform(0, spread)) for q in queries))
+    return {"elapsed": time.perf_counter() - start, "latencies": latencies, "ttfts": ttfts}
+
+def percentile(samples: list, q: float) -> float:
+    ms = sorted(s * 1000 for s in samples)
+    return ms[min(len(ms) - 1, int(len(ms) * q))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Coalescence des questions identiques (LLM simulé)")
+    parser.add_argument("--clients", type=int, default=64, help="questions simultanées")
+    parser.add_argument("--questions", type=int, default=8, help="questions distinctes")
+    parser.add_argument("--spread", type=float, default=0.2, help="étalement des arrivées (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="délai avant le premier token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    args = parser.parse_args()
+
+    queries = make_queries(args.clients, args.questions)
+    executor = create_executor(8, name="bench-retrieval")
+    print(f"\n🔁 {args.clients} questions ({len({normalize_query(q) for q in queries})} distinctes) "
+          f"arrivées sur {args.spread * 1000:.0f} ms, LLM {args.llm_latency * 1000:.0f} ms, "
+          f"{args.max_in_flight} calculs simultanés\n")
+    print(f"{'Mode':<18}{'Appels LLM':<13}{'Durée (s)':<12}{'p50 (ms)':<11}{'p95 (ms)':<11}{'1er token p50'}")
+    print("-" * 78)
+    for coalesce in (False, True):
+        random.seed(1)
+        llm = StubChatModel(first_token_latency=args.llm_latency, token_latency=args.token_latency,
+                            answer_tokens=30)
+        chain = build_chain(StubRetriever(latency=0.01), llm, executor)
+        limiter = ConcurrencyLimiter(max_in_flight=args.max_in_flight, max_queue=args.clients, queue_timeout=60)
+        followers = COALESCED.value(role="follower")
+        result = asyncio.run(run_burst(chain, queries, limiter, coalesce, args.spread))
+        name = "coalescence" if coalesce else "sans"
+        print(f"{name:<18}{llm.calls:<13}{result['elapsed']:<12.2f}{percentile(result['latencies'], 0.5):<11.0f}"
+              f"{percentile(result['latencies'], 0.95):<11.0f}{statistics.median(result['ttfts']) * 1000:.0f}")
+    print(f"\nTaux de coalescence : {(COALESCED.value(role='follower') - followers) / len(queries):.0%}")
+    executor.shutdown()
+
+if __name__ == "__main__":
+    main()
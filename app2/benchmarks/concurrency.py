@@ -0,0 +1,95 @@
+"""
+Benchmark de charge du chemin /chat avec un LLM simulé.
+
+Compare l'ancien chemin (invoke synchrone dans la boucle d'événements) au
+chemin concurrent (ainvoke + pool de threads + limiteur) pour plusieurs
+niveaux de concurrence. Lancer depuis app2 :
+
+    python -m benchmarks.concurrency
+"""
+import argparse
+import asyncio
+import time
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+from benchmarks.stubs import StubChatModel, StubRetriever
+from serving import ConcurrencyLimiter, ServerBusy, create_executor, run_in_pool
+
+PROMPT = ChatPromptTemplate.from_template("CONTEXTE :\n{context}\n\nQUESTION :\n{question}")
+
+def format_docs(docs):
+    return "\n\n".join(d.page_content for d in docs)
+
+def build_chain(retriever: StubRetriever, llm: StubChatModel, executor):
+    async def aretrieve(query):
+        return await run_in_pool(executor, retriever.invoke, query)
+
+    return (
+        {"context": RunnableLambda(retriever.invoke, afunc=aretrieve) | format_docs,
+         "question": RunnablePassthrough()}
+        | PROMPT
+        | llm
+        | StrOutputParser()
+    )
+
+async def run_load(chain, concurrency: int, total: int, use_async: bool, limiter=None) -> dict:
+    """Lance `total` questions réparties sur `concurrency` clients simultanés."""
+    remaining = iter(range(total))
+    rejected = 0
+
+    async def client():
+        nonlocal rejected
+        for i in remaining:
+            query = f"Question {i}"
+            try:
+                if limiter is not None:
+                    async with limiter.slot():
+                        await chain.ainvoke(query)
+                elif use_async:
+                    await chain.ainvoke(query)
+                else:
+                    # Ancien comportement : appel bloquant dans la coroutine
+                    chain.invoke(query)
+            except ServerBusy:
+                rejected += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"elapsed": elapsed, "throughput": (total - rejected) / elapsed, "rejected": rejected}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de concurrence /chat (LLM simulé)")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--search-latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    args = parser.parse_args()
+
+    llm = StubChatModel(first_token_latency=args.llm_latency, token_latency=0.0)
+    retriever = StubRetriever(latency=args.search_latency)
+    executor = create_executor(args.workers, name="bench-retrieval")
+    chain = build_chain(retriever, llm, executor)
+
+    print(f"🔬 {args.requests} questions, LLM {args.llm_latency * 1000:.0f} ms, "
+          f"recherche {args.search_latency * 1000:.0f} ms, {args.workers} threads\n")
+    print(f"{'Clients':<10}{'Bloquant (q/s)':<18}{'Concurrent (q/s)':<20}{'Rejets 429'}")
+    print("-" * 60)
+
+    for level in args.levels:
+        limiter = ConcurrencyLimiter(max_in_flight=args.max_in_flight, max_queue=args.requests,
+                                     queue_timeout=60)
+        blocking = asyncio.run(run_load(chain, level, args.requests, use_async=False))
+        concurrent = asyncio.run(run_load(chain, level, args.requests, use_async=True, limiter=limiter))
+        print(f"{level:<10}{blocking['throughput']:<18.1f}{concurrent['throughput']:<20.1f}"
+              f"{concurrent['rejected']}")
+
+    executor.shutdown()
+
+if __name__ == "__main__":
+    main()
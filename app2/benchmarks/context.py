@@ -0,0 +1,64 @@
+"""
+Assemblage du contexte (context_packing.py) sur le jeu de questions annotées :
+tokens de contexte avant/après et part des entités attendues (match, équipe,
+joueur) encore présentes dans le contexte, pour plusieurs budgets. Lancer
+depuis app2 :
+
+    python -m benchmarks.context --fake --budget 0 1500 1000 600
+"""
+import argparse
+import statistics
+
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.fixtures import load_benchmark_documents
+from benchmarks.retrieval import load_questions
+from benchmarks.stubs import HashingEmbeddings
+from config import CONTEXT_CONFIG, EMBEDDING_MODEL
+from context_packing import ContextPacker, entity_key
+from lexical_index import BM25Index
+from retrieval import HybridRetriever
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokens de contexte avant/après assemblage")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--budget", type=int, nargs="+", default=[0, 1500, 1000, 600],
+                        help="budgets de tokens (0 = sans limite)")
+    parser.add_argument("--fake", action="store_true", help="embeddings simulés au lieu de MiniLM")
+    args = parser.parse_args()
+
+    if args.fake:
+        embedding = HashingEmbeddings()
+    else:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embedding = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+    documents = load_benchmark_documents()
+    by_id = {doc.id: doc for doc in documents}
+    retriever = HybridRetriever(FAISS.from_documents(documents, embedding), k=args.k, filtered_k=args.k,
+                                lexical_index=BM25Index.from_documents(documents))
+    questions = load_questions()
+    hits = [retriever.search(item["question"], embedding.embed_query(item["question"])) for item in questions]
+
+    print(f"\n📦 {len(questions)} questions, k={args.k}\n")
+    print(f"{'Budget':<9}{'Docs avant':<12}{'Docs après':<12}{'Tokens avant':<15}"
+          f"{'Tokens après':<15}{'Max après':<11}{'Entités gardées'}")
+    print("-" * 90)
+    for budget in args.budget:
+        packer = ContextPacker(budget, CONTEXT_CONFIG["dedup_threshold"])
+        stats, coverage = [], []
+        for item, docs in zip(questions, hits):
+            _, packed = packer.pack(docs)
+            stats.append(packed)
+            # Entités attendues et retrouvées : combien survivent à l'assemblage
+            expected = {entity_key(by_id[i]) for i in item["expected"]} & {entity_key(d) for d in docs}
+            kept = {entity_key(doc) for doc, _ in packer.select(docs)}
+            coverage.append(len(expected & kept) / len(expected) if expected else 1.0)
+        print(f"{budget or '∞':<9}{statistics.mean(s.documents_in for s in stats):<12.1f}"
+              f"{statistics.mean(s.documents_out for s in stats):<12.1f}"
+              f"{statistics.mean(s.tokens_in for s in stats):<15.0f}"
+              f"{statistics.mean(s.tokens_out for s in stats):<15.0f}"
+              f"{max(s.tokens_out for s in stats):<11}{statistics.mean(coverage):.2f}")
+
+if __name__ == "__main__":
+    main()
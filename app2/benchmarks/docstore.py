@@ -0,0 +1,114 @@
+"""
+Mémoire résidente et temps de chargement de l'index : ancien docstore picklé
+(index.pkl) vs docstore mappé (docstore.py). Chaque mesure tourne dans un
+processus neuf ; `--scale` duplique les documents de l'index livré pour
+simuler plusieurs éditions. Lancer depuis app2 :
+
+    python -m benchmarks.docstore --scale 1 20
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from langchain_core.documents import Document
+
+from config import INDEX_DIR
+from index_store import active_index_dir
+
+def rss_mb() -> float:
+    """Mémoire résidente courante (Linux), sinon le pic du processus."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def child(mode: str, index_dir: str):
+    """
+    Mesure exécutée dans le processus enfant : chargement du docstore seul
+    (les vecteurs FAISS sont identiques dans les deux formats) puis lecture
+    de 20 documents.
+    """
+    import pickle
+    from langchain_community.docstore.in_memory import InMemoryDocstore  # classes du pickle
+    from docstore import MmapDocstore
+
+    before = rss_mb()
+    start = time.perf_counter()
+    if mode == "pickle":
+        with open(os.path.join(index_dir, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+    else:
+        docstore = MmapDocstore(index_dir)
+        index_to_docstore_id = dict(enumerate(docstore.ids))
+    load_s = time.perf_counter() - start
+    for position in range(min(20, len(index_to_docstore_id))):
+        docstore.search(index_to_docstore_id[position])
+    print(json.dumps({"load_s": load_s, "rss_mb": rss_mb() - before}))
+
+def build_scaled_index(source_dir: str, target_dir: str, scale: int):
+    """Copie de l'index livré avec chaque document répété `scale` fois, dans les deux formats."""
+    import faiss
+    import numpy as np
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from benchmarks.fixtures import load_benchmark_documents
+    from benchmarks.stubs import HashingEmbeddings
+    from docstore import save_vector_store
+
+    documents = load_benchmark_documents()
+    source = faiss.read_index(os.path.join(source_dir, "index.faiss"))
+    vectors = np.tile(source.reconstruct_n(0, source.ntotal), (scale, 1))
+    copies = [Document(id=f"{doc.id}@{edition}", page_content=doc.page_content, metadata=doc.metadata)
+              for edition in range(scale) for doc in documents]
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors[:len(copies)])
+    vector_db = FAISS(HashingEmbeddings(), index, InMemoryDocstore({d.id: d for d in copies}),
+                      {position: d.id for position, d in enumerate(copies)})
+    vector_db.save_local(target_dir)
+    save_vector_store(vector_db, target_dir)
+
+def measure(mode: str, index_dir: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.docstore", "--child", mode, index_dir],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Docstore picklé vs mappé : RSS et temps de chargement")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 20])
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "INDEX_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    print(f"\n💾 Chargement du docstore : index.pkl vs docstore mappé\n")
+    print(f"{'Échelle':<10}{'Documents':<12}{'Format':<10}{'Chargement':<14}{'RSS ajoutée'}")
+    print("-" * 60)
+    for scale in args.scale:
+        work_dir = tempfile.mkdtemp(prefix="docstore-bench-")
+        try:
+            build_scaled_index(active_index_dir(INDEX_DIR), work_dir, scale)
+            with open(os.path.join(work_dir, "docstore.json"), "r", encoding="utf-8") as f:
+                count = len(json.load(f)["ids"])
+            for mode in ("pickle", "mmap"):
+                r = measure(mode, work_dir)
+                print(f"{scale:<10}{count:<12}{mode:<10}{r['load_s'] * 1000:<14.0f}{r['rss_mb']:.1f} Mo")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    print("\n(chargement en ms ; RSS ajoutée = mémoire résidente après chargement du docstore et lecture de 20 documents)")
+
+if __name__ == "__main__":
+    main()
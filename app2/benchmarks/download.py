@@ -0,0 +1,89 @@
+"""
+Téléchargement de l'index (download_faiss.py) depuis un stockage simulé :
+dossier local avec une latence par fichier et un débit plafonné par flux,
+comme un bucket distant. Compare un seul flux au pool parallèle, puis
+mesure une mise à jour d'un seul fichier et la reprise après une
+interruption. Lancer depuis app2 :
+
+    python -m benchmarks.download --files 24 --size-mb 4 --workers 8
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from download_faiss import LocalBackend, RemoteObject, fetch_index
+
+class SlowBackend(LocalBackend):
+    """Dossier local avec latence et débit d'un stockage distant ; peut échouer après n fichiers."""
+
+    def __init__(self, root: str, latency: float, mb_per_second: float, fail_after: int = 0):
+        super().__init__(root)
+        self.latency = latency
+        self.mb_per_second = mb_per_second
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def download(self, obj: RemoteObject, dest: str):
+        self.calls += 1
+        if self.fail_after and self.calls > self.fail_after:
+            raise ConnectionError("Connexion interrompue (simulée)")
+        time.sleep(self.latency + obj.size / 1e6 / self.mb_per_second)
+        super().download(obj, dest)
+
+def write_remote(root: str, files: int, size_mb: float):
+    os.makedirs(root, exist_ok=True)
+    for i in range(files):
+        with open(os.path.join(root, f"part-{i:03d}.bin"), "wb") as f:
+            f.write(os.urandom(int(size_mb * 1e6)))
+
+def run(backend, index_dir: str, workers: int) -> dict:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fetch_index(backend, index_dir, workers=workers)
+
+def report(name: str, stats: dict):
+    print(f"{name:<26}{stats['seconds']:<11.2f}{stats['downloaded']:<14}{stats['unchanged']:<11}"
+          f"{stats['resumed']:<8}{stats['bytes'] / 1e6 / max(stats['seconds'], 1e-9):.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Téléchargement parallèle et reprise de l'index")
+    parser.add_argument("--files", type=int, default=24)
+    parser.add_argument("--size-mb", type=float, default=4.0)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="latence par fichier (s)")
+    parser.add_argument("--stream-mbps", type=float, default=50.0, help="débit d'un flux (Mo/s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        remote = os.path.join(tmp, "bucket")
+        write_remote(remote, args.files, args.size_mb)
+
+        def backend(**kwargs):
+            return SlowBackend(remote, args.latency, args.stream_mbps, **kwargs)
+
+        print(f"\n📦 {args.files} fichiers de {args.size_mb} Mo, latence {args.latency * 1000:.0f} ms, "
+              f"{args.stream_mbps} Mo/s par flux\n")
+        print(f"{'Scénario':<26}{'Durée (s)':<11}{'Téléchargés':<14}{'Inchangés':<11}{'Repris':<8}{'Mo/s'}")
+        print("-" * 78)
+        report("1 flux", run(backend(), os.path.join(tmp, "seq"), workers=1))
+        index_dir = os.path.join(tmp, "index")
+        report(f"{args.workers} flux", run(backend(), index_dir, workers=args.workers))
+        report("déjà à jour", run(backend(), index_dir, workers=args.workers))
+
+        with open(os.path.join(remote, "part-000.bin"), "wb") as f:
+            f.write(os.urandom(int(args.size_mb * 1e6)))
+        report("1 fichier modifié", run(backend(), index_dir, workers=args.workers))
+
+        # Interruption à mi-parcours puis reprise : l'index publié reste intact
+        resumed_dir = os.path.join(tmp, "resume")
+        try:
+            run(backend(fail_after=args.files // 2), resumed_dir, workers=1)
+        except ConnectionError:
+            pass
+        assert not os.path.exists(resumed_dir), "index partiel publié"
+        report("reprise après coupure", run(backend(), resumed_dir, workers=args.workers))
+
+if __name__ == "__main__":
+    main()
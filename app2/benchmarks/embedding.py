@@ -0,0 +1,50 @@
+"""
+Benchmark de l'étape d'embedding de l'indexation : documents/seconde avec un
+cache de vecteurs froid puis chaud, pour plusieurs nombres de processus.
+Lancer depuis app2 :
+
+    python -m benchmarks.embedding            # vrai modèle MiniLM
+    python -m benchmarks.embedding --fake     # embeddings simulés, sans modèle
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+from benchmarks.fixtures import load_benchmark_documents
+from benchmarks.stubs import hashing_factory
+from config import EMBEDDING_MODEL
+from embedding_pipeline import BatchEmbedder, huggingface_factory
+
+def run_once(texts, cache_dir: str, workers: int, batch_size: int, factory) -> float:
+    embedder = BatchEmbedder(EMBEDDING_MODEL, batch_size=batch_size, workers=workers,
+                             cache_dir=cache_dir, factory=factory)
+    start = time.perf_counter()
+    embedder.embed_documents(texts)
+    return len(texts) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark d'embedding (cache froid / chaud)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--fake", action="store_true", help="embeddings simulés au lieu de MiniLM")
+    args = parser.parse_args()
+
+    texts = [d.page_content for d in load_benchmark_documents()]
+    factory = hashing_factory if args.fake else huggingface_factory
+    print(f"\n🔬 {len(texts)} documents, lots de {args.batch_size}, "
+          f"modèle {'simulé' if args.fake else EMBEDDING_MODEL}\n")
+    print(f"{'Processus':<12}{'Froid (docs/s)':<18}{'Chaud (docs/s)'}")
+    print("-" * 45)
+
+    for workers in args.workers:
+        cache_dir = tempfile.mkdtemp(prefix="embedding-bench-")
+        try:
+            cold = run_once(texts, cache_dir, workers, args.batch_size, factory)
+            warm = run_once(texts, cache_dir, workers, args.batch_size, factory)
+        finally:
+            shutil.rmtree(cache_dir)
+        print(f"{workers:<12}{cold:<18.0f}{warm:.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Serveur LLM factice compatible OpenAI (/v1/chat/completions, streaming SSE
+ou réponse complète) pour éprouver llm_client.py sans clé API. Il injecte
+une latence avant le premier token, une queue de latence (réponses
+lentes), des erreurs 503 et des requêtes bloquées. Lancer depuis app2 :
+
+    python -m benchmarks.fake_llm --port 8090 --latency 0.3 --slow-rate 0.05 --error-rate 0.1
+    RAG_LLM_PROVIDER=http RAG_LLM_BASE_URL=http://127.0.0.1:8090/v1 python rag_chain.py
+
+POST /control modifie les pannes à chaud (ex: {"error_rate": 1.0}) ;
+GET /stats compte les appels reçus.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+FAULTS = ("latency", "token_latency", "tokens", "slow_rate", "slow_factor", "error_rate", "hang_rate")
+
+def answer_tokens(messages: list, count: int) -> list:
+    """Réponse déterministe dérivée du dernier message, comme StubChatModel."""
+    words = str(messages[-1]["content"] if messages else "").split() or ["réponse"]
+    return [f"{words[i % len(words)]} " for i in range(count)]
+
+def usage(messages: list, count: int) -> dict:
+    prompt_tokens = sum(len(str(m["content"])) for m in messages) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": count, "total_tokens": prompt_tokens + count}
+
+def create_app(faults: dict):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI()
+    stats = {"calls": 0, "errors": 0, "hangs": 0, "slow": 0}
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        stats["calls"] += 1
+        draw = random.random()
+        if draw < faults["error_rate"]:
+            stats["errors"] += 1
+            return JSONResponse(status_code=503, content={"error": {"message": "overloaded (injecté)"}})
+        if draw < faults["error_rate"] + faults["hang_rate"]:
+            # Requête bloquée : le client doit abandonner de lui-même
+            stats["hangs"] += 1
+            await asyncio.sleep(3600)
+        delay = faults["latency"]
+        if random.random() < faults["slow_rate"]:
+            stats["slow"] += 1
+            delay *= faults["slow_factor"]
+        messages, count = body.get("messages", []), int(faults["tokens"])
+        tokens = answer_tokens(messages, count)
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(delay + faults["token_latency"] * count)
+            return {"id": "fake", "object": "chat.completion", "created": created, "model": body.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                                 "finish_reason": "stop"}],
+                    "usage": usage(messages, count)}
+
+        async def events():
+            await asyncio.sleep(delay)
+            for token in tokens:
+                chunk = {"id": "fake", "object": "chat.completion.chunk", "created": created,
+                         "choices": [{"index": 0, "delta": {"content": token}}]}
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(faults["token_latency"])
+            final = {"id": "fake", "object": "chat.completion.chunk", "created": created,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                     "usage": usage(messages, count)}
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/control")
+    async def control(request: Request):
+        changes = await request.json()
+        faults.update({k: float(v) for k, v in changes.items() if k in FAULTS})
+        return faults
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur LLM factice avec pannes injectées")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.3, help="délai avant le premier token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.005)
+    parser.add_argument("--tokens", type=int, default=40, help="tokens par réponse")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="part des réponses lentes")
+    parser.add_argument("--slow-factor", type=float, default=10.0, help="multiplicateur de latence des réponses lentes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="part des réponses 503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="part des requêtes sans réponse")
+    args = parser.parse_args()
+
+    import uvicorn
+    faults = {name: float(getattr(args, name)) for name in FAULTS}
+    # Arrêt sans attendre les requêtes bloquées (--hang-rate)
+    uvicorn.run(create_app(faults), host="127.0.0.1", port=args.port, log_level="warning",
+                timeout_graceful_shutdown=1)
+
+if __name__ == "__main__":
+    main()
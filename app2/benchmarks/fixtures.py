@@ -0,0 +1,31 @@
+"""
+Jeu de documents pour les benchmarks : les vraies données JSON si elles sont
+présentes, sinon les documents déjà stockés dans l'index FAISS livré.
+"""
+import os
+import pickle
+from typing import List
+
+from langchain_core.documents import Document
+
+from config import DATA_FOLDER, INDEX_DIR
+from docstore import MmapDocstore, has_docstore
+from index_store import active_index_dir
+from load_docs import assign_document_ids, load_all_can2025_data
+
+def load_benchmark_documents() -> List[Document]:
+    if os.path.isdir(DATA_FOLDER):
+        return load_all_can2025_data()
+
+    index_dir = active_index_dir(INDEX_DIR)
+    if has_docstore(index_dir):
+        store = MmapDocstore(index_dir)
+        documents = [store.search(doc_id) for doc_id in store.ids]
+        return assign_document_ids([Document(page_content=d.page_content, metadata=d.metadata) for d in documents])
+
+    # Repli : le docstore picklé de l'index contient tous les Documents
+    with open(os.path.join(index_dir, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    documents = [docstore.search(doc_id) for _, doc_id in sorted(index_to_docstore_id.items())]
+    documents = [Document(page_content=d.page_content, metadata=dict(d.metadata)) for d in documents]
+    return assign_document_ids(documents)
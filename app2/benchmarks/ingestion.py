@@ -0,0 +1,58 @@
+"""
+Micro-benchmark de l'ingestion (load_docs.py) sur des tournois synthétiques
+de taille croissante. Compare la jointure par tables précalculées à
+l'ancienne recherche séquentielle par équipe. Lancer depuis app2 :
+
+    python -m benchmarks.ingestion --scales 1 10
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from benchmarks.synthetic import generate_tournament
+from load_docs import build_team_tables, load_all_can2025_data, normalize_team_name, process_teams
+
+def legacy_team_tables(data_sources) -> dict:
+    """Ancienne jointure : trois recherches séquentielles par équipe (O(équipes²))."""
+    def find(rows, key, name):
+        return next((r for r in rows if normalize_team_name(r.get(key, '')) == name), {})
+
+    tables = {}
+    for team in data_sources['teams']:
+        name = normalize_team_name(team.get('Equipe', ''))
+        tables[name] = {
+            'team': find(data_sources['teams'], 'Equipe', name),
+            'coach': find(data_sources['coaches'], 'pays', name),
+            'squad': find(data_sources['squads'], 'team', name)
+        }
+    return tables
+
+def timed(func, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark d'ingestion sur données synthétiques")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    args = parser.parse_args()
+
+    print(f"{'Échelle':<9}{'Équipes':<9}{'Docs':<8}{'Ingestion':<12}{'Jointure tables':<17}{'Jointure séquentielle'}")
+    print("-" * 78)
+    for scale in args.scales:
+        data = generate_tournament(scale)
+        with contextlib.redirect_stdout(io.StringIO()):
+            n_docs = len(load_all_can2025_data(data))
+        total = timed(load_all_can2025_data, data)
+        joined = timed(lambda d: list(process_teams(d['teams'], build_team_tables(d))), data)
+        legacy = timed(lambda d: list(process_teams(d['teams'], legacy_team_tables(d))), data)
+        print(f"{scale:<9}{len(data['teams']):<9}{n_docs:<8}{total * 1000:<12.1f}"
+              f"{joined * 1000:<17.1f}{legacy * 1000:.1f}  (ms)")
+
+if __name__ == "__main__":
+    main()
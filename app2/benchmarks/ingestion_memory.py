@@ -0,0 +1,105 @@
+"""
+Pic de mémoire (RSS) de l'indexation selon la taille des sources JSON :
+chemin matérialisé (toutes les sources, tous les Documents puis
+FAISS.from_documents) vs construction au fil de l'eau par lots
+(embeddings.stream_index). Chaque mesure tourne dans un processus neuf,
+sur des tournois synthétiques écrits dans un dossier temporaire, avec des
+embeddings hachés (pas de modèle). Lancer depuis app2 :
+
+    python -m benchmarks.ingestion_memory --scales 1 5 20
+
+Les vecteurs FAISS, les postings BM25 et les tables de jointure par équipe
+restent en mémoire dans les deux cas : seul l'écart au chemin matérialisé
+(JSON, Documents et textes) devient indépendant de la taille des sources.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from config import FILES
+
+MODES = ("matérialisé", "par lots")
+
+def peak_rss_mb() -> float:
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def write_sources(scale: int, folder: str) -> int:
+    """Écrit un tournoi synthétique au format de config.FILES ; retourne la taille en octets."""
+    from benchmarks.synthetic import generate_tournament
+    data = generate_tournament(scale)
+    size = 0
+    for name, filename in FILES.items():
+        path = os.path.join(folder, filename)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data[name], f, ensure_ascii=False, indent=2)
+        size += os.path.getsize(path)
+    return size
+
+def build(mode: str, folder: str, batch_size: int) -> dict:
+    """Indexation complète de `folder` dans un dossier jetable (processus enfant)."""
+    from benchmarks.stubs import HashingEmbeddings
+    from docstore import save_vector_store
+    from embeddings import stream_index
+    from langchain_community.vectorstores import FAISS
+    from lexical_index import BM25Index
+    from load_docs import iter_can2025_documents, load_all_can2025_data, load_json_file
+
+    baseline = peak_rss_mb()
+    embeddings = HashingEmbeddings()
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as output, contextlib.redirect_stdout(io.StringIO()):
+        if mode == "matérialisé":
+            data = {name: load_json_file(filename, folder) for name, filename in FILES.items()}
+            documents = load_all_can2025_data(data)
+            save_vector_store(FAISS.from_documents(documents, embeddings), output)
+            BM25Index.from_documents(documents).save(output)
+            count = len(documents)
+        else:
+            hashes, _ = stream_index(iter_can2025_documents(folder=folder, verbose=False),
+                                     embeddings, output, batch_size)
+            count = len(hashes)
+    return {"documents": count, "seconds": time.perf_counter() - start,
+            "baseline_mb": baseline, "peak_mb": peak_rss_mb()}
+
+def measure(mode: str, folder: str, batch_size: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.ingestion_memory", "--child", mode,
+         "--folder", folder, "--batch-size", str(batch_size)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Pic de mémoire de l'indexation selon la taille des sources")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--batch-size", type=int, default=512, help="documents par lot (chemin par lots)")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--folder", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(build(args.child, args.folder, args.batch_size)))
+        return
+
+    print(f"\n{'Échelle':<9}{'Sources':<11}{'Docs':<8}{'Mode':<14}{'Durée (s)':<11}"
+          f"{'Pic RSS (Mo)':<14}{'Hors imports (Mo)'}")
+    print("-" * 84)
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as folder:
+            size = write_sources(scale, folder)
+            for mode in MODES:
+                r = measure(mode, folder, args.batch_size)
+                print(f"{scale:<9}{size / 1e6:<11.1f}{r['documents']:<8}{mode:<14}{r['seconds']:<11.2f}"
+                      f"{r['peak_mb']:<14.0f}{r['peak_mb'] - r['baseline_mb']:.0f}")
+
+if __name__ == "__main__":
+    main()
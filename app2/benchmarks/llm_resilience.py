@@ -0,0 +1,120 @@
+"""
+Client LLM résilient (llm_client.py) face au serveur factice
+benchmarks/fake_llm.py, lancé dans un processus enfant. Pour chaque
+scénario de panne, compare le délai seul (une tentative) au client complet
+(couverture, nouvelles tentatives, disjoncteur) : réponses obtenues,
+appels qui passeraient en mode dégradé, latence et appels reçus par le
+fournisseur. Lancer depuis app2 :
+
+    python -m benchmarks.llm_resilience --requests 200 --concurrency 16
+"""
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+
+SCENARIOS = {
+    "nominal": {},
+    "queue lente 5 %": {"slow_rate": 0.05},
+    "erreurs 20 %": {"error_rate": 0.2},
+    "blocages 5 %": {"hang_rate": 0.05},
+    "panne": {"error_rate": 1.0},
+}
+NO_FAULTS = {"slow_rate": 0.0, "error_rate": 0.0, "hang_rate": 0.0}
+
+def wait_server(url: str, timeout: float = 30):
+    import requests
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            requests.get(f"{url}/stats", timeout=1).raise_for_status()
+            return
+        except requests.RequestException:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Serveur factice injoignable après {timeout:.0f} s")
+            time.sleep(0.2)
+
+def upstream_calls(url: str) -> int:
+    import requests
+    return requests.get(f"{url}/stats", timeout=5).json()["calls"]
+
+async def run_load(llm, requests_count: int, concurrency: int) -> dict:
+    from llm_client import LLMUnavailable
+
+    remaining = iter(range(requests_count))
+    latencies, unavailable = [], 0
+
+    async def client():
+        nonlocal unavailable
+        for i in remaining:
+            start = time.perf_counter()
+            try:
+                await llm.ainvoke(f"Question {i} sur la CAN 2025")
+                latencies.append(time.perf_counter() - start)
+            except LLMUnavailable:
+                unavailable += 1
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    await llm.provider.aclose()
+    return {"ok": len(latencies), "unavailable": unavailable, "latencies": latencies}
+
+def percentile(samples: list, q: float) -> float:
+    if not samples:
+        return float("nan")
+    ms = sorted(s * 1000 for s in samples)
+    return ms[min(len(ms) - 1, int(len(ms) * q))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Client LLM résilient face à un serveur factice")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--latency", type=float, default=0.2, help="délai avant le premier token (s)")
+    parser.add_argument("--deadline", type=float, default=3.0, help="budget d'un appel (s)")
+    parser.add_argument("--hedge-delay", type=float, default=0.5)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    args = parser.parse_args()
+
+    import requests
+    from config import LLM_CONFIG
+    from llm_client import create_llm
+
+    url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.fake_llm", "--port", str(args.port),
+                               "--latency", str(args.latency)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    config = {**LLM_CONFIG, "provider": "http", "base_url": f"{url}/v1", "model": "fake",
+              "deadline": args.deadline, "pool_size": args.concurrency}
+    modes = {
+        "délai seul": {**config, "hedge_delay": 0, "max_attempts": 1, "breaker_failures": 10 ** 9},
+        "résilient": {**config, "hedge_delay": args.hedge_delay}
+    }
+    try:
+        wait_server(url)
+        print(f"\n🧪 {args.requests} appels, {args.concurrency} simultanés, premier token "
+              f"{args.latency * 1000:.0f} ms, budget {args.deadline:.1f} s, couverture après "
+              f"{args.hedge_delay * 1000:.0f} ms\n")
+        print(f"{'Scénario':<18}{'Mode':<13}{'Réponses':<10}{'Dégradées':<11}{'p50 (ms)':<10}"
+              f"{'p99 (ms)':<10}{'Appels reçus'}")
+        print("-" * 84)
+        for name in args.scenarios:
+            requests.post(f"{url}/control", json={**NO_FAULTS, **SCENARIOS[name]}, timeout=5)
+            for mode, mode_config in modes.items():
+                before = upstream_calls(url)
+                result = asyncio.run(run_load(create_llm(mode_config), args.requests, args.concurrency))
+                calls = upstream_calls(url) - before
+                print(f"{name:<18}{mode:<13}{result['ok']:<10}{result['unavailable']:<11}"
+                      f"{percentile(result['latencies'], 0.5):<10.0f}{percentile(result['latencies'], 0.99):<10.0f}"
+                      f"{calls}")
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            # Requêtes bloquées encore en cours : arrêt forcé pour libérer le port
+            server.kill()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
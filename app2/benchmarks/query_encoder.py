@@ -0,0 +1,95 @@
+"""
+Encodage des questions : sentence-transformers (PyTorch) vs ONNX float32 vs
+ONNX int8 (query_encoder.py). Chaque encodeur est mesuré dans un processus
+neuf : latence par question (p50/p99), latence servie par le cache LRU, RSS
+du processus une fois le modèle chargé et, par rapport à PyTorch, similarité
+cosinus minimale des vecteurs. L'export ONNX doit exister
+(`python query_encoder.py export`). Lancer depuis app2 :
+
+    python -m benchmarks.query_encoder
+    python -m benchmarks.query_encoder --encoders onnx onnx-int8
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.docstore import rss_mb
+from benchmarks.retrieval import load_questions
+from config import EMBEDDING_CONFIG, EMBEDDING_MODEL
+
+ENCODERS = {
+    "torch": {"backend": "torch"},
+    "onnx": {"backend": "onnx", "onnx_int8": False},
+    "onnx-int8": {"backend": "onnx", "onnx_int8": True}
+}
+
+def child(encoder: str):
+    """Mesure exécutée dans le processus enfant ; vecteurs renvoyés pour la parité."""
+    from query_encoder import CachedEmbeddings, create_embeddings
+
+    questions = [item["question"] for item in load_questions()]
+    start = time.perf_counter()
+    embeddings = CachedEmbeddings(create_embeddings(EMBEDDING_MODEL, {**EMBEDDING_CONFIG, **ENCODERS[encoder]}))
+    embeddings.embed_query("préchauffage")
+    load_s = time.perf_counter() - start
+
+    vectors, latencies, cached = [], [], []
+    for question in questions:
+        start = time.perf_counter()
+        vectors.append(embeddings.embed_query(question))
+        latencies.append(time.perf_counter() - start)
+    for question in questions:
+        start = time.perf_counter()
+        embeddings.embed_query(question)
+        cached.append(time.perf_counter() - start)
+    print(json.dumps({
+        "load_s": load_s,
+        "rss_mb": rss_mb(),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "cached_us": float(np.median(cached) * 1e6),
+        "vectors": vectors
+    }))
+
+def measure(encoder: str):
+    result = subprocess.run([sys.executable, "-m", "benchmarks.query_encoder", "--child", encoder],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"⚠️ {encoder} indisponible : {result.stderr.strip().splitlines()[-1]}")
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Latence et mémoire de l'encodage des questions")
+    parser.add_argument("--encoders", nargs="+", default=list(ENCODERS), choices=ENCODERS)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    results = {encoder: measure(encoder) for encoder in args.encoders}
+    reference = results.get("torch")
+    print(f"\n⚡ {len(load_questions())} questions, modèle {EMBEDDING_MODEL}\n")
+    print(f"{'Encodeur':<12}{'Chargement':<13}{'p50':<10}{'p99':<10}{'Cache':<11}"
+          f"{'RSS':<11}{'Cosinus min vs torch'}")
+    print("-" * 88)
+    for encoder, r in results.items():
+        if r is None:
+            continue
+        parity = "-"
+        if reference is not None and encoder != "torch":
+            a, b = np.asarray(reference["vectors"]), np.asarray(r["vectors"])
+            cosines = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+            parity = f"{cosines.min():.4f}"
+        print(f"{encoder:<12}{r['load_s']:<13.2f}{r['p50_ms']:<10.2f}{r['p99_ms']:<10.2f}"
+              f"{r['cached_us']:<11.1f}{r['rss_mb']:<11.0f}{parity}")
+    print("\n(chargement en s, latences en ms, cache en µs, RSS du processus en Mo)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Évaluation de la recherche sur un jeu de questions annotées
+(benchmarks/questions.json) : rappel@k, tokens de contexte et latence de
+recherche pour la recherche dense seule, la fusion dense + BM25 et le
+pré-filtrage par métadonnées. Lancer depuis app2 :
+
+    python -m benchmarks.retrieval            # vrai modèle MiniLM
+    python -m benchmarks.retrieval --fake     # embeddings simulés
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.fixtures import load_benchmark_documents
+from benchmarks.stubs import HashingEmbeddings
+from config import EMBEDDING_MODEL
+from lexical_index import BM25Index
+from retrieval import HybridRetriever, estimate_tokens
+
+QUESTIONS_FILE = os.path.join(os.path.dirname(__file__), "questions.json")
+
+def load_questions(path: str = QUESTIONS_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def evaluate(retriever: HybridRetriever, vectors, questions) -> dict:
+    """Rappel (fraction des documents attendus retrouvés), tokens et latence moyens."""
+    recalls, tokens, latencies = [], [], []
+    for item, vector in zip(questions, vectors):
+        start = time.perf_counter()
+        docs = retriever.search(item["question"], vector)
+        latencies.append(time.perf_counter() - start)
+        found = {d.id for d in docs}
+        recalls.append(len(found & set(item["expected"])) / len(item["expected"]))
+        tokens.append(sum(estimate_tokens(d.page_content) for d in docs))
+    return {
+        "recall": statistics.mean(recalls),
+        "tokens": statistics.mean(tokens),
+        "latency_ms": statistics.median(latencies) * 1000
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Évaluation dense vs BM25 vs pré-filtrage par métadonnées")
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--fake", action="store_true", help="embeddings simulés au lieu de MiniLM")
+    args = parser.parse_args()
+
+    if args.fake:
+        embedding = HashingEmbeddings()
+    else:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embedding = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+    documents = load_benchmark_documents()
+    vector_db = FAISS.from_documents(documents, embedding)
+    lexical_index = BM25Index.from_documents(documents)
+    questions = load_questions()
+    vectors = [embedding.embed_query(item["question"]) for item in questions]
+
+    modes = {
+        "dense": dict(metadata_filter=False),
+        "dense + BM25": dict(metadata_filter=False, lexical_index=lexical_index),
+        "filtré": dict(),
+        "filtré + BM25": dict(lexical_index=lexical_index)
+    }
+    print(f"\n🔬 {len(questions)} questions annotées, {len(documents)} documents\n")
+    print(f"{'Mode':<16}{'k':<5}{'Rappel':<10}{'Tokens contexte':<18}{'Latence p50'}")
+    print("-" * 60)
+    for name, params in modes.items():
+        for k in args.k:
+            retriever = HybridRetriever(vector_db, k=k, filtered_k=k, **params)
+            r = evaluate(retriever, vectors, questions)
+            print(f"{name:<16}{k:<5}{r['recall']:<10.2f}{r['tokens']:<18.0f}{r['latency_ms']:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark du streaming SSE avec un LLM simulé.
+
+Mesure séparément le délai avant le premier octet (TTFB) et la latence
+totale, pour la réponse bloquante (/chat) et la réponse streamée
+(/chat/stream). Lancer depuis app2 :
+
+    python -m benchmarks.streaming
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.concurrency import build_chain
+from benchmarks.stubs import StubChatModel, StubRetriever
+from serving import create_executor, sse_event
+
+async def measure_blocking(chain, query: str) -> tuple:
+    start = time.perf_counter()
+    await chain.ainvoke(query)
+    total = time.perf_counter() - start
+    # Réponse JSON unique : le premier octet arrive avec la réponse complète
+    return total, total
+
+async def measure_streaming(chain, query: str) -> tuple:
+    start = time.perf_counter()
+    ttfb = None
+    async for token in chain.astream(query):
+        if token:
+            sse_event({"token": token}, event="token")
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+    sse_event({}, event="done")
+    total = time.perf_counter() - start
+    return ttfb if ttfb is not None else total, total
+
+def summarize(samples: list) -> str:
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    return f"p50 {statistics.median(ms):7.1f} ms   p95 {p95:7.1f} ms"
+
+async def run(chain, runs: int):
+    results = {}
+    for name, measure in (("bloquant", measure_blocking), ("streaming", measure_streaming)):
+        ttfbs, totals = [], []
+        for i in range(runs):
+            ttfb, total = await measure(chain, f"Question {i}")
+            ttfbs.append(ttfb)
+            totals.append(total)
+        results[name] = (ttfbs, totals)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TTFB vs latence totale (LLM simulé)")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--first-token", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    parser.add_argument("--tokens", type=int, default=60)
+    args = parser.parse_args()
+
+    llm = StubChatModel(first_token_latency=args.first_token, token_latency=args.token_latency,
+                        answer_tokens=args.tokens)
+    executor = create_executor(4, name="bench-retrieval")
+    chain = build_chain(StubRetriever(latency=0.02), llm, executor)
+
+    results = asyncio.run(run(chain, args.runs))
+    print(f"🔬 {args.runs} questions, premier token {args.first_token * 1000:.0f} ms, "
+          f"{args.tokens} tokens × {args.token_latency * 1000:.0f} ms\n")
+    for name, (ttfbs, totals) in results.items():
+        print(f"{name:<10} TTFB   : {summarize(ttfbs)}")
+        print(f"{'':<10} Total  : {summarize(totals)}\n")
+
+    executor.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Routeur d'intentions (structured_qa.py) sur le jeu de questions annotées :
+part des questions servies sans LLM et latence du chemin structuré. Utilise
+les vraies données JSON si elles sont présentes, sinon un tournoi
+synthétique. Lancer depuis app2 :
+
+    python -m benchmarks.structured
+"""
+import contextlib
+import io
+import os
+import statistics
+import time
+from collections import Counter
+
+from benchmarks.retrieval import load_questions
+from benchmarks.synthetic import generate_tournament
+from config import DATA_FOLDER
+from load_docs import load_data_sources
+from structured_qa import IntentRouter, TournamentIndex
+
+def main():
+    if os.path.isdir(DATA_FOLDER):
+        with contextlib.redirect_stdout(io.StringIO()):
+            data_sources = load_data_sources()
+        label = "données réelles"
+    else:
+        data_sources = generate_tournament()
+        label = "tournoi synthétique"
+
+    start = time.perf_counter()
+    router = IntentRouter(TournamentIndex(data_sources))
+    build_ms = (time.perf_counter() - start) * 1000
+
+    questions = [item["question"] for item in load_questions()]
+    intents, latencies = Counter(), []
+    for question in questions:
+        start = time.perf_counter()
+        answer = router.route(question)
+        latencies.append(time.perf_counter() - start)
+        intents[answer.intent if answer else "rag"] += 1
+
+    served = len(questions) - intents["rag"]
+    print(f"\n⚡ Routeur d'intentions ({label}, index construit en {build_ms:.1f} ms)\n")
+    print(f"Questions servies sans LLM : {served}/{len(questions)}")
+    for intent, count in intents.most_common():
+        print(f"  {intent:<12}{count}")
+    print(f"Latence de routage : p50 {statistics.median(latencies) * 1000:.2f} ms, "
+          f"max {max(latencies) * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
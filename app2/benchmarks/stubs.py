@@ -0,0 +1,163 @@
+"""
+Doublures déterministes pour les benchmarks : LLM local sans appel réseau,
+retriever à latence contrôlée et embeddings sans modèle. Aucune clé API ni
+modèle n'est nécessaire.
+"""
+import asyncio
+import hashlib
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# ============================================================================
+# LLM LOCAL
+# ============================================================================
+
+class StubChatModel(BaseChatModel):
+    """
+    Chat model déterministe simulant Gemini : un délai avant le premier token
+    puis un délai par token. La réponse est dérivée du prompt reçu.
+    """
+
+    first_token_latency: float = 0.2
+    token_latency: float = 0.01
+    answer_tokens: int = 40
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def _answer_tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = messages[-1].content if messages else ""
+        words = str(prompt).split() or ["réponse"]
+        return [f"{words[i % len(words)]} " for i in range(self.answer_tokens)]
+
+    def _usage(self, messages: List[BaseMessage]) -> dict:
+        """Usage de tokens au format de Gemini (≈ 4 caractères par token de prompt)."""
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+        return {"input_tokens": prompt_tokens, "output_tokens": self.answer_tokens,
+                "total_tokens": prompt_tokens + self.answer_tokens}
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self.calls += 1
+        tokens = self._answer_tokens(messages)
+        time.sleep(self.first_token_latency + self.token_latency * len(tokens))
+        message = AIMessage(content="".join(tokens), usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self.calls += 1
+        tokens = self._answer_tokens(messages)
+        await asyncio.sleep(self.first_token_latency + self.token_latency * len(tokens))
+        message = AIMessage(content="".join(tokens), usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        self.calls += 1
+        time.sleep(self.first_token_latency)
+        for token in self._answer_tokens(messages):
+            time.sleep(self.token_latency)
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages)))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        self.calls += 1
+        await asyncio.sleep(self.first_token_latency)
+        for token in self._answer_tokens(messages):
+            await asyncio.sleep(self.token_latency)
+            if run_manager:
+                await run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages)))
+
+# ============================================================================
+# RETRIEVER À LATENCE CONTRÔLÉE
+# ============================================================================
+
+class StubRetriever:
+    """
+    Simule l'embedding + la recherche FAISS : appel bloquant (libère le GIL
+    comme les noyaux natifs) qui renvoie k documents fixes.
+    """
+
+    def __init__(self, latency: float = 0.02, k: int = 20):
+        self.latency = latency
+        self.k = k
+
+    def invoke(self, query: str) -> List[Document]:
+        time.sleep(self.latency)
+        return [
+            Document(page_content=f"Document {i} pour : {query}", metadata={"source": "stub.json"})
+            for i in range(self.k)
+        ]
+
+# ============================================================================
+# EMBEDDINGS DÉTERMINISTES
+# ============================================================================
+
+class HashingEmbeddings(Embeddings):
+    """
+    Embeddings déterministes sans modèle : sac de trigrammes haché, normalisé.
+    `cost` ajoute un calcul CPU par texte (en secondes) pour simuler MiniLM.
+    """
+
+    def __init__(self, size: int = 384, cost: float = 0.0):
+        self.size = size
+        self.cost = cost
+
+    def _vector(self, text: str) -> List[float]:
+        vec = np.zeros(self.size, dtype=np.float32)
+        padded = f"  {text.lower()}  "
+        for i in range(len(padded) - 2):
+            digest = hashlib.md5(padded[i:i + 3].encode("utf-8")).digest()
+            vec[int.from_bytes(digest[:4], "little") % self.size] += 1.0
+        if self.cost:
+            deadline = time.perf_counter() + self.cost
+            while time.perf_counter() < deadline:
+                pass
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+def hashing_factory(model_name: str) -> Embeddings:
+    """Fabrique picklable pour BatchEmbedder (≈ 2 ms de calcul par texte)."""
+    return HashingEmbeddings(cost=0.002)
@@ -0,0 +1,297 @@
+"""
+Suite de référence hors ligne du pipeline RAG, à relancer avant et après un
+changement de découpage (load_docs.py), de recherche ou d'encodeur :
+
+1. ingestion des sources JSON (tournoi synthétique à l'échelle voulue, ou
+   documents de l'index livré avec benchmarks/questions.json) ;
+2. construction de l'index FAISS (type INDEX_CONFIG) et de l'index BM25 ;
+3. recherche (HybridRetriever, RETRIEVAL_CONFIG) : latence p50/p95/p99,
+   rappel@k et MRR sur un jeu de questions annotées ;
+4. bout en bout via rag_chain (prompt, assemblage du contexte) avec un LLM
+   local déterministe : latence par étape et débit sous concurrence.
+
+Le rapport JSON (`--output`) se compare à un rapport précédent
+(`--baseline`) ; le code de sortie est 1 si une métrique régresse au-delà de
+`--tolerance`. Lancer depuis app2 :
+
+    python -m benchmarks.suite --scale 4 --output bench.json
+    python -m benchmarks.suite --scale 4 --baseline bench.json
+    python -m benchmarks.suite --dataset fixture --encoder model
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from ann_index import build_index, effective_settings
+from benchmarks.fixtures import load_benchmark_documents
+from benchmarks.retrieval import load_questions
+from benchmarks.stubs import HashingEmbeddings, StubChatModel
+from benchmarks.synthetic import generate_tournament, labeled_questions
+from config import EMBEDDING_CONFIG, EMBEDDING_MODEL, INDEX_CONFIG, RETRIEVAL_CONFIG
+from lexical_index import BM25Index
+from load_docs import load_all_can2025_data
+from query_encoder import CachedEmbeddings, create_embeddings, encoder_id
+from retrieval import HybridRetriever
+from tracing import RequestTrace
+
+# Métriques comparées à la référence : True si plus grand est meilleur
+TRACKED = {
+    "ingestion.seconds": False,
+    "index.build_seconds": False,
+    "retrieval.p50_ms": False,
+    "retrieval.p95_ms": False,
+    "retrieval.p99_ms": False,
+    "retrieval.mrr": True,
+    "end_to_end.p50_ms": False,
+    "end_to_end.p95_ms": False,
+    "end_to_end.p99_ms": False
+}
+
+def percentiles(seconds: List[float]) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(seconds, [50, 95, 99]) * 1000
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+def quiet(func, *args):
+    """Durée et résultat de `func`, sans les messages de progression."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args)
+    return time.perf_counter() - start, result
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+# ============================================================================
+# ÉTAPES
+# ============================================================================
+
+def ingest(dataset: str, scale: int):
+    """Documents, questions annotées et durée de l'ingestion."""
+    if dataset == "synthetic":
+        data = generate_tournament(scale)
+        seconds, documents = quiet(load_all_can2025_data, data)
+        return documents, labeled_questions(documents, limit=100), seconds
+    seconds, documents = quiet(load_benchmark_documents)
+    return documents, load_questions(), seconds
+
+def build_indexes(documents, embeddings) -> Dict:
+    start = time.perf_counter()
+    vector_db = FAISS.from_documents(documents, embeddings)
+    embed_seconds = time.perf_counter() - start
+    flat = vector_db.index
+    settings = effective_settings(INDEX_CONFIG, flat.ntotal, flat.d)
+    if settings["type"] != "flat":
+        vector_db.index = build_index(flat.reconstruct_n(0, flat.ntotal), settings)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lexical_index = BM25Index.from_documents(documents)
+    lexical_seconds = time.perf_counter() - start
+    retriever = HybridRetriever(
+        vector_db,
+        k=RETRIEVAL_CONFIG["k"],
+        filtered_k=RETRIEVAL_CONFIG["filtered_k"],
+        metadata_filter=RETRIEVAL_CONFIG["metadata_filter"],
+        lexical_index=lexical_index if RETRIEVAL_CONFIG["lexical"] else None,
+        rrf_k=RETRIEVAL_CONFIG["rrf_k"]
+    )
+    return {"retriever": retriever, "settings": settings, "embed_seconds": embed_seconds,
+            "build_seconds": build_seconds, "lexical_seconds": lexical_seconds}
+
+def evaluate_retrieval(retriever: HybridRetriever, embeddings, questions, ks: List[int]) -> Dict:
+    """Latence de l'encodage et de la recherche, rappel@k et MRR (rang du premier document attendu)."""
+    encode, search, reciprocal_ranks = [], [], []
+    recalls = {k: [] for k in ks}
+    for item in questions:
+        start = time.perf_counter()
+        vector = embeddings.embed_query(item["question"])
+        encode.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        docs = retriever.search(item["question"], vector)
+        search.append(time.perf_counter() - start)
+
+        ranking = [d.id for d in docs]
+        expected = set(item["expected"])
+        for k in ks:
+            recalls[k].append(len(expected & set(ranking[:k])) / len(expected))
+        rank = next((i + 1 for i, doc_id in enumerate(ranking) if doc_id in expected), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    result = percentiles(search)
+    result["encode_p50_ms"] = float(np.median(encode) * 1000)
+    result.update({f"recall@{k}": float(np.mean(values)) for k, values in recalls.items()})
+    result["mrr"] = float(np.mean(reciprocal_ranks))
+    return result
+
+async def run_end_to_end(chain, questions, concurrency: int) -> Dict:
+    """Toutes les questions réparties sur `concurrency` clients ; traces par question."""
+    remaining = iter(questions)
+    traces: List[RequestTrace] = []
+    latencies: List[float] = []
+
+    async def client():
+        for item in remaining:
+            trace = RequestTrace("benchmark", request_id=str(len(traces)))
+            traces.append(trace)
+            start = time.perf_counter()
+            await chain.ainvoke({"question": item["question"], "context_stats": {}, "trace": trace},
+                                config=trace.llm_config())
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stages = sorted({stage for trace in traces for stage in trace.spans})
+    return {
+        **percentiles(latencies),
+        "throughput_qps": len(questions) / elapsed,
+        "stages_p50_ms": {stage: float(np.median([t.spans.get(stage, 0.0) for t in traces]) * 1000)
+                          for stage in stages},
+        "context_tokens_mean": float(np.mean([t.fields.get("context_tokens_out", 0) for t in traces]))
+    }
+
+# ============================================================================
+# RAPPORT
+# ============================================================================
+
+def metric(report: Dict, path: str):
+    value = report
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Affiche l'écart à la référence et retourne les métriques en régression."""
+    tracked = dict(TRACKED)
+    tracked.update({f"retrieval.{key}": True for key in report["retrieval"] if key.startswith("recall@")})
+    tracked.update({f"throughput.{level}": True for level in report["throughput"]})
+    regressions = []
+    print(f"\n📏 Comparaison avec la référence {baseline['meta'].get('revision', '?')} "
+          f"(tolérance {tolerance:.0%})\n")
+    print(f"{'Métrique':<26}{'Référence':<14}{'Actuel':<14}{'Écart'}")
+    print("-" * 64)
+    for path, higher_is_better in tracked.items():
+        old, new = metric(baseline, path), metric(report, path)
+        if old is None or new is None:
+            continue
+        delta = (new - old) / old if old else 0.0
+        worse = -delta if higher_is_better else delta
+        flag = ""
+        if worse > tolerance:
+            regressions.append(path)
+            flag = "  ❌"
+        print(f"{path:<26}{old:<14.4g}{new:<14.4g}{delta:+.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite de référence hors ligne du pipeline RAG")
+    parser.add_argument("--dataset", choices=["synthetic", "fixture"], default="synthetic",
+                        help="tournoi synthétique ou documents de l'index livré")
+    parser.add_argument("--scale", type=int, default=1, help="éditions du tournoi synthétique")
+    parser.add_argument("--encoder", choices=["hashing", "model"], default="hashing",
+                        help="embeddings simulés ou encodeur configuré (EMBEDDING_CONFIG)")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="délai simulé avant le premier token (s)")
+    parser.add_argument("--output", help="rapport JSON")
+    parser.add_argument("--baseline", help="rapport JSON de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="dégradation relative tolérée")
+    args = parser.parse_args()
+
+    # Import tardif : rag_chain crée l'application FastAPI (sans charger de modèle)
+    import rag_chain as server
+
+    if args.encoder == "hashing":
+        embeddings, encoder = HashingEmbeddings(), "hashing"
+    else:
+        embeddings, encoder = create_embeddings(EMBEDDING_MODEL, EMBEDDING_CONFIG), encoder_id(EMBEDDING_CONFIG)
+
+    documents, questions, ingestion_s = ingest(args.dataset, args.scale)
+    index = build_indexes(documents, embeddings)
+    print(f"\n🏁 {len(documents)} documents, {len(questions)} questions annotées, "
+          f"encodeur {encoder}, index {index['settings']['type']}\n")
+    print(f"Ingestion        {ingestion_s:8.2f} s")
+    print(f"Index FAISS      {index['build_seconds']:8.2f} s  (encodage {index['embed_seconds']:.2f} s)")
+    print(f"Index BM25       {index['lexical_seconds']:8.2f} s")
+
+    retrieval = evaluate_retrieval(index["retriever"], embeddings, questions, args.k)
+    print(f"\n{'Recherche':<12}{'p50':<10}{'p95':<10}{'p99':<10}"
+          + "".join(f"{'R@' + str(k):<8}" for k in args.k) + "MRR")
+    print("-" * (46 + 8 * len(args.k)))
+    print(f"{'':<12}{retrieval['p50_ms']:<10.2f}{retrieval['p95_ms']:<10.2f}{retrieval['p99_ms']:<10.2f}"
+          + "".join(f"{retrieval[f'recall@{k}']:<8.2f}" for k in args.k) + f"{retrieval['mrr']:.3f}")
+
+    # Chaîne du serveur (prompt, assemblage du contexte, traces) avec le LLM local
+    server.embedding_model = CachedEmbeddings(embeddings, max_entries=0)
+    server.hybrid_retriever = index["retriever"]
+    chain = server.build_rag_chain(StubChatModel(first_token_latency=args.llm_latency, token_latency=0.0,
+                                                 answer_tokens=40))
+    end_to_end = asyncio.run(run_end_to_end(chain, questions, concurrency=1))
+    print(f"\nBout en bout   p50 {end_to_end['p50_ms']:.1f} ms, p95 {end_to_end['p95_ms']:.1f} ms, "
+          f"p99 {end_to_end['p99_ms']:.1f} ms (LLM simulé {args.llm_latency * 1000:.0f} ms)")
+    print("Étapes (p50)   " + ", ".join(f"{stage} {ms:.2f} ms"
+                                        for stage, ms in end_to_end["stages_p50_ms"].items()))
+
+    throughput = {}
+    print(f"\n{'Clients':<10}{'Questions/s':<14}{'p95 (ms)'}")
+    print("-" * 34)
+    for level in args.concurrency:
+        result = asyncio.run(run_end_to_end(chain, questions, concurrency=level))
+        throughput[str(level)] = result["throughput_qps"]
+        print(f"{level:<10}{result['throughput_qps']:<14.1f}{result['p95_ms']:.1f}")
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "dataset": args.dataset,
+            "scale": args.scale,
+            "encoder": encoder,
+            "index": index["settings"],
+            "retrieval_config": RETRIEVAL_CONFIG,
+            "documents": len(documents),
+            "questions": len(questions),
+            "llm_latency_s": args.llm_latency
+        },
+        "ingestion": {"seconds": ingestion_s},
+        "index": {"build_seconds": index["build_seconds"], "embed_seconds": index["embed_seconds"],
+                  "lexical_seconds": index["lexical_seconds"]},
+        "retrieval": retrieval,
+        "end_to_end": end_to_end,
+        "throughput": throughput
+    }
+    server.retrieval_executor.shutdown()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Rapport écrit dans {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("dataset") != args.dataset or baseline["meta"].get("scale") != args.scale:
+            print("⚠️ La référence a été mesurée sur un autre jeu de données")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} métrique(s) en régression : {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ Aucune régression")
+
+if __name__ == "__main__":
+    main()
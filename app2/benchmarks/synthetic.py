@@ -0,0 +1,191 @@
+"""
+Générateur de tournois synthétiques au format des sources JSON de
+config.FILES (matchs, équipes, sélectionneurs, effectifs, stades,
+classements). `scale` multiplie le nombre d'équipes, de matchs et de stades
+pour simuler plusieurs éditions de la CAN. `labeled_questions` dérive des
+documents ingérés un jeu de questions annotées pour mesurer la recherche.
+"""
+import random
+from typing import Dict, List
+
+from langchain_core.documents import Document
+
+from config import TEAM_ALIASES
+
+POSITIONS = {"goalkeepers": 3, "defenders": 8, "midfielders": 8, "forwards": 7}
+CLUBS = ["Raja CA", "Wydad AC", "Al Ahly", "Espérance de Tunis", "PSG", "Real Madrid",
+         "Bayern Munich", "Arsenal", "Galatasaray", "Al Hilal", "TP Mazembe", "Mamelodi Sundowns"]
+
+def team_names(scale: int) -> List[str]:
+    base = list(TEAM_ALIASES)
+    names = list(base)
+    for edition in range(2, scale + 1):
+        names.extend(f"{name} (édition {edition})" for name in base)
+    return names
+
+def _player(rng: random.Random, team_index: int, number: int) -> Dict:
+    return {"name": f"Joueur {team_index}-{number}", "club": rng.choice(CLUBS)}
+
+def _goals(rng: random.Random, count: int, team_index: int) -> List[Dict]:
+    return [
+        {"joueur": f"Joueur {team_index}-{rng.randint(1, 26)}", "minute": rng.randint(1, 90),
+         "passe_decisive": f"Joueur {team_index}-{rng.randint(1, 26)}" if rng.random() < 0.6 else None,
+         "type": rng.choice(["normal", "normal", "normal", "penalty", "coup franc"])}
+        for _ in range(count)
+    ]
+
+def generate_tournament(scale: int = 1, seed: int = 2025) -> Dict[str, List[Dict]]:
+    """Retourne un dict de sources {nom: lignes} compatible avec load_all_can2025_data."""
+    rng = random.Random(seed)
+    teams = team_names(scale)
+    n_stadiums = 9 * scale
+    stadiums = [{"Stade": f"Stade {i + 1}", "Ville": f"Ville {i % 9 + 1}",
+                 "Capacité": str(rng.randint(20, 90) * 1000)} for i in range(n_stadiums)]
+
+    data = {"matches": [], "teams": [], "coaches": [], "squads": [],
+            "stadiums": stadiums, "standings": [], "best_thirds": []}
+
+    for i, name in enumerate(teams):
+        data["teams"].append({
+            "Equipe": name, "Participation": f"{rng.randint(1, 20)}e",
+            "Premiere_participation": str(rng.randint(1957, 2010)),
+            "Derniere_participation": "2024", "Methode_qualification": "Éliminatoires",
+            "Date_qualification": "15 octobre 2024",
+            "Meilleur_resultat": rng.choice(["Vainqueur", "Finaliste", "Demi-finale", "Quart de finale"]),
+            "Apparitions_precedentes": ", ".join(str(y) for y in range(1960, 2024, rng.randint(4, 12)))
+        })
+        data["coaches"].append({"pays": name, "selectionneur": f"Sélectionneur {i}",
+                                "categorie": rng.choice(["local", "étranger"]),
+                                "details": f"Sélectionneur de {name} depuis {rng.randint(2018, 2024)}."})
+        squad, number = {}, 1
+        for position, count in POSITIONS.items():
+            squad[position] = []
+            for _ in range(count):
+                squad[position].append(_player(rng, i, number))
+                number += 1
+        data["squads"].append({"team": name, "squad": squad})
+
+    # Phase de groupes : groupes de 4, tous les matchs aller
+    # Groupes nommés par lettre comme les vraies données (GROUP_PATTERN : A à H),
+    # suffixés par l'édition au-delà de la première
+    groups_per_edition = len(TEAM_ALIASES) // 4
+    match_n = 1
+    for g in range(len(teams) // 4):
+        group = [(4 * g + k, teams[4 * g + k]) for k in range(4)]
+        edition = g // groups_per_edition + 1
+        label = f"Groupe {chr(ord('A') + g % groups_per_edition)}"
+        if edition > 1:
+            label += f" (édition {edition})"
+        # [points, gagnés, nuls, perdus, buts pour, buts contre]
+        record = {name: [0, 0, 0, 0, 0, 0] for _, name in group}
+        for a in range(4):
+            for b in range(a + 1, 4):
+                (ia, home), (ib, away) = group[a], group[b]
+                sh, sa = rng.randint(0, 3), rng.randint(0, 3)
+                for name, scored, conceded in ((home, sh, sa), (away, sa, sh)):
+                    outcome = 1 if scored > conceded else 2 if scored == conceded else 3
+                    record[name][0] += {1: 3, 2: 1, 3: 0}[outcome]
+                    record[name][outcome] += 1
+                    record[name][4] += scored
+                    record[name][5] += conceded
+                data["matches"].append({
+                    "match_n": f"Match {match_n}", "date": f"{21 + match_n % 10} décembre 2025 20h00",
+                    "date_iso": f"2025-12-{21 + match_n % 10:02d}", "phase": "Phase de groupes",
+                    "etape": label, "stade": rng.choice(stadiums)["Stade"],
+                    "affluence": str(rng.randint(10, 60) * 1000), "arbitre": f"Arbitre {rng.randint(1, 40)}",
+                    "equipe_domicile": home, "equipe_exterieur": away, "score": f"{sh} - {sa}",
+                    "buteurs_domicile": _goals(rng, sh, ia), "buteurs_exterieur": _goals(rng, sa, ib),
+                    "cartons_domicile": [], "cartons_exterieur": []
+                })
+                match_n += 1
+        ranking = sorted(group, key=lambda t: (-record[t[1]][0], record[t[1]][5] - record[t[1]][4]))
+        data["standings"].append({"Nom_Groupe": label, "Classement": [
+            {"Rang": str(r + 1), "Equipe": name, "Pts": str(record[name][0]), "Matchs_joues": "3",
+             "Gagnes": str(record[name][1]), "Nuls": str(record[name][2]), "Perdus": str(record[name][3]),
+             "Buts_pour": str(record[name][4]), "Buts_contre": str(record[name][5]),
+             "Diff": str(record[name][4] - record[name][5])}
+            for r, (_, name) in enumerate(ranking)
+        ]})
+        third = ranking[2][1]
+        data["best_thirds"].append({"Rang": str(g + 1), "Equipe": third, "Groupe": label,
+                                    "Pts": str(record[third][0])})
+
+    # Phase finale : un tableau à élimination directe par édition
+    for edition in range(scale):
+        alive = teams[edition * len(TEAM_ALIASES):(edition + 1) * len(TEAM_ALIASES)][:16]
+        for stage in ["Huitième de finale", "Quart de finale", "Demi-finale", "Finale"]:
+            winners = []
+            for k in range(0, len(alive), 2):
+                home, away = alive[k], alive[k + 1]
+                data["matches"].append({
+                    "match_n": f"Match {match_n}", "date": "18 janvier 2026 20h00",
+                    "date_iso": "2026-01-18", "phase": "Phase finale", "etape": stage,
+                    "stade": rng.choice(stadiums)["Stade"], "affluence": "65000",
+                    "arbitre": f"Arbitre {rng.randint(1, 40)}", "equipe_domicile": home,
+                    "equipe_exterieur": away, "score": "1 - 0",
+                    "buteurs_domicile": _goals(rng, 1, teams.index(home)), "buteurs_exterieur": [],
+                    "cartons_domicile": [], "cartons_exterieur": []
+                })
+                match_n += 1
+                winners.append(home)
+            alive = winners
+    return data
+
+# Questions par type d'entité, sur le modèle de benchmarks/questions.json
+QUESTION_TEMPLATES = {
+    "match": ["Quel est le score du match {home} vs {away} ?", "Qui a marqué lors de {home} - {away} ?",
+              "Résultat de {home} contre {away}"],
+    "team": ["Qui est le sélectionneur de {team} ?", "Palmarès de {team}", "Informations sur {team}"],
+    "standings": ["Classement du {group}", "Qui est premier du {group} ?"],
+    "stadium": ["Capacité du {stadium}", "Combien de spectateurs au {stadium} ?"],
+    "player": ["Dans quel club joue {player} ?", "Poste de {player}"]
+}
+
+def _entity(doc: Document):
+    """(type, clé, champs du gabarit) de l'entité décrite par un document, ou None."""
+    meta = doc.metadata
+    doc_type = meta.get("type")
+    if doc_type in ("match_detailed", "match_summary"):
+        # Clé sur la paire d'équipes : deux matchs entre les mêmes équipes sont attendus tous les deux
+        pair = tuple(sorted((meta["team_home"], meta["team_away"])))
+        return "match", pair, {"home": meta["team_home"], "away": meta["team_away"]}
+    if doc_type in ("team_complete", "team_summary"):
+        return "team", meta["team_name"], {"team": meta["team_name"]}
+    if doc_type == "standings":
+        return "standings", meta["group"], {"group": meta["group"]}
+    if doc_type == "stadium":
+        return "stadium", doc.id, {"stadium": meta["stadium_name"]}
+    if doc_type == "player":
+        return "player", doc.id, {"player": meta["player_name"]}
+    return None
+
+def labeled_questions(documents: List[Document], limit: int = 100, seed: int = 2025) -> List[Dict]:
+    """
+    Questions annotées ({"question", "expected"}) générées depuis les
+    documents ingérés : une question par entité tirée au hasard, les types
+    d'entités à tour de rôle ; `expected` liste les documents de l'entité.
+    """
+    rng = random.Random(seed)
+    entities: Dict[tuple, Dict] = {}
+    for doc in documents:
+        found = _entity(doc)
+        if found is None:
+            continue
+        kind, key, fields = found
+        entities.setdefault((kind, key), {"fields": fields, "expected": []})["expected"].append(doc.id)
+
+    by_kind: Dict[str, List[Dict]] = {}
+    for (kind, _), entity in sorted(entities.items(), key=lambda item: str(item[0])):
+        by_kind.setdefault(kind, []).append(entity)
+    for group in by_kind.values():
+        rng.shuffle(group)
+
+    questions = []
+    while len(questions) < limit and any(by_kind.values()):
+        for kind in sorted(by_kind):
+            if by_kind[kind] and len(questions) < limit:
+                entity = by_kind[kind].pop()
+                template = rng.choice(QUESTION_TEMPLATES[kind])
+                questions.append({"question": template.format(**entity["fields"]),
+                                  "expected": sorted(entity["expected"])})
+    return questions
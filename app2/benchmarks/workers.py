@@ -0,0 +1,235 @@
+"""
+Mémoire et débit du serveur multi-workers (workers.py) pour 1, 2, 4 et 8
+processus. Deux modes :
+
+    privé     chaque worker charge l'encodeur et lit l'index en mémoire
+    partagé   encodeur chargé avant le fork, index mappé en lecture seule
+
+Le serveur mesuré est une application minimale (embedding de la question +
+recherche FAISS k=20 + lecture des documents) servie par PreforkServer sur
+un index plat synthétique de `--vectors` vecteurs. La RSS additionne les
+pages partagées dans chaque processus ; la PSS (Linux, smaps_rollup) les
+répartit entre eux et donne la mémoire réellement occupée. Lancer depuis app2 :
+
+    python -m benchmarks.workers --vectors 200000 --workers 1 2 4 8
+    python -m benchmarks.workers --encoder model   # MiniLM réel (torch)
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+MODES = ("privé", "partagé")
+QUESTIONS = [
+    "Qui a gagné la finale de la CAN 2025 ?",
+    "Score du match Maroc Comores",
+    "Quel est le sélectionneur du Sénégal ?",
+    "Classement du groupe A",
+    "Capacité du stade de Rabat",
+    "Buteurs de l'Égypte en phase de groupes",
+]
+
+# ============================================================================
+# INDEX SYNTHÉTIQUE
+# ============================================================================
+
+def build_index(folder: str, vectors: int, dim: int = 384):
+    """Index plat de vecteurs aléatoires normalisés et docstore mappé correspondant."""
+    import faiss
+    import numpy as np
+    from langchain_core.documents import Document
+    from docstore import write_docstore
+
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((vectors, dim), dtype=np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    index = faiss.IndexFlatL2(dim)
+    index.add(data)
+    faiss.write_index(index, os.path.join(folder, "index.faiss"))
+    documents = [Document(page_content=f"Document synthétique {i}", metadata={"type": "match"})
+                 for i in range(vectors)]
+    write_docstore(folder, documents, [f"doc-{i}" for i in range(vectors)])
+
+# ============================================================================
+# SERVEUR MESURÉ (processus enfant)
+# ============================================================================
+
+state = {}
+
+def load_encoder():
+    if "embeddings" in state:
+        return
+    if state["encoder"] == "hashing":
+        from benchmarks.stubs import HashingEmbeddings
+        state["embeddings"] = HashingEmbeddings()
+    else:
+        from config import EMBEDDING_CONFIG, EMBEDDING_MODEL
+        from query_encoder import create_embeddings
+        state["embeddings"] = create_embeddings(EMBEDDING_MODEL, EMBEDDING_CONFIG)
+
+def create_app():
+    from fastapi import FastAPI
+    from pydantic import BaseModel
+    from docstore import load_vector_store
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Dans chaque worker : encodeur si non préchargé, puis index
+        load_encoder()
+        state["db"] = load_vector_store(state["index"], state["embeddings"], mmap=state["mode"] == "partagé")
+        yield
+
+    app = FastAPI(lifespan=lifespan)
+
+    class Query(BaseModel):
+        query: str
+
+    @app.post("/search")
+    def search(query: Query):
+        vector = state["embeddings"].embed_query(query.query)
+        docs = state["db"].similarity_search_by_vector(vector, k=20)
+        return {"pid": os.getpid(), "documents": len(docs)}
+
+    return app
+
+def serve(args):
+    from workers import PreforkServer
+    state.update(encoder=args.encoder, index=args.index, mode=args.serve)
+    preload = load_encoder if args.serve == "partagé" and args.encoder == "model" else None
+    PreforkServer(create_app(), "127.0.0.1", args.port, args.serve_workers, preload=preload,
+                  log_level="warning").run()
+
+# ============================================================================
+# MESURES (processus parent)
+# ============================================================================
+
+def descendants(pid: int):
+    """Le processus et tous ses descendants (scan de /proc)."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat", "r") as f:
+                    # Le nom du processus peut contenir des espaces : ppid après la dernière parenthèse
+                    parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+    found, frontier = [pid], [pid]
+    while frontier:
+        children = [p for p, ppid in parents.items() if ppid in frontier]
+        found += children
+        frontier = children
+    return found
+
+def memory_mb(pids) -> dict:
+    """RSS et PSS additionnées (Mo) sur les processus donnés."""
+    rss = pss = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1])
+        except OSError:
+            continue
+    return {"rss_mb": rss / 1024, "pss_mb": pss / 1024}
+
+def wait_workers(url: str, workers: int, timeout: float = 300):
+    """Attend que chaque worker ait répondu au moins une fois."""
+    import requests
+    seen = set()
+    deadline = time.monotonic() + timeout
+    with requests.Session() as session:
+        while len(seen) < workers:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{len(seen)}/{workers} workers prêts après {timeout:.0f} s")
+            try:
+                seen.add(session.post(url, json={"query": QUESTIONS[0]}, timeout=5).json()["pid"])
+            except (requests.RequestException, ValueError):
+                time.sleep(0.2)
+
+def run_load(url: str, clients: int, duration: float) -> float:
+    """Questions par seconde pour `clients` clients pendant `duration` secondes."""
+    import requests
+    deadline = time.monotonic() + duration
+
+    def client(offset: int) -> int:
+        done = 0
+        with requests.Session() as session:
+            while time.monotonic() < deadline:
+                session.post(url, json={"query": QUESTIONS[(offset + done) % len(QUESTIONS)]}, timeout=30)
+                done += 1
+        return done
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(clients) as pool:
+        total = sum(pool.map(client, range(clients)))
+    return total / (time.monotonic() - start)
+
+def measure(mode: str, workers: int, args) -> dict:
+    port = args.port
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.workers", "--serve", mode, "--serve-workers", str(workers),
+         "--index", args.index, "--encoder", args.encoder, "--port", str(port)],
+        stdout=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}/search"
+    try:
+        wait_workers(url, workers)
+        throughput = run_load(url, args.clients, args.duration)
+        return {"throughput": throughput, **memory_mb(descendants(server.pid))}
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description="Mémoire et débit du serveur multi-workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--vectors", type=int, default=200000, help="vecteurs de l'index synthétique")
+    parser.add_argument("--encoder", choices=["hashing", "model"], default="hashing",
+                        help="embeddings simulés ou encodeur configuré (EMBEDDING_CONFIG)")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="durée de la charge par mesure (s)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="rapport JSON")
+    parser.add_argument("--serve", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--index", help=argparse.SUPPRESS)
+    # Processus enfant : un seul nombre de workers (--workers en liste plusieurs)
+    parser.add_argument("--serve-workers", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        build_index(folder, args.vectors)
+        size = os.path.getsize(os.path.join(folder, "index.faiss")) / 1e6
+        args.index = folder
+        print(f"\n🔬 Index plat de {args.vectors} vecteurs ({size:.0f} Mo), encodeur {args.encoder}, "
+              f"{args.clients} clients pendant {args.duration:.0f} s\n")
+        print(f"{'Workers':<9}{'Mode':<10}{'RSS totale (Mo)':<17}{'PSS totale (Mo)':<17}{'Questions/s'}")
+        print("-" * 64)
+        for workers in args.workers:
+            for mode in MODES:
+                r = measure(mode, workers, args)
+                results.append({"workers": workers, "mode": mode, **r})
+                print(f"{workers:<9}{mode:<10}{r['rss_mb']:<17.0f}{r['pss_mb']:<17.0f}{r['throughput']:.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"vectors": args.vectors, "encoder": args.encoder, "results": results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Rapport écrit dans {args.output}")
+
+if __name__ == "__main__":
+    main()
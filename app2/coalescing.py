@@ -0,0 +1,147 @@
+"""
+Coalescence des questions identiques simultanées (single-flight).
+
+Quand une même question (clé normalisée du cache de réponses + version de
+l'index) arrive pendant qu'elle est déjà en cours de calcul, la requête
+rejoint le calcul existant au lieu de relancer embedding, recherche FAISS
+et appel Gemini. Le calcul tourne dans sa propre tâche : ses tokens sont
+diffusés à tous les abonnés (les retardataires reçoivent d'abord ceux déjà
+produits) et il va jusqu'au bout même si le client qui l'a lancé se
+déconnecte.
+
+La clé est réservée avant que le leader n'attende sa place du limiteur :
+les questions identiques qui arrivent pendant cette attente s'y rattachent
+sans consommer de place. Si le leader est refusé ou part avant d'obtenir
+sa place, le calcul se termine sans avoir démarré (voir abandon()).
+"""
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from metrics import REGISTRY
+
+COALESCED = REGISTRY.counter(
+    "rag_coalesced_requests_total", "Questions calculées (leader) ou rattachées à un calcul en cours (follower)",
+    ["role"])
+
+Publish = Callable[[str], Awaitable[None]]
+
+class Flight:
+    """Un calcul partagé : tokens diffusés au fil de l'eau et résultat final commun."""
+
+    def __init__(self, key: Optional[Hashable]):
+        self.key = key
+        self.tokens: List[str] = []
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self.running = False
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, token: str):
+        async with self._changed:
+            self.tokens.append(token)
+            self._changed.notify_all()
+
+    async def begin(self):
+        async with self._changed:
+            self.running = True
+            self._changed.notify_all()
+
+    async def finish(self, result: Any = None, error: Optional[BaseException] = None):
+        async with self._changed:
+            self.result, self.error, self.done = result, error, True
+            self._changed.notify_all()
+
+    async def started(self) -> bool:
+        """Attend que le calcul démarre ; False s'il a été abandonné avant (leader refusé)."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.running or self.done)
+        return self.running
+
+    async def stream(self) -> AsyncIterator[str]:
+        """Tous les tokens depuis le début, puis les suivants dès leur publication ; lève l'erreur du calcul."""
+        sent = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.tokens) > sent or self.done)
+                tokens, done = self.tokens[sent:], self.done
+            for token in tokens:
+                yield token
+            sent += len(tokens)
+            if done and sent == len(self.tokens):
+                if self.error is not None:
+                    raise self.error
+                return
+
+    async def wait(self) -> Any:
+        """Résultat final du calcul (ou son exception)."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.done)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class SingleFlight:
+    """Calculs en cours par clé ; une clé None n'est jamais partagée."""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, Flight] = {}
+        REGISTRY.gauge("rag_coalescing_in_flight", "Calculs partageables en cours").set_function(lambda: len(self))
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def join(self, key: Optional[Hashable]) -> Optional[Flight]:
+        """Calcul en cours pour `key`, compté comme question rattachée ; None sinon."""
+        flight = self._flights.get(key) if key is not None else None
+        if flight is not None:
+            COALESCED.inc(role="follower")
+        return flight
+
+    def reserve(self, key: Optional[Hashable]) -> Flight:
+        """
+        Réserve `key` pour un nouveau calcul (leader) : les questions
+        identiques s'y rattachent dès maintenant, avant son démarrage.
+        """
+        flight = Flight(key)
+        COALESCED.inc(role="leader")
+        if key is not None:
+            self._flights[key] = flight
+        return flight
+
+    def run(self, flight: Flight, producer: Callable[[Publish], Awaitable[Any]]) -> Flight:
+        """Lance `producer(publish)` dans une tâche dédiée ; la clé reste partagée jusqu'à la fin du calcul."""
+
+        async def run():
+            try:
+                await flight.begin()
+                await flight.finish(result=await producer(flight.publish))
+            except Exception as e:
+                await flight.finish(error=e)
+            finally:
+                self._release(flight)
+
+        flight.task = asyncio.create_task(run())
+        return flight
+
+    def start(self, key: Optional[Hashable], producer: Callable[[Publish], Awaitable[Any]]) -> Flight:
+        return self.run(self.reserve(key), producer)
+
+    async def abandon(self, flight: Flight, error: BaseException):
+        """Calcul réservé qui ne démarrera pas : libère la clé et réveille ses abonnés."""
+        self._release(flight)
+        await flight.finish(error=error)
+
+    def _release(self, flight: Flight):
+        if flight.key is not None and self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+def coalescing_ratio() -> float:
+    """Part des questions servies par un calcul déjà en cours."""
+    leaders, followers = COALESCED.value(role="leader"), COALESCED.value(role="follower")
+    total = leaders + followers
+    return followers / total if total else 0.0
+
+REGISTRY.gauge("rag_coalescing_ratio", "Part des questions servies par un calcul déjà en cours"
+               ).set_function(coalescing_ratio)
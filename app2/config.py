@@ -1,9 +1,50 @@
 """
 Configuration centralisée pour le projet CAN 2025 RAG
 """
+import os
 
 # Chemins des fichiers
 DATA_FOLDER = "../data/json"
+INDEX_DIR = os.getenv("FAISS_DIR", "faiss_index_can2025")
+
+# Modèle d'embedding : doit être identique à l'indexation et à la requête
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Encodage des documents lors de la construction de l'index
+EMBEDDING_CONFIG = {
+    "batch_size": int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+    # Processus d'encodage en parallèle (1 = encodage dans le processus courant)
+    "workers": int(os.getenv("EMBEDDING_WORKERS", "1")),
+    # Documents lus, encodés et écrits dans l'index par lot lors d'une
+    # construction complète : borne la mémoire de l'indexation
+    "ingest_batch_size": int(os.getenv("INGEST_BATCH_SIZE", "2048")),
+    # Cache disque des vecteurs déjà calculés ("" pour désactiver)
+    "cache_dir": os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache"),
+    # Encodeur : "torch" (sentence-transformers) ou "onnx" (onnxruntime, sans torch),
+    # pour l'indexation comme pour les questions (voir query_encoder.py)
+    "backend": os.getenv("EMBEDDING_BACKEND", "torch"),
+    "onnx_dir": os.getenv("EMBEDDING_ONNX_DIR", "onnx_minilm"),
+    "onnx_int8": os.getenv("EMBEDDING_ONNX_INT8", "1") == "1",
+    # Threads onnxruntime (0 = choix d'onnxruntime)
+    "onnx_threads": int(os.getenv("EMBEDDING_ONNX_THREADS", "0")),
+    # Similarité cosinus minimale avec le modèle PyTorch pour publier un export ONNX
+    "onnx_min_cosine": float(os.getenv("EMBEDDING_ONNX_MIN_COSINE", "0.98")),
+    # Vecteurs de questions récentes gardés en mémoire (0 pour désactiver)
+    "query_cache_size": int(os.getenv("RAG_QUERY_CACHE_SIZE", "1024"))
+}
+# Type d'index FAISS construit par embeddings.py (flat, hnsw, ivfpq, sq8) ;
+# enregistré dans le manifeste, rag_chain.py le recharge tel quel
+INDEX_CONFIG = {
+    "type": os.getenv("FAISS_INDEX_TYPE", "flat"),
+    "hnsw_m": int(os.getenv("FAISS_HNSW_M", "32")),
+    "hnsw_ef_construction": int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "200")),
+    "hnsw_ef_search": int(os.getenv("FAISS_HNSW_EF_SEARCH", "64")),
+    # 0 : nombre de listes calculé selon le nombre de vecteurs
+    "ivf_nlist": int(os.getenv("FAISS_IVF_NLIST", "0")),
+    "ivf_nprobe": int(os.getenv("FAISS_IVF_NPROBE", "8")),
+    # Sous-quantificateurs PQ : doit diviser la dimension (384 pour MiniLM)
+    "pq_m": int(os.getenv("FAISS_PQ_M", "48"))
+}
 FILES = {
     "matches": "matches.json",
     "teams": "equipes_qualifiees.json",
@@ -56,4 +97,136 @@ CHUNK_CONFIG = {
         "max_tokens": 500,
         "overlap": 50
     }
-}
\ No newline at end of file
+}
+
+# Recherche : k sans filtre, k réduit quand les métadonnées restreignent les candidats
+RETRIEVAL_CONFIG = {
+    "k": int(os.getenv("RAG_RETRIEVAL_K", "20")),
+    "filtered_k": int(os.getenv("RAG_RETRIEVAL_FILTERED_K", "8")),
+    "metadata_filter": os.getenv("RAG_METADATA_FILTER", "1") == "1",
+    # Fusion avec l'index lexical BM25 (noms, numéros de match, scores, dates)
+    "lexical": os.getenv("RAG_LEXICAL", "1") == "1",
+    "rrf_k": int(os.getenv("RAG_RRF_K", "60"))
+}
+
+# Assemblage du contexte envoyé au LLM (context_packing.py) : une variante
+# par entité, sans doublons ni bandeaux, dans un budget de tokens
+CONTEXT_CONFIG = {
+    "packing": os.getenv("RAG_CONTEXT_PACKING", "1") == "1",
+    # Budget estimé (≈ 4 caractères par token) ; 0 = sans limite
+    "max_tokens": int(os.getenv("RAG_CONTEXT_MAX_TOKENS", "1500")),
+    # Similarité (Jaccard sur trigrammes de mots) à partir de laquelle un document est un doublon
+    "dedup_threshold": float(os.getenv("RAG_CONTEXT_DEDUP_THRESHOLD", "0.8"))
+}
+
+# Configuration du serveur API (concurrence et backpressure)
+SERVER_CONFIG = {
+    # Nombre maximal de questions traitées simultanément
+    "max_in_flight": int(os.getenv("RAG_MAX_IN_FLIGHT", "16")),
+    # Nombre maximal de questions en attente avant de répondre 429
+    "max_queue": int(os.getenv("RAG_MAX_QUEUE", "64")),
+    # Attente maximale (secondes) dans la file avant de répondre 429
+    "queue_timeout": float(os.getenv("RAG_QUEUE_TIMEOUT", "30")),
+    # Threads dédiés à l'embedding de la question et à la recherche FAISS
+    "retrieval_workers": int(os.getenv("RAG_RETRIEVAL_WORKERS", str(min(8, os.cpu_count() or 1)))),
+    # Réponses factuelles directes depuis les JSON (score, classement, stade, sélectionneur)
+    "structured_answers": os.getenv("RAG_STRUCTURED_ANSWERS", "1") == "1",
+    # Une question identique (même clé que le cache, même index) posée pendant
+    # son calcul attend ce calcul au lieu d'appeler Gemini une seconde fois
+    "coalesce": os.getenv("RAG_COALESCE", "1") == "1",
+    # Embedding + recherche factices au démarrage, avant de passer prêt (/readyz)
+    "warmup": os.getenv("RAG_WARMUP", "1") == "1",
+    # Processus serveurs (workers.py) : > 1 = un socket partagé par des workers
+    # forkés après le chargement de l'encodeur
+    "workers": int(os.getenv("RAG_WORKERS", "1")),
+    # Vecteurs FAISS mappés en lecture seule, partagés par les workers via le cache de pages
+    "mmap_index": os.getenv("RAG_MMAP_INDEX", "1") == "1",
+    # Encodeur torch chargé une fois avant le fork (pages partagées en copie sur écriture)
+    "preload": os.getenv("RAG_PRELOAD", "1") == "1",
+    # Vérification périodique (secondes) d'une nouvelle version publiée de
+    # l'index, rechargée à chaud ; 0 = uniquement via POST /admin/index/reload
+    "index_poll_interval": float(os.getenv("RAG_INDEX_POLL_INTERVAL", "10")),
+    # Jeton exigé (en-tête X-Admin-Token) par les endpoints /admin ; vide =
+    # accessibles seulement depuis la machine locale
+    "admin_token": os.getenv("RAG_ADMIN_TOKEN", ""),
+    # /chat/batch : questions par lot synchrone, par job en arrière-plan, et
+    # générations Gemini simultanées pour un lot
+    "batch_max_size": int(os.getenv("RAG_BATCH_MAX_SIZE", "100")),
+    "batch_job_max_size": int(os.getenv("RAG_BATCH_JOB_MAX_SIZE", "10000")),
+    "batch_concurrency": int(os.getenv("RAG_BATCH_CONCURRENCY", "8")),
+    # Durée de conservation des résultats d'un job terminé (secondes)
+    "batch_job_ttl": float(os.getenv("RAG_BATCH_JOB_TTL", "3600"))
+}
+
+# Cache de réponses (exact + sémantique) devant la chaîne RAG
+CACHE_CONFIG = {
+    "enabled": os.getenv("RAG_CACHE_ENABLED", "1") == "1",
+    "max_entries": int(os.getenv("RAG_CACHE_MAX_ENTRIES", "2000")),
+    # Plafond mémoire approximatif (clés + réponses + embeddings)
+    "max_bytes": int(os.getenv("RAG_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    "ttl_seconds": float(os.getenv("RAG_CACHE_TTL", "3600")),
+    # Similarité cosinus minimale pour réutiliser une réponse proche
+    "semantic_threshold": float(os.getenv("RAG_CACHE_SEMANTIC_THRESHOLD", "0.95"))
+}
+
+# Client LLM (llm_client.py) : fournisseur, délai, couverture, disjoncteur
+# et réponses dégradées quand le LLM ne répond pas dans le budget
+LLM_CONFIG = {
+    # "gemini" ou "http" (API compatible OpenAI, ex. benchmarks/fake_llm.py)
+    "provider": os.getenv("RAG_LLM_PROVIDER", "gemini"),
+    "model": os.getenv("RAG_LLM_MODEL", "gemini-3-pro-preview"),
+    "base_url": os.getenv("RAG_LLM_BASE_URL", "http://127.0.0.1:8090/v1"),
+    "api_key": os.getenv("RAG_LLM_API_KEY", ""),
+    # Connexions HTTP gardées ouvertes par worker (fournisseur http)
+    "pool_size": int(os.getenv("RAG_LLM_POOL_SIZE", "32")),
+    "connect_timeout": float(os.getenv("RAG_LLM_CONNECT_TIMEOUT", "3")),
+    # Budget d'un appel (secondes), du premier envoi au dernier token
+    "deadline": float(os.getenv("RAG_LLM_DEADLINE", "20")),
+    # Seconde tentative sans premier token après ce délai (0 = désactivé)
+    "hedge_delay": float(os.getenv("RAG_LLM_HEDGE_DELAY", "5")),
+    # Tentatives au plus par appel (couverture et nouvelles tentatives comprises)
+    "max_attempts": int(os.getenv("RAG_LLM_MAX_ATTEMPTS", "3")),
+    "retry_backoff": float(os.getenv("RAG_LLM_RETRY_BACKOFF", "0.2")),
+    # Disjoncteur : échecs consécutifs avant ouverture, durée d'ouverture (secondes)
+    "breaker_failures": int(os.getenv("RAG_LLM_BREAKER_FAILURES", "5")),
+    "breaker_reset": float(os.getenv("RAG_LLM_BREAKER_RESET", "30")),
+    # LLM indisponible : extraits des documents retrouvés au lieu d'une erreur
+    "degraded_answers": os.getenv("RAG_LLM_DEGRADED", "1") == "1",
+    "degraded_snippets": int(os.getenv("RAG_LLM_DEGRADED_SNIPPETS", "3"))
+}
+
+# Sessions de conversation (sessions.py) : historique compact côté serveur,
+# réécriture des relances et réutilisation des documents du tour précédent
+SESSION_CONFIG = {
+    "enabled": os.getenv("RAG_SESSIONS", "1") == "1",
+    "max_sessions": int(os.getenv("RAG_SESSION_MAX", "10000")),
+    # Plafond mémoire approximatif (historiques + documents gardés)
+    "max_bytes": int(os.getenv("RAG_SESSION_MAX_BYTES", str(64 * 1024 * 1024))),
+    # Session oubliée après cette inactivité (secondes)
+    "idle_ttl": float(os.getenv("RAG_SESSION_IDLE_TTL", "1800")),
+    # Derniers échanges gardés tels quels ; les précédents sont résumés
+    "history_turns": int(os.getenv("RAG_SESSION_TURNS", "3")),
+    # Budgets (≈ 4 caractères par token) de l'historique envoyé au LLM et du résumé
+    "history_max_tokens": int(os.getenv("RAG_SESSION_HISTORY_TOKENS", "600")),
+    "summary_max_tokens": int(os.getenv("RAG_SESSION_SUMMARY_TOKENS", "200"))
+}
+
+# Instrumentation : logs JSON par requête et profilage des requêtes lentes
+TRACING_CONFIG = {
+    "json_logs": os.getenv("RAG_JSON_LOGS", "1") == "1",
+    # Seuil au-delà duquel le profil pyinstrument est écrit ; 0 = profileur désactivé
+    "profile_slow_ms": float(os.getenv("RAG_PROFILE_SLOW_MS", "0")),
+    # Fraction des requêtes profilées (le profileur a un coût)
+    "profile_sample_rate": float(os.getenv("RAG_PROFILE_SAMPLE_RATE", "0.1")),
+    "profile_dir": os.getenv("RAG_PROFILE_DIR", "profiles")
+}
+
+# Téléchargement de l'index publié sur un stockage objet (download_faiss.py)
+DOWNLOAD_CONFIG = {
+    # gs://bucket/prefix, ou un dossier local / file:// (tests, émulateur monté)
+    "source": os.getenv("FAISS_BUCKET", ""),
+    # Fichiers téléchargés en parallèle
+    "workers": int(os.getenv("FAISS_DOWNLOAD_WORKERS", "8")),
+    # Nouvelles tentatives d'un fichier dont l'empreinte ne correspond pas
+    "retries": int(os.getenv("FAISS_DOWNLOAD_RETRIES", "3"))
+}
@@ -0,0 +1,138 @@
+"""
+Assemblage du contexte envoyé au LLM à partir des documents retrouvés.
+
+Un même match existe en trois variantes (match_detailed, match_summary,
+event) et une équipe en deux (team_complete, team_summary) : avec k=20, le
+prompt répète souvent la même information. Les documents sont regroupés par
+entité (match, équipe, joueur) ; pour chaque entité, dans l'ordre de score,
+seule la variante la plus informative qui tient dans le budget restant est
+gardée. Les quasi-doublons entre entités sont écartés et les lignes
+décoratives (bandeaux ═══, séparateurs) supprimées.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from load_docs import document_key
+from retrieval import estimate_tokens
+
+# Rang d'informativité des variantes d'une même entité (0 = la plus complète)
+VARIANT_RANK = {
+    "match_detailed": 0,
+    "match_summary": 1,
+    "event": 2,
+    "team_complete": 0,
+    "team_summary": 1
+}
+
+# Séparateurs et bandeaux : caractères de dessin de boîte, "=", "-", "_" en
+# début ou fin de ligne seulement ("a===b" dans une valeur est gardé)
+_DECORATION = re.compile(r"^\s*[─-╿=\-_]{3,}\s*|\s*[─-╿=\-_]{3,}\s*$", re.M)
+_BLANK_LINES = re.compile(r"\n{3,}")
+_WORDS = re.compile(r"\w+")
+
+def entity_key(doc: Document) -> str:
+    """Entité décrite par le document : toutes ses variantes partagent la même clé."""
+    metadata = doc.metadata
+    doc_type = metadata.get("type")
+    if doc_type in ("match_detailed", "match_summary", "event"):
+        return f"match:{metadata.get('match_number')}"
+    if doc_type in ("team_complete", "team_summary"):
+        return f"team:{metadata.get('team_name')}"
+    if doc_type == "player":
+        return f"player:{metadata.get('team')}:{metadata.get('player_name')}"
+    return document_key(doc)
+
+def strip_decorations(text: str) -> str:
+    """Retire bandeaux et séparateurs ; "═══ GARDIENS (3) ═══" devient "GARDIENS (3)"."""
+    lines = []
+    for line in text.splitlines():
+        if _DECORATION.search(line):
+            line = _DECORATION.sub("", line).strip()
+            if not line:
+                continue
+        lines.append(line.rstrip())
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+def format_source(doc: Document, content: Optional[str] = None) -> str:
+    content = doc.page_content if content is None else content
+    return f"--- SOURCE: {doc.metadata.get('source')} ---\n{content}"
+
+def _shingles(text: str) -> Set[Tuple[str, ...]]:
+    words = _WORDS.findall(text.lower())
+    if len(words) < 3:
+        return {tuple(words)}
+    return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+def _jaccard(a: Set, b: Set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+@dataclass
+class ContextStats:
+    """Taille du contexte avant et après assemblage, pour une requête."""
+    documents_in: int = 0
+    documents_out: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+
+    def as_dict(self) -> Dict:
+        return {
+            "documents_in": self.documents_in,
+            "documents_out": self.documents_out,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out
+        }
+
+class ContextPacker:
+    """
+    Remplit un budget de tokens avec les documents retrouvés, dans l'ordre de
+    score. `max_tokens` = 0 désactive le budget ; `dedup_threshold` est la
+    similarité (Jaccard sur trigrammes de mots) au-delà de laquelle un
+    document est considéré comme un doublon d'un document déjà retenu.
+    """
+
+    def __init__(self, max_tokens: int = 0, dedup_threshold: float = 0.8):
+        self.max_tokens = max_tokens
+        self.dedup_threshold = dedup_threshold
+
+    def _groups(self, docs: List[Document]) -> List[List[Document]]:
+        """Variantes regroupées par entité, dans l'ordre du meilleur score de chaque entité."""
+        groups: Dict[str, List[Document]] = {}
+        for doc in docs:
+            groups.setdefault(entity_key(doc), []).append(doc)
+        return [sorted(variants, key=lambda d: VARIANT_RANK.get(d.metadata.get("type"), 0))
+                for variants in groups.values()]
+
+    def select(self, docs: List[Document]) -> List[Tuple[Document, str]]:
+        """Documents retenus avec leur bloc de contexte, dans l'ordre de score."""
+        kept: List[Tuple[Document, str]] = []
+        kept_shingles: List[Set] = []
+        budget = self.max_tokens or float("inf")
+        for variants in self._groups(docs):
+            for doc in variants:
+                block = format_source(doc, strip_decorations(doc.page_content))
+                cost = estimate_tokens(block)
+                if cost > budget:
+                    # Variante trop longue : essayer la suivante, plus courte
+                    continue
+                shingles = _shingles(block)
+                if any(_jaccard(shingles, other) >= self.dedup_threshold for other in kept_shingles):
+                    break
+                kept.append((doc, block))
+                kept_shingles.append(shingles)
+                budget -= cost
+                break
+        return kept
+
+    def pack(self, docs: List[Document]) -> Tuple[str, ContextStats]:
+        """Texte du contexte et statistiques ; `docs` est trié par score décroissant."""
+        kept = self.select(docs)
+        context = "\n\n".join(block for _, block in kept)
+        return context, ContextStats(
+            documents_in=len(docs),
+            documents_out=len(kept),
+            tokens_in=sum(estimate_tokens(format_source(doc)) for doc in docs),
+            tokens_out=estimate_tokens(context)
+        )
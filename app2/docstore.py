@@ -0,0 +1,185 @@
+"""
+Docstore sur disque de l'index FAISS, à la place de index.pkl.
+
+    docstore.json     identifiants et métadonnées, par position FAISS (petit)
+    docstore.bin      textes des documents concaténés (UTF-8), en mémoire mappée
+    docstore.offsets  début de chaque texte dans docstore.bin (int64, n + 1)
+
+Seuls les textes des documents retrouvés sont lus, à la demande, et le
+cache de pages du système les partage entre processus. Aucun pickle n'est
+désérialisé au chargement.
+"""
+import json
+import mmap
+import os
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+from langchain_core.documents import Document
+
+DOCSTORE_META = "docstore.json"
+DOCSTORE_BLOB = "docstore.bin"
+DOCSTORE_OFFSETS = "docstore.offsets"
+DOCSTORE_FORMAT = 1
+
+def has_docstore(index_dir: str) -> bool:
+    return os.path.exists(os.path.join(index_dir, DOCSTORE_META))
+
+def write_docstore(index_dir: str, documents: List[Document], ids: Optional[List[str]] = None):
+    """Écrit les documents dans l'ordre de leurs positions FAISS (identifiants : doc.id par défaut)."""
+    with DocstoreWriter(index_dir) as writer:
+        writer.add(documents, ids)
+
+class DocstoreWriter:
+    """
+    Écriture du docstore lot par lot (indexation au fil de l'eau) : textes et
+    positions ajoutés en fin de fichier, métadonnées dans un fichier JSON
+    Lines temporaire recopié dans docstore.json à la fermeture. Seuls les
+    identifiants restent en mémoire.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.ids: List[str] = []
+        self._offset = 0
+        self._blob = open(os.path.join(index_dir, DOCSTORE_BLOB), "wb")
+        self._offsets = open(os.path.join(index_dir, DOCSTORE_OFFSETS), "wb")
+        self._offsets.write(np.zeros(1, dtype=np.int64).tobytes())
+        self._metadata_path = os.path.join(index_dir, DOCSTORE_META + ".partial")
+        self._metadata = open(self._metadata_path, "w", encoding="utf-8")
+
+    def __enter__(self) -> "DocstoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(complete=exc_type is None)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, documents: List[Document], ids: Optional[List[str]] = None):
+        offsets = []
+        for doc in documents:
+            data = doc.page_content.encode("utf-8")
+            self._blob.write(data)
+            self._offset += len(data)
+            offsets.append(self._offset)
+            self._metadata.write(json.dumps(doc.metadata, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._offsets.write(np.asarray(offsets, dtype=np.int64).tobytes())
+        self.ids.extend(ids if ids is not None else [doc.id for doc in documents])
+
+    def close(self, complete: bool = True):
+        """Ferme les fichiers ; `complete` assemble docstore.json (sinon le docstore reste absent)."""
+        if self._metadata.closed:
+            return
+        for f in (self._blob, self._offsets, self._metadata):
+            f.close()
+        if complete:
+            with open(os.path.join(self.index_dir, DOCSTORE_META), "w", encoding="utf-8") as f, \
+                    open(self._metadata_path, "r", encoding="utf-8") as lines:
+                f.write(f'{{"format":{DOCSTORE_FORMAT},"ids":')
+                json.dump(self.ids, f, ensure_ascii=False, separators=(",", ":"))
+                f.write(',"metadata":[')
+                for i, line in enumerate(lines):
+                    f.write(("," if i else "") + line.rstrip("\n"))
+                f.write("]}")
+        os.remove(self._metadata_path)
+
+class ReadOnlyDocstore(PermissionError):
+    """Levée par une écriture dans un MmapDocstore (index publié, en lecture seule)."""
+
+    def __init__(self):
+        super().__init__("Docstore en lecture seule : reconstruire l'index avec embeddings.py")
+
+class MmapDocstore:
+    """
+    Docstore LangChain en lecture seule : métadonnées en mémoire, textes lus
+    dans le fichier mappé uniquement pour les documents demandés.
+    """
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, DOCSTORE_META), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != DOCSTORE_FORMAT:
+            raise ValueError(f"Format de docstore non supporté : {meta.get('format')}")
+        self.ids: List[str] = meta["ids"]
+        self._metadata: List[Dict] = meta["metadata"]
+        self._positions = {doc_id: position for position, doc_id in enumerate(self.ids)}
+        self._offsets = np.fromfile(os.path.join(index_dir, DOCSTORE_OFFSETS), dtype=np.int64)
+
+        self._blob: Optional[mmap.mmap] = None
+        blob_path = os.path.join(index_dir, DOCSTORE_BLOB)
+        if os.path.getsize(blob_path):
+            with open(blob_path, "rb") as f:
+                self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def text(self, position: int) -> str:
+        start, end = int(self._offsets[position]), int(self._offsets[position + 1])
+        return self._blob[start:end].decode("utf-8") if end > start else ""
+
+    def get_metadata(self, doc_id: str) -> Dict:
+        return self._metadata[self._positions[doc_id]]
+
+    def search(self, search: str) -> Union[Document, str]:
+        position = self._positions.get(search)
+        if position is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=self.text(position), metadata=dict(self._metadata[position]))
+
+    def add(self, texts: Dict[str, Document]):
+        raise ReadOnlyDocstore()
+
+    def delete(self, ids: List):
+        raise ReadOnlyDocstore()
+
+# ============================================================================
+# CHARGEMENT / SAUVEGARDE DE L'INDEX COMPLET
+# ============================================================================
+
+def load_vector_store(index_dir: str, embedding, writable: bool = False, mmap: bool = False):
+    """
+    Charge index.faiss et le docstore mappé dans un vectorstore FAISS LangChain.
+    `writable` charge les documents dans un docstore en mémoire modifiable
+    (ré-indexation incrémentale) ; `mmap` mappe aussi les vecteurs en lecture
+    seule (serveur multi-workers, voir ann_index.read_index). Les index
+    antérieurs au docstore mappé sont relus depuis index.pkl.
+    """
+    from ann_index import read_index
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    if not has_docstore(index_dir):
+        print("⚠️ Docstore mappé absent : chargement de l'ancien index.pkl (pickle)")
+        return FAISS.load_local(index_dir, embedding, allow_dangerous_deserialization=True)
+
+    store = MmapDocstore(index_dir)
+    docstore = store
+    if writable:
+        docstore = InMemoryDocstore({doc_id: store.search(doc_id) for doc_id in store.ids})
+    index = read_index(os.path.join(index_dir, "index.faiss"), mmap=mmap and not writable)
+    return FAISS(embedding, index, docstore, dict(enumerate(store.ids)))
+
+def save_vector_store(vector_db, index_dir: str):
+    """Écrit index.faiss et le docstore mappé (sans index.pkl)."""
+    import faiss
+    faiss.write_index(vector_db.index, os.path.join(index_dir, "index.faiss"))
+    ids = [vector_db.index_to_docstore_id[p] for p in range(len(vector_db.index_to_docstore_id))]
+    write_docstore(index_dir, [vector_db.docstore.search(doc_id) for doc_id in ids], ids)
+
+def migrate_legacy_index(index_dir: str):
+    """Ajoute le docstore mappé à un index qui n'a que index.pkl (conversion hors ligne)."""
+    import pickle
+    with open(os.path.join(index_dir, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    ids = [index_to_docstore_id[p] for p in range(len(index_to_docstore_id))]
+    write_docstore(index_dir, [docstore.search(doc_id) for doc_id in ids], ids)
+    print(f"✅ Docstore mappé écrit dans {index_dir} ({len(ids)} documents)")
+
+if __name__ == "__main__":
+    import sys
+    from config import INDEX_DIR
+    from index_store import active_index_dir
+    migrate_legacy_index(sys.argv[1] if len(sys.argv) > 1 else active_index_dir(INDEX_DIR))
@@ -1,21 +1,277 @@
+"""
+Téléchargement de l'index FAISS publié sur un stockage objet (GCS) avant le
+démarrage du serveur.
+
+- Les fichiers sont téléchargés en parallèle (pool borné) puis vérifiés
+  contre les empreintes MD5 / CRC32C des métadonnées de l'objet.
+- Un manifeste local (download.json) garde l'empreinte de chaque fichier
+  de la version active : les fichiers inchangés ne sont pas retéléchargés.
+- Tout est écrit dans `<index>.download`, conservé d'une tentative à
+  l'autre (reprise après un pod arrêté en cours de route), puis publié
+  atomiquement par index_store.publish_index : rag_chain.py ne charge
+  jamais un index à moitié téléchargé.
+- Le stockage est interchangeable (StorageBackend) : GCS, ou un dossier
+  local pour les tests. Un émulateur GCS (STORAGE_EMULATOR_HOST) passe par
+  GCSBackend.
+
+    python download_faiss.py                      # source FAISS_BUCKET
+    python download_faiss.py gs://bucket/prefix --workers 16
+"""
+import argparse
+import base64
+import hashlib
+import json
 import os
-from google.cloud import storage
-import subprocess
-
-FAISS_BUCKET = os.environ.get("FAISS_BUCKET", "")
-FAISS_DIR = os.environ.get("FAISS_DIR", "faiss_index_can2025")
-
-if FAISS_BUCKET and not os.path.exists(FAISS_DIR):
-    print(f"Downloading FAISS index from {FAISS_BUCKET} to {FAISS_DIR}...")
-    client = storage.Client()
-    bucket_name, prefix = FAISS_BUCKET.replace("gs://","").split("/",1)
-    bucket = client.bucket(bucket_name)
-    blobs = client.list_blobs(bucket_name, prefix=prefix)
-    os.makedirs(FAISS_DIR, exist_ok=True)
-    for b in blobs:
-        dest_path = os.path.join(FAISS_DIR, os.path.relpath(b.name, prefix))
-        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-        b.download_to_filename(dest_path)
-    print("FAISS index downloaded.")
-else:
-    print("No FAISS bucket provided or index already present.")
\ No newline at end of file
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from config import DOWNLOAD_CONFIG, INDEX_DIR
+from index_store import active_index_dir, load_manifest, publish_index
+
+DOWNLOAD_MANIFEST = "download.json"
+READ_BLOCK = 1 << 20
+
+class ChecksumMismatch(Exception):
+    """Levée quand un fichier reste invalide après toutes les tentatives."""
+
+    def __init__(self, name: str, attempts: int):
+        super().__init__(f"Empreinte invalide pour {name} après {attempts} tentative(s)")
+        self.name = name
+
+@dataclass
+class RemoteObject:
+    """Objet du stockage ; empreintes encodées en base64 comme dans les métadonnées GCS."""
+    name: str
+    size: int
+    md5: Optional[str] = None
+    crc32c: Optional[str] = None
+    handle: Any = None
+
+    def fingerprint(self) -> Dict:
+        return {"size": self.size, "md5": self.md5, "crc32c": self.crc32c}
+
+# ============================================================================
+# STOCKAGES
+# ============================================================================
+
+class StorageBackend:
+    """Stockage objet : liste des objets d'un préfixe et téléchargement d'un objet."""
+
+    def list(self) -> List[RemoteObject]:
+        raise NotImplementedError
+
+    def download(self, obj: RemoteObject, dest: str):
+        raise NotImplementedError
+
+class GCSBackend(StorageBackend):
+    """Préfixe gs://bucket/prefix (google-cloud-storage)."""
+
+    def __init__(self, url: str):
+        from google.cloud import storage
+        bucket_name, _, prefix = url.replace("gs://", "", 1).partition("/")
+        self.client = storage.Client()
+        self.bucket_name = bucket_name
+        self.prefix = f"{prefix.rstrip('/')}/" if prefix else ""
+
+    def list(self) -> List[RemoteObject]:
+        return [
+            RemoteObject(blob.name[len(self.prefix):], blob.size, blob.md5_hash, blob.crc32c, blob)
+            for blob in self.client.list_blobs(self.bucket_name, prefix=self.prefix)
+            if not blob.name.endswith("/")  # marqueurs de dossiers
+        ]
+
+    def download(self, obj: RemoteObject, dest: str):
+        obj.handle.download_to_filename(dest)
+
+class LocalBackend(StorageBackend):
+    """Dossier local se comportant comme un préfixe de bucket (tests, benchmarks)."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def list(self) -> List[RemoteObject]:
+        objects = []
+        for folder, _, filenames in os.walk(self.root):
+            for filename in sorted(filenames):
+                path = os.path.join(folder, filename)
+                objects.append(RemoteObject(os.path.relpath(path, self.root).replace(os.sep, "/"),
+                                            os.path.getsize(path), md5=file_checksums(path)["md5"]))
+        return objects
+
+    def download(self, obj: RemoteObject, dest: str):
+        shutil.copyfile(os.path.join(self.root, obj.name), dest)
+
+def backend_for(source: str) -> StorageBackend:
+    if source.startswith("gs://"):
+        return GCSBackend(source)
+    return LocalBackend(source.replace("file://", "", 1))
+
+# ============================================================================
+# EMPREINTES
+# ============================================================================
+
+def _b64(digest: bytes) -> str:
+    return base64.b64encode(digest).decode("ascii")
+
+def file_checksums(path: str, crc32c: bool = False) -> Dict[str, str]:
+    """MD5 (et CRC32C si demandé) d'un fichier, au format des métadonnées GCS."""
+    md5 = hashlib.md5()
+    crc = None
+    if crc32c:
+        # Fourni avec google-cloud-storage ; seul contrôle possible des objets composites
+        import google_crc32c
+        crc = google_crc32c.Checksum()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_BLOCK), b""):
+            md5.update(block)
+            if crc is not None:
+                crc.update(block)
+    checksums = {"md5": _b64(md5.digest())}
+    if crc is not None:
+        checksums["crc32c"] = _b64(crc.digest())
+    return checksums
+
+def verify(obj: RemoteObject, path: str) -> bool:
+    """Taille puis MD5, ou CRC32C pour les objets sans MD5 (objets composites)."""
+    if os.path.getsize(path) != obj.size:
+        return False
+    if obj.md5:
+        return file_checksums(path)["md5"] == obj.md5
+    if obj.crc32c:
+        return file_checksums(path, crc32c=True)["crc32c"] == obj.crc32c
+    return True
+
+def load_download_manifest(index_dir: str) -> Dict[str, Dict]:
+    try:
+        with open(os.path.join(index_dir, DOWNLOAD_MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)["files"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return {}
+
+def remote_version(objects: List[RemoteObject]) -> str:
+    """Empreinte courte de la liste des objets (noms et empreintes)."""
+    digest = hashlib.sha256()
+    for obj in sorted(objects, key=lambda o: o.name):
+        digest.update(json.dumps([obj.name, obj.fingerprint()]).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+# ============================================================================
+# TÉLÉCHARGEMENT
+# ============================================================================
+
+def _link_or_copy(src: str, dest: str):
+    # Les fichiers publiés ne sont jamais réécrits : un lien physique suffit
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+def _clean_staging(staging_dir: str, names: set):
+    """Retire d'une tentative précédente les fichiers partiels ou qui ne sont plus publiés."""
+    for folder, _, filenames in os.walk(staging_dir):
+        for filename in filenames:
+            path = os.path.join(folder, filename)
+            if os.path.relpath(path, staging_dir).replace(os.sep, "/") not in names:
+                os.remove(path)
+
+def fetch_index(backend: StorageBackend, index_dir: str = INDEX_DIR,
+                workers: int = DOWNLOAD_CONFIG["workers"], retries: int = DOWNLOAD_CONFIG["retries"]) -> Dict:
+    """
+    Met `index_dir` à jour depuis `backend` ; retourne les statistiques
+    (fichiers téléchargés / inchangés / repris, octets, débit).
+    """
+    start = time.perf_counter()
+    objects = backend.list()
+    if not objects:
+        raise FileNotFoundError("Aucun fichier à télécharger pour cet index")
+
+    # Version publiée active, ou index d'origine avant la première publication
+    current_dir = active_index_dir(index_dir)
+    active = load_download_manifest(current_dir)
+    files = {obj.name: obj.fingerprint() for obj in objects}
+    stats = {"files": len(objects), "downloaded": 0, "unchanged": 0, "resumed": 0,
+             "bytes": 0, "total_bytes": sum(obj.size for obj in objects)}
+    if active == files and all(os.path.exists(os.path.join(current_dir, name)) for name in files):
+        stats["unchanged"] = len(objects)
+        stats["seconds"] = time.perf_counter() - start
+        print("✅ Index déjà à jour, rien à télécharger.")
+        return stats
+
+    # Dossier fixe (et non temporaire) : une tentative interrompue reprend
+    # là où elle s'était arrêtée ; il est sur le même système de fichiers
+    # que l'index pour la publication atomique
+    staging_dir = f"{os.path.abspath(index_dir)}.download"
+    os.makedirs(staging_dir, exist_ok=True)
+    _clean_staging(staging_dir, set(files))
+
+    def fetch(obj: RemoteObject) -> str:
+        dest = os.path.join(staging_dir, obj.name)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if os.path.exists(dest) and verify(obj, dest):
+            return "resumed"
+        current = os.path.join(current_dir, obj.name)
+        if active.get(obj.name) == files[obj.name] and os.path.exists(current) \
+                and os.path.getsize(current) == obj.size:
+            _link_or_copy(current, dest)
+            return "unchanged"
+        part = f"{dest}.part"
+        for attempt in range(1, retries + 1):
+            backend.download(obj, part)
+            if verify(obj, part):
+                os.replace(part, dest)
+                return "downloaded"
+            os.remove(part)
+            print(f"⚠️ Empreinte invalide pour {obj.name} (tentative {attempt}/{retries})")
+        raise ChecksumMismatch(obj.name, retries)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(fetch, obj): obj for obj in objects}
+        try:
+            for future in as_completed(futures):
+                outcome = future.result()
+                stats[outcome] += 1
+                if outcome == "downloaded":
+                    stats["bytes"] += futures[future].size
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    with open(os.path.join(staging_dir, DOWNLOAD_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"files": files}, f, indent=2)
+    # Nom de version unique par contenu : la version active n'est jamais écrasée
+    manifest = load_manifest(staging_dir)
+    digest = remote_version(objects)
+    version = f"{manifest['version']}-{digest[:6]}" if manifest else digest
+    publish_index(staging_dir, index_dir, version)
+
+    stats["seconds"] = time.perf_counter() - start
+    print(f"📦 Index {version} publié : {stats['downloaded']} téléchargés, {stats['unchanged']} inchangés, "
+          f"{stats['resumed']} repris sur {stats['files']} fichiers ; {stats['bytes'] / 1e6:.1f} Mo "
+          f"en {stats['seconds']:.2f} s ({stats['bytes'] / 1e6 / max(stats['seconds'], 1e-9):.1f} Mo/s)")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Télécharge l'index FAISS publié (GCS ou dossier local)")
+    parser.add_argument("source", nargs="?", default=DOWNLOAD_CONFIG["source"],
+                        help="gs://bucket/prefix ou dossier (défaut : FAISS_BUCKET)")
+    parser.add_argument("--dir", default=INDEX_DIR, help="dossier de l'index (défaut : FAISS_DIR)")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_CONFIG["workers"])
+    args = parser.parse_args()
+
+    if not args.source:
+        print("ℹ️ Aucun FAISS_BUCKET fourni : index local utilisé tel quel.")
+        return
+    print(f"⬇️ Téléchargement de l'index depuis {args.source} vers {args.dir}...")
+    try:
+        fetch_index(backend_for(args.source), args.dir, workers=args.workers)
+    except (ChecksumMismatch, FileNotFoundError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Étape d'embedding pour la construction de l'index : encodage par lots,
+répartition optionnelle sur plusieurs processus et cache disque des vecteurs
+indexé par (modèle, empreinte du texte).
+
+Le cache est un fichier float32 brut ouvert en mémoire mappée (np.memmap) :
+une reconstruction relit les vecteurs déjà calculés sans recharger le modèle
+pour les textes inchangés.
+"""
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# ============================================================================
+# CACHE DISQUE DES VECTEURS
+# ============================================================================
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingStore:
+    """
+    Cache append-only des vecteurs d'un modèle :
+        <cache_dir>/<modèle>/vectors.f32  vecteurs float32 (memmap)
+        <cache_dir>/<modèle>/keys.txt     empreinte du texte, une ligne par vecteur
+    """
+
+    def __init__(self, cache_dir: str, model_name: str):
+        slug = re.sub(r"[^\w.-]+", "_", model_name)
+        self.path = os.path.join(cache_dir, slug)
+        self.model_name = model_name
+        self._vectors_path = os.path.join(self.path, "vectors.f32")
+        self._keys_path = os.path.join(self.path, "keys.txt")
+        self._meta_path = os.path.join(self.path, "meta.json")
+        self.dim: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        self._matrix: Optional[np.memmap] = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+        with open(self._keys_path, "r", encoding="utf-8") as f:
+            keys = f.read().split()
+        # Une écriture interrompue peut laisser plus de clés que de vecteurs complets
+        count = min(len(keys), os.path.getsize(self._vectors_path) // (4 * self.dim))
+        self._rows = {key: row for row, key in enumerate(keys[:count])}
+        self._open_matrix(count)
+
+    def _open_matrix(self, count: int):
+        self._matrix = None
+        if count:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(count, self.dim))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self._rows.get(key)
+        return None if row is None else self._matrix[row]
+
+    def add(self, keys: List[str], vectors: np.ndarray):
+        """Ajoute des vecteurs en fin de fichier puis ré-ouvre la vue mappée."""
+        if not keys:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            os.makedirs(self.path, exist_ok=True)
+            self.dim = int(vectors.shape[1])
+            with open(self._meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model_name, "dim": self.dim}, f)
+        count = len(self._rows)
+        with open(self._vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self._keys_path, "a", encoding="utf-8") as f:
+            f.write("".join(f"{key}\n" for key in keys))
+        for offset, key in enumerate(keys):
+            self._rows[key] = count + offset
+        self._open_matrix(len(self._rows))
+
+# ============================================================================
+# ENCODAGE PAR LOTS (MULTI-PROCESSUS)
+# ============================================================================
+
+def huggingface_factory(model_name: str) -> Embeddings:
+    """Fabrique par défaut ; appelée une fois par processus de travail."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+_worker_model: Optional[Embeddings] = None
+
+def _init_worker(factory: Callable[[str], Embeddings], model_name: str, threads: int):
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_model = factory(model_name)
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_model.embed_documents(texts), dtype=np.float32)
+
+class BatchEmbedder(Embeddings):
+    """
+    Embeddings LangChain pour l'indexation : consulte le cache disque, encode
+    les textes manquants par lots de `batch_size` (sur `workers` processus si
+    > 1) et enregistre les nouveaux vecteurs.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 64, workers: int = 1,
+                 cache_dir: Optional[str] = None,
+                 factory: Callable[[str], Embeddings] = huggingface_factory,
+                 cache_name: Optional[str] = None):
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.factory = factory
+        # `cache_name` sépare les vecteurs d'encodeurs différents d'un même modèle
+        self.store = EmbeddingStore(cache_dir, cache_name or model_name) if cache_dir else None
+        self._model: Optional[Embeddings] = None
+        # Processus d'encodage gardés entre deux lots (un modèle chargé par processus)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.stats = {"cached": 0, "encoded": 0}
+
+    @property
+    def model(self) -> Embeddings:
+        if self._model is None:
+            self._model = self.factory(self.model_name)
+        return self._model
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if self.workers == 1 or len(batches) == 1:
+            return np.concatenate([np.asarray(self.model.embed_documents(b), dtype=np.float32) for b in batches])
+
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self.factory, self.model_name, threads))
+        return np.concatenate(list(self._pool.map(_encode_in_worker, batches)))
+
+    def close(self):
+        """Arrête les processus d'encodage (fin de l'indexation)."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_hash(t) for t in texts]
+        vectors: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            cached = self.store.get(key) if self.store is not None else None
+            if cached is not None:
+                vectors[key] = cached
+            else:
+                missing[key] = text
+
+        if missing:
+            encoded = self._encode(list(missing.values()))
+            if self.store is not None:
+                self.store.add(list(missing), encoded)
+            vectors.update(zip(missing, encoded))
+
+        self.stats["cached"] += len(texts) - len(missing)
+        self.stats["encoded"] += len(missing)
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
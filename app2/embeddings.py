@@ -1,34 +1,165 @@
 import os
 import shutil
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from load_docs import load_all_can2025_data
+import sys
+import time
+from typing import Dict, Iterable, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from ann_index import FLAT_SETTINGS, build_index, effective_settings
+from config import EMBEDDING_CONFIG, EMBEDDING_MODEL, INDEX_CONFIG, INDEX_DIR
+from docstore import DocstoreWriter, load_vector_store, save_vector_store
+from embedding_pipeline import BatchEmbedder
+from query_encoder import configured_factory, encoder_id
+from lexical_index import BM25Builder
+from index_store import (active_index_dir, build_manifest, content_hash, load_manifest, new_staging_dir, publish_index,
+                         write_manifest)
+from load_docs import iter_batches, iter_can2025_documents
 
-# Initialisation du modèle d'embedding
-embedding_model = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
+# Initialisation du modèle d'embedding : encodage par lots, multi-processus
+# optionnel et réutilisation des vecteurs déjà calculés lors des runs précédents.
+# L'encodeur (torch ou onnx) est enregistré dans le manifeste ; le cache de
+# vecteurs est propre à chaque encodeur
+ENCODER = encoder_id(EMBEDDING_CONFIG)
+embedding_model = BatchEmbedder(
+    model_name=EMBEDDING_MODEL,
+    batch_size=EMBEDDING_CONFIG["batch_size"],
+    workers=EMBEDDING_CONFIG["workers"],
+    cache_dir=EMBEDDING_CONFIG["cache_dir"] or None,
+    factory=configured_factory,
+    cache_name=EMBEDDING_MODEL if ENCODER == "torch" else f"{EMBEDDING_MODEL}@{ENCODER}"
 )
 
-def create_vector_db():
-    # Appel de votre fonction telle qu'elle est nommée dans load_docs.py
-    chunks = load_all_can2025_data()
-    
-    if not chunks:
+def load_previous_index(index_dir: str):
+    """Charge l'index existant et son manifeste s'ils sont réutilisables, sinon (None, None)."""
+    manifest = load_manifest(index_dir)
+    if manifest is None or manifest.get("model") != EMBEDDING_MODEL:
+        return None, None
+    # Pas de mélange de vecteurs d'encodeurs différents dans un même index
+    if manifest.get("encoder", "torch") != ENCODER:
+        return None, None
+    # Seul un index exact permet de retirer des vecteurs et de relire les vecteurs d'origine
+    if manifest.get("index", FLAT_SETTINGS)["type"] != "flat":
+        return None, None
+
+    vector_db = load_vector_store(index_dir, embedding_model, writable=True)
+    # Le manifeste doit décrire exactement les vecteurs présents dans l'index
+    if set(vector_db.index_to_docstore_id.values()) != set(manifest["documents"]):
+        print("⚠️ Manifeste incohérent avec l'index, reconstruction complète.")
+        return None, None
+    return vector_db, manifest
+
+def stream_index(documents: Iterable[Document], embedder, staging_dir: str, batch_size: int) -> Tuple[Dict, Dict]:
+    """
+    Construction complète au fil de l'eau : chaque lot de documents est
+    encodé puis ajouté à l'index FAISS, au docstore et à l'index BM25 avant
+    de lire le suivant. En mémoire : les vecteurs de l'index, les postings
+    BM25 et les empreintes, jamais l'ensemble des documents.
+    Retourne (empreintes des documents indexés, paramètres de l'index).
+    """
+    import faiss
+    hashes: Dict[str, str] = {}
+    index = None
+    lexical = BM25Builder()
+    with DocstoreWriter(staging_dir) as docstore:
+        for batch in iter_batches(documents, batch_size):
+            vectors = np.asarray(embedder.embed_documents([doc.page_content for doc in batch]), dtype=np.float32)
+            if index is None:
+                index = faiss.IndexFlatL2(vectors.shape[1])
+            index.add(vectors)
+            docstore.add(batch)
+            for doc in batch:
+                lexical.add(doc.id, doc.page_content)
+                hashes[doc.id] = content_hash(doc)
+            print(f"  🧠 {len(docstore)} documents indexés")
+
+    # Index exact construit ci-dessus converti au type choisi (INDEX_CONFIG) ;
+    # les positions, donc la correspondance avec le docstore, sont conservées
+    settings = effective_settings(INDEX_CONFIG, index.ntotal, index.d)
+    if settings["type"] != "flat":
+        start = time.perf_counter()
+        index = build_index(index.reconstruct_n(0, index.ntotal), settings)
+        print(f"🧭 Index {settings['type']} construit en {time.perf_counter() - start:.2f} s ({settings})")
+    faiss.write_index(index, os.path.join(staging_dir, "index.faiss"))
+    lexical.build().save(staging_dir)
+    return hashes, settings
+
+def update_index(vector_db, manifest: Dict, staging_dir: str):
+    """
+    Ré-indexation incrémentale d'un index exact : seuls les documents
+    nouveaux ou modifiés sont ré-encodés, les documents disparus ou
+    modifiés sont retirés. Retourne les empreintes des documents indexés
+    et les paramètres de l'index.
+    """
+    previous = manifest["documents"]
+    # Empreintes recalculées dans ce passage : les sources ont pu changer
+    # depuis le premier, le manifeste doit décrire ce qui est réellement indexé.
+    # Index lexical reconstruit à chaque fois (peu coûteux, aucun encodage)
+    lexical = BM25Builder()
+    hashes, changed = {}, []
+    for doc in iter_can2025_documents(verbose=False):
+        lexical.add(doc.id, doc.page_content)
+        hashes[doc.id] = content_hash(doc)
+        if previous.get(doc.id) != hashes[doc.id]:
+            changed.append(doc)
+    stale_ids = [doc_id for doc_id, h in previous.items() if hashes.get(doc_id) != h]
+
+    print(f"🧠 Mise à jour incrémentale : {len(changed)} à encoder, "
+          f"{len(stale_ids)} à retirer, {len(hashes) - len(changed)} inchangés")
+    if stale_ids:
+        vector_db.delete(stale_ids)
+    if changed:
+        vector_db.add_documents(changed, ids=[doc.id for doc in changed])
+
+    # index.faiss + docstore mappé : le serveur ne désérialise aucun pickle
+    save_vector_store(vector_db, staging_dir)
+    lexical.build().save(staging_dir)
+    return hashes, effective_settings(INDEX_CONFIG, vector_db.index.ntotal, vector_db.index.d)
+
+def create_vector_db(index_dir: str = INDEX_DIR, full_rebuild: bool = False):
+    # Premier passage sur les sources : empreintes seulement (aucun document
+    # gardé), pour savoir s'il y a quelque chose à encoder
+    hashes = {doc.id: content_hash(doc) for doc in iter_can2025_documents()}
+
+    if not hashes:
         print("⚠️ Aucun document trouvé. Vérifiez vos fichiers JSON et votre config.")
         return
 
-    # Gestion du dossier de l'index
-    if os.path.exists("faiss_index_can2025"):
-        shutil.rmtree("faiss_index_can2025")
+    published = load_manifest(active_index_dir(index_dir))
+    if (not full_rebuild and published is not None and published.get("model") == EMBEDDING_MODEL
+            and published["documents"] == hashes
+            and published.get("encoder", "torch") == ENCODER
+            and published.get("index", FLAT_SETTINGS)["type"] == INDEX_CONFIG["type"]):
+        print("✅ Index déjà à jour, rien à ré-encoder.")
+        return
+
+    # Les index approximatifs sont reconstruits entièrement : le cache
+    # d'embeddings évite de ré-encoder les documents inchangés
+    vector_db, manifest = (None, None)
+    if not full_rebuild and INDEX_CONFIG["type"] == "flat":
+        vector_db, manifest = load_previous_index(active_index_dir(index_dir))
 
-    print("🧠 Création de l'index FAISS en cours...")
-    # Création de la base de données vectorielle à partir de vos chunks
-    vector_db = FAISS.from_documents(chunks, embedding_model)
-    
-    # Sauvegarde locale
-    vector_db.save_local("faiss_index_can2025")
-    print("💾 Indexation terminée avec succès !")
+    # Écriture dans un dossier temporaire puis publication atomique :
+    # un serveur en cours d'exécution ne voit jamais un index à moitié écrit
+    staging_dir = new_staging_dir(index_dir)
+    try:
+        if vector_db is None:
+            batch_size = EMBEDDING_CONFIG["ingest_batch_size"]
+            print(f"🧠 Création de l'index FAISS en cours (lots de {batch_size} documents)...")
+            hashes, settings = stream_index(iter_can2025_documents(verbose=False), embedding_model,
+                                            staging_dir, batch_size)
+        else:
+            hashes, settings = update_index(vector_db, manifest, staging_dir)
+        new_manifest = build_manifest(hashes, EMBEDDING_MODEL, index=settings, encoder=ENCODER)
+        write_manifest(staging_dir, new_manifest)
+        index_size = os.path.getsize(os.path.join(staging_dir, "index.faiss"))
+        publish_index(staging_dir, index_dir, new_manifest["version"])
+    finally:
+        embedding_model.close()
+        if os.path.exists(staging_dir):
+            shutil.rmtree(staging_dir)
+    print(f"💾 Indexation terminée avec succès ! (version {new_manifest['version']}, index {settings['type']} "
+          f"de {index_size / 1024:.0f} Ko, {embedding_model.stats['encoded']} encodés, "
+          f"{embedding_model.stats['cached']} depuis le cache)")
 
 if __name__ == "__main__":
-    create_vector_db()
-    
\ No newline at end of file
+    create_vector_db(full_rebuild="--full" in sys.argv)
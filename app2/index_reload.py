@@ -0,0 +1,219 @@
+"""
+Rechargement à chaud de l'index FAISS dans le serveur en marche.
+
+Une nouvelle version publiée par embeddings.py ou download_faiss.py (lien
+symbolique faiss_index_can2025.current remplacé, voir index_store.publish_index)
+est détectée par une surveillance périodique ou signalée par l'endpoint
+d'administration. Elle est chargée et préchauffée dans un thread de fond,
+puis remplace l'index actif d'un coup. Chaque requête emprunte la
+génération active au début de son traitement (`lease`) et la garde
+jusqu'au bout : les requêtes en cours terminent sur l'ancien index, libéré
+quand la dernière a fini.
+"""
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from index_store import MANIFEST_FILE, active_index_dir
+from index_version import compute_index_version
+from metrics import REGISTRY
+
+INDEX_RELOADS = REGISTRY.counter(
+    "rag_index_reloads_total", "Rechargements de l'index FAISS par résultat", ["result"])
+INDEX_INFO = REGISTRY.gauge("rag_index_info", "Version de l'index FAISS actif (valeur 1)", ["version"])
+
+class IndexGeneration:
+    """Une version chargée de l'index : retriever prêt à l'emploi et requêtes qui l'utilisent."""
+
+    def __init__(self, version: str, path: str, retriever: Any):
+        self.version = version
+        self.path = path
+        self.retriever = retriever
+        self.loaded_at = time.time()
+        self.users = 0
+        self.retired = False
+
+    def release(self):
+        """Abandonne le retriever : index, docstore mappé et BM25 sont libérés par le ramasse-miettes."""
+        self.retriever = None
+        print(f"♻️ Index {self.version} libéré")
+
+    def as_dict(self) -> Dict:
+        return {"version": self.version, "path": self.path, "in_flight": self.users,
+                "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.loaded_at))}
+
+class IndexReloader:
+    """
+    Génération active de l'index et chargement des suivantes.
+    `loader(path)` construit le retriever d'une version (dossier résolu) ;
+    `on_swap(generation)` est appelé après chaque remplacement.
+    """
+
+    def __init__(self, index_dir: str, loader: Callable[[str], Any],
+                 on_swap: Optional[Callable[[IndexGeneration], None]] = None):
+        self.index_dir = index_dir
+        self.loader = loader
+        self.on_swap = on_swap
+        self._current: Optional[IndexGeneration] = None
+        self._retired: List[IndexGeneration] = []
+        self._lock = threading.Lock()
+        self._loading: Optional[threading.Thread] = None
+        self._fingerprint: Optional[Tuple] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.last_error: Optional[str] = None
+        REGISTRY.gauge("rag_index_generations", "Versions de l'index en mémoire (active + en cours de libération)"
+                       ).set_function(lambda: len(self._retired) + (self._current is not None))
+
+    @property
+    def current(self) -> Optional[IndexGeneration]:
+        return self._current
+
+    @property
+    def loading(self) -> bool:
+        return self._loading is not None and self._loading.is_alive()
+
+    # ------------------------------------------------------------------
+    # Emprunt par les requêtes
+    # ------------------------------------------------------------------
+
+    def acquire(self, generation: Optional[IndexGeneration] = None) -> IndexGeneration:
+        """
+        Emprunte la génération active, ou `generation` déjà empruntée par
+        l'appelant (calcul qui lui survit) ; à rendre avec release().
+        """
+        with self._lock:
+            generation = generation or self._current
+            generation.users += 1
+        return generation
+
+    def release(self, generation: IndexGeneration):
+        """Rend une génération ; une version remplacée est libérée au dernier emprunt rendu."""
+        with self._lock:
+            generation.users -= 1
+            done = generation.retired and generation.users == 0
+            if done:
+                self._retired.remove(generation)
+        if done:
+            generation.release()
+
+    @contextmanager
+    def lease(self):
+        """Génération active, garantie chargée jusqu'à la sortie du bloc `with`."""
+        generation = self.acquire()
+        try:
+            yield generation
+        finally:
+            self.release(generation)
+
+    # ------------------------------------------------------------------
+    # Chargement
+    # ------------------------------------------------------------------
+
+    def fingerprint(self) -> Tuple:
+        """Dossier pointé par le lien de l'index et date de son manifeste : peu coûteux à surveiller."""
+        path = os.path.realpath(active_index_dir(self.index_dir))
+        for filename in (MANIFEST_FILE, "index.faiss"):
+            try:
+                return path, os.stat(os.path.join(path, filename)).st_mtime_ns
+            except FileNotFoundError:
+                continue
+        return path, None
+
+    def load(self) -> str:
+        """
+        Charge la version publiée et la rend active (thread appelant).
+        Retourne "swapped", ou "unchanged" si c'est déjà la version active.
+        """
+        fingerprint = self.fingerprint()
+        path = fingerprint[0]
+        version = compute_index_version(path)
+        if self._current is not None and version == self._current.version:
+            self._fingerprint = fingerprint
+            INDEX_RELOADS.inc(result="unchanged")
+            return "unchanged"
+
+        start = time.perf_counter()
+        generation = IndexGeneration(version, path, self.loader(path))
+        with self._lock:
+            previous, self._current = self._current, generation
+            if previous is not None:
+                previous.retired = True
+                idle = previous.users == 0
+                if not idle:
+                    self._retired.append(previous)
+        self._fingerprint = fingerprint
+        if previous is not None:
+            INDEX_INFO.remove(version=previous.version)
+        INDEX_INFO.set(1, version=version)
+        INDEX_RELOADS.inc(result="swapped")
+        if self.on_swap is not None:
+            self.on_swap(generation)
+        print(f"🔄 Index {version} actif ({time.perf_counter() - start:.1f} s)"
+              + (f", remplace {previous.version}" if previous is not None else ""))
+        if previous is not None and idle:
+            previous.release()
+        return "swapped"
+
+    def reload(self) -> bool:
+        """Lance le chargement en arrière-plan ; False si un chargement est déjà en cours."""
+        with self._lock:
+            if self.loading:
+                return False
+            self._loading = threading.Thread(target=self._reload, name="rag-index-reload", daemon=True)
+            self._loading.start()
+        return True
+
+    def _reload(self):
+        try:
+            self.load()
+            self.last_error = None
+        except Exception as e:
+            # L'index actif reste en service ; nouvelle tentative au prochain changement détecté
+            self._fingerprint = self.fingerprint()
+            self.last_error = str(e)
+            INDEX_RELOADS.inc(result="failed")
+            print(f"❌ Échec du rechargement de l'index : {e}")
+            traceback.print_exc()
+
+    def check(self) -> bool:
+        """Recharge si le lien ou le manifeste de l'index a changé ; True si un chargement est lancé."""
+        if self.fingerprint() == self._fingerprint:
+            return False
+        return self.reload()
+
+    # ------------------------------------------------------------------
+    # Surveillance
+    # ------------------------------------------------------------------
+
+    def watch(self, interval: float):
+        """Vérifie la version publiée toutes les `interval` secondes (0 : pas de surveillance)."""
+        if interval <= 0 or self._watcher is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.check()
+                except Exception as e:
+                    print(f"⚠️ Surveillance de l'index : {e}")
+
+        self._watcher = threading.Thread(target=loop, name="rag-index-watch", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> Dict:
+        with self._lock:
+            status = {
+                "active": self._current.as_dict() if self._current is not None else None,
+                "draining": [g.as_dict() for g in self._retired],
+                "loading": self.loading
+            }
+        if self.last_error:
+            status["last_error"] = self.last_error
+        return status
@@ -0,0 +1,139 @@
+"""
+Gestion du dossier de l'index FAISS sur disque : manifeste des documents
+indexés (identifiant -> empreinte du contenu) et publication atomique d'une
+nouvelle version de l'index.
+
+Disposition sur disque :
+    faiss_index_can2025/           -> index d'origine (suivi par git), jamais modifié
+    faiss_index_can2025.current    -> lien symbolique vers la version publiée active
+    faiss_index_can2025.versions/  -> un sous-dossier par version publiée
+
+Les lecteurs passent par active_index_dir() : dernière version publiée,
+sinon l'index d'origine.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Optional
+
+from langchain_core.documents import Document
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_FORMAT = 1
+
+# ============================================================================
+# MANIFESTE
+# ============================================================================
+
+def content_hash(doc: Document) -> str:
+    """Empreinte du texte et des métadonnées d'un document."""
+    digest = hashlib.sha256()
+    digest.update(doc.page_content.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(doc.metadata, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+def build_manifest(documents: Dict[str, str], model: str, **extra) -> Dict:
+    """
+    Construit le manifeste ; la version dépend du modèle, de chaque empreinte
+    et des champs supplémentaires (ex: type d'index).
+    """
+    digest = hashlib.sha256(model.encode("utf-8"))
+    for doc_id in sorted(documents):
+        digest.update(f"\n{doc_id}\0{documents[doc_id]}".encode("utf-8"))
+    if extra:
+        digest.update(json.dumps(extra, sort_keys=True).encode("utf-8"))
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "version": digest.hexdigest()[:12],
+        "model": model,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "documents": documents
+    }
+    manifest.update(extra)
+    return manifest
+
+def load_manifest(index_dir: str) -> Optional[Dict]:
+    """Lit le manifeste d'un index ; None s'il est absent ou illisible."""
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get("format") != MANIFEST_FORMAT:
+        return None
+    return manifest
+
+def write_manifest(index_dir: str, manifest: Dict):
+    with open(os.path.join(index_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+# ============================================================================
+# PUBLICATION ATOMIQUE
+# ============================================================================
+
+def new_staging_dir(index_dir: str) -> str:
+    """Dossier temporaire sur le même système de fichiers que l'index."""
+    parent = os.path.dirname(os.path.abspath(index_dir))
+    return tempfile.mkdtemp(prefix=f"{os.path.basename(index_dir)}.staging-", dir=parent)
+
+def versions_dir(index_dir: str) -> str:
+    return f"{os.path.abspath(index_dir)}.versions"
+
+def current_link(index_dir: str) -> str:
+    return f"{os.path.abspath(index_dir)}.current"
+
+def active_index_dir(index_dir: str) -> str:
+    """Dossier de l'index à lire : version publiée active, sinon `index_dir` lui-même."""
+    link = current_link(index_dir)
+    return link if os.path.lexists(link) else index_dir
+
+def publish_index(staging_dir: str, index_dir: str, version: str, keep: int = 2) -> str:
+    """
+    Publie `staging_dir` comme nouvelle version de `index_dir`.
+    Le lien `<index_dir>.current` est remplacé par os.replace : un serveur
+    qui ouvre l'index voit soit l'ancienne version complète, soit la
+    nouvelle. `index_dir` (suivi par git) n'est jamais déplacé ni modifié.
+    Une version déjà publiée (même empreinte de contenu) est gardée telle
+    quelle : elle peut être active et mappée par les workers.
+    """
+    root = versions_dir(index_dir)
+    os.makedirs(root, exist_ok=True)
+    target = os.path.join(root, version)
+    if os.path.exists(target):
+        shutil.rmtree(staging_dir)
+    else:
+        os.replace(staging_dir, target)
+
+    link = current_link(index_dir)
+    link_tmp = f"{link}.link-tmp"
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    try:
+        os.symlink(os.path.relpath(target, os.path.dirname(link)), link_tmp, target_is_directory=True)
+        os.replace(link_tmp, link)
+    except OSError:
+        # Pas de liens symboliques (ex: Windows sans privilèges) : copie classique
+        if os.path.islink(link):
+            os.remove(link)
+        elif os.path.exists(link):
+            shutil.rmtree(link)
+        shutil.copytree(target, link)
+
+    _prune_versions(root, active=version, keep=keep)
+    return target
+
+def _prune_versions(root: str, active: str, keep: int):
+    """Supprime les anciennes versions en gardant les `keep` plus récentes."""
+    entries = sorted(
+        (e for e in os.scandir(root) if e.is_dir() and e.name != active),
+        key=lambda e: e.stat().st_mtime,
+        reverse=True
+    )
+    # La version active compte dans `keep` ; la précédente reste pour les lecteurs en cours
+    for entry in entries[max(0, keep - 1):]:
+        shutil.rmtree(entry.path, ignore_errors=True)
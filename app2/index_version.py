@@ -0,0 +1,32 @@
+"""
+Identifiant de version de l'index FAISS, utilisé pour invalider tout ce qui
+dépend de son contenu (cache de réponses, etc.).
+"""
+import hashlib
+import os
+
+from index_store import load_manifest
+
+INDEX_FILES = ("index.faiss", "index.pkl", "docstore.json", "docstore.bin")
+
+def compute_index_version(index_dir: str) -> str:
+    """
+    Version déclarée par le manifeste de l'index, sinon empreinte courte du
+    contenu de ses fichiers ("absent" si l'index n'existe pas).
+    """
+    manifest = load_manifest(index_dir)
+    if manifest is not None:
+        return manifest["version"]
+
+    digest = hashlib.sha256()
+    found = False
+    for filename in INDEX_FILES:
+        path = os.path.join(index_dir, filename)
+        if not os.path.exists(path):
+            continue
+        found = True
+        digest.update(filename.encode("utf-8"))
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:12] if found else "absent"
@@ -1,9 +1,28 @@
+import json
 import streamlit as st
 import requests
 
 st.set_page_config(page_title="CAN 2025 Chatbot", page_icon="⚽")
 st.title("⚽ CAN 2025 Chatbot")
 
+def stream_answer(res):
+    """Lit le flux SSE de /chat/stream et renvoie les tokens au fil de l'eau."""
+    event = "message"
+    for line in res.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data = json.loads(line[len("data:"):].strip())
+            if event == "token":
+                yield data.get("token", "")
+            elif event == "done" and data.get("session_id"):
+                # Session côté serveur : les relances sont comprises dans le contexte de l'échange
+                st.session_state.session_id = data["session_id"]
+            elif event == "error":
+                yield f"\n\n{data.get('response', 'Erreur serveur.')}"
+        elif not line:
+            event = "message"
+
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
@@ -19,12 +38,18 @@ if prompt := st.chat_input("Posez votre question sur la CAN 2025..."):
 
     with st.chat_message("assistant"):
         try:
-            res = requests.post("http://127.0.0.1:8000/chat", json={"query": prompt})
-            if res.status_code == 200:
-                answer = res.json().get("response", "Pas de réponse.")
-                st.markdown(answer)
-                st.session_state.messages.append({"role": "assistant", "content": answer})
-            else:
-                st.error("Le serveur ne répond pas.")
+            with requests.post("http://127.0.0.1:8000/chat/stream", json={"query": prompt, "session_id": st.session_state.get("session_id"), "use_session": True}, stream=True) as res:
+                if res.status_code == 200:
+                    answer = st.write_stream(stream_answer(res)) or "Pas de réponse."
+                    st.session_state.messages.append({"role": "assistant", "content": answer})
+                elif res.status_code in (429, 503):
+                    # 429 : serveur saturé ; 503 : modèles et index en cours de chargement
+                    st.warning(res.json().get("response", "Serveur indisponible, réessayez."))
+                elif res.status_code >= 500:
+                    # 502 : erreur Gemini ; 504 : délai dépassé ; request_id pour retrouver le log
+                    data = res.json()
+                    st.error(f"{data.get('response', 'Erreur serveur.')} (requête {data.get('request_id', '?')})")
+                else:
+                    st.error("Le serveur ne répond pas.")
         except Exception as e:
-            st.error(f"Erreur de connexion : {e}")
\ No newline at end of file
+            st.error(f"Erreur de connexion : {e}")
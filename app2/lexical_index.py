@@ -0,0 +1,133 @@
+"""
+Index lexical BM25 construit sur les mêmes documents que l'index FAISS.
+
+L'embedding MiniLM distingue mal les jetons exacts (noms de famille,
+"Match 52", dates, scores "2-1") : l'index lexical les retrouve, et ses
+résultats sont fusionnés avec la recherche dense (retrieval.py).
+
+Persisté à côté de l'index FAISS dans `lexical.json`.
+"""
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from alias_index import normalize_key
+
+LEXICAL_FILE = "lexical.json"
+LEXICAL_FORMAT = 1
+
+# Jetons composés conservés tels quels : "1 - 1" -> "1_1", "Match 52" -> "match_52"
+_SCORE = re.compile(r"\b(\d{1,2})\s*[-–:]\s*(\d{1,2})\b")
+_NUMBERED = re.compile(r"\b(match\s+\d{1,2}|groupe\s+[a-h])\b", re.IGNORECASE)
+
+STOPWORDS = {
+    "a", "au", "aux", "avec", "ce", "ces", "cette", "dans", "de", "des", "du",
+    "en", "est", "et", "il", "la", "le", "les", "leur", "ou", "par", "pour",
+    "qu", "que", "quel", "quelle", "quels", "quelles", "qui", "quoi", "sa",
+    "se", "son", "sont", "sur", "un", "une", "vs", "contre", "the", "of"
+}
+
+def tokenize(text: str) -> List[str]:
+    """Jetons normalisés (sans accents ni casse) hors mots vides."""
+    text = _SCORE.sub(r" \1_\2 ", text)
+    text = _NUMBERED.sub(lambda m: "_".join(m.group(1).split()), text)
+    return [t for t in normalize_key(text).split() if t not in STOPWORDS]
+
+class BM25Index:
+    """Postings terme -> [(document, fréquence)] et scoring BM25 (Okapi)."""
+
+    def __init__(self, doc_ids: List[str], postings: Dict[str, List[Tuple[int, int]]],
+                 lengths: List[int], k1: float = 1.5, b: float = 0.75):
+        self.doc_ids = doc_ids
+        self.postings = postings
+        self.lengths = lengths
+        self.k1 = k1
+        self.b = b
+        n = len(doc_ids)
+        self.avg_length = (sum(lengths) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+
+    @classmethod
+    def build(cls, doc_ids: List[str], texts: Iterable[str], **params) -> "BM25Index":
+        builder = BM25Builder()
+        for doc_id, text in zip(doc_ids, texts):
+            builder.add(doc_id, text)
+        return builder.build(**params)
+
+    @classmethod
+    def from_documents(cls, documents: List[Document], **params) -> "BM25Index":
+        return cls.build([doc.id for doc in documents], (doc.page_content for doc in documents), **params)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def search(self, query: str, k: int, allowed: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """Les k meilleurs (identifiant, score), restreints à `allowed` si fourni."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[position] / self.avg_length)
+                scores[position] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if allowed is not None:
+            scores = {p: s for p, s in scores.items() if self.doc_ids[p] in allowed}
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.doc_ids[p], s) for p, s in best]
+
+    # ------------------------------------------------------------------
+    # Persistance
+    # ------------------------------------------------------------------
+
+    def save(self, index_dir: str):
+        data = {
+            "format": LEXICAL_FORMAT,
+            "doc_ids": self.doc_ids,
+            "lengths": self.lengths,
+            "postings": self.postings
+        }
+        with open(os.path.join(index_dir, LEXICAL_FILE), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, index_dir: str, **params) -> Optional["BM25Index"]:
+        """Charge l'index lexical d'un dossier d'index ; None s'il est absent ou illisible."""
+        try:
+            with open(os.path.join(index_dir, LEXICAL_FILE), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if data.get("format") != LEXICAL_FORMAT:
+            return None
+        postings = {term: [tuple(p) for p in docs] for term, docs in data["postings"].items()}
+        return cls(data["doc_ids"], postings, data["lengths"], **params)
+
+class BM25Builder:
+    """Construction incrémentale, document par document (indexation par lots) : seuls les postings sont gardés."""
+
+    def __init__(self):
+        self.doc_ids: List[str] = []
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+    def add(self, doc_id: str, text: str):
+        position = len(self.doc_ids)
+        tokens = tokenize(text)
+        self.doc_ids.append(doc_id)
+        self.lengths.append(len(tokens))
+        for term, count in Counter(tokens).items():
+            self.postings[term].append((position, count))
+
+    def build(self, **params) -> BM25Index:
+        return BM25Index(self.doc_ids, dict(self.postings), self.lengths, **params)
@@ -0,0 +1,453 @@
+"""
+Client LLM résilient devant la chaîne RAG.
+
+Le fournisseur est interchangeable (LLM_CONFIG["provider"]) :
+  gemini  ChatGoogleGenerativeAI, sans ses nouvelles tentatives internes
+  http    API compatible OpenAI (/v1/chat/completions, streaming SSE) sur
+          des connexions HTTP poolées, ex. le serveur factice
+          benchmarks/fake_llm.py qui injecte latence et erreurs
+
+ResilientChatModel enveloppe le fournisseur et reste un chat model
+LangChain (prompt | llm | parser inchangé) :
+  - délai global par appel : premier token et fin du flux dans le budget
+  - couverture (hedging) : sans premier token après `hedge_delay`, une
+    seconde tentative est lancée, la première qui répond gagne
+  - nouvelles tentatives sur erreur transitoire (429, 5xx, réseau)
+  - disjoncteur : après des échecs consécutifs, les appels échouent tout
+    de suite pendant `reset_timeout`, puis un appel d'essai le referme
+
+Quand le LLM ne répond pas dans le budget, LLMUnavailable est levée :
+rag_chain.py répond alors en mode dégradé avec les documents retrouvés.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from metrics import REGISTRY
+
+LLM_REQUESTS = REGISTRY.counter("rag_llm_requests_total", "Appels au LLM par résultat", ["result"])
+LLM_ATTEMPTS = REGISTRY.counter(
+    "rag_llm_attempts_total", "Tentatives envoyées au fournisseur (first, hedge, retry)", ["kind"])
+LLM_WINS = REGISTRY.counter("rag_llm_attempt_wins_total", "Tentative qui a fourni la réponse", ["kind"])
+
+class LLMUnavailable(Exception):
+    """Pas de réponse du LLM : budget dépassé, disjoncteur ouvert ou erreurs répétées."""
+
+    STATUS = {"deadline": 504, "circuit_open": 503, "error": 502}
+
+    def __init__(self, reason: str, cause: Optional[BaseException] = None):
+        detail = f" ({type(cause).__name__}: {cause})" if cause is not None else ""
+        super().__init__(f"LLM indisponible : {reason}{detail}")
+        self.reason = reason
+        self.cause = cause
+        # Lu par tracing.error_status
+        self.http_status = self.STATUS.get(reason, 502)
+
+class ProviderError(Exception):
+    """Réponse HTTP en erreur du fournisseur."""
+
+    def __init__(self, status_code: int, body: str = ""):
+        super().__init__(f"HTTP {status_code} : {body[:200]}")
+        self.status_code = status_code
+
+def is_retryable(e: BaseException) -> bool:
+    """Erreurs transitoires : délai, réseau, 408, 429 et 5xx ; pas les autres 4xx."""
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(e, "code", None)
+    if isinstance(status, int) and 400 <= status < 500:
+        return status in (408, 429)
+    return True
+
+# ============================================================================
+# DISJONCTEUR
+# ============================================================================
+
+class CircuitBreaker:
+    """
+    Fermé tant que les appels réussissent ; ouvert après `failure_threshold`
+    échecs consécutifs. Après `reset_timeout`, un seul appel d'essai passe
+    (semi-ouvert) : sa réussite referme le disjoncteur, son échec le rouvre.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+        states = {self.CLOSED: 0, self.HALF_OPEN: 1, self.OPEN: 2}
+        REGISTRY.gauge("rag_llm_circuit_state", "Disjoncteur du LLM (0 fermé, 1 semi-ouvert, 2 ouvert)"
+                       ).set_function(lambda: states[self.state])
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = self._clock()
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_started = None
+            if self.state == self.HALF_OPEN:
+                # Un appel d'essai à la fois ; un essai abandonné sans résultat est remplacé
+                if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                    return False
+                self._probe_started = now
+            return True
+
+    def success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_started = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"⚡ Disjoncteur LLM ouvert ({self.failures} échecs consécutifs)")
+                self.state = self.OPEN
+                self._opened_at = self._clock()
+                self._probe_started = None
+
+# ============================================================================
+# FOURNISSEUR HTTP (API COMPATIBLE OPENAI)
+# ============================================================================
+
+ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+class HTTPChatModel(BaseChatModel):
+    """
+    Chat model sur une API compatible OpenAI. Un client httpx par processus
+    garde jusqu'à `pool_size` connexions ouvertes (keep-alive) ; à créer
+    dans chaque worker, jamais avant un fork.
+    """
+
+    base_url: str
+    model: str = "fake"
+    api_key: str = ""
+    temperature: float = 0.0
+    pool_size: int = 32
+    connect_timeout: float = 3.0
+    read_timeout: float = 60.0
+
+    _async_client: Any = PrivateAttr(default=None)
+    _client: Any = PrivateAttr(default=None)
+
+    @property
+    def _llm_type(self) -> str:
+        return "http-chat"
+
+    def _options(self) -> Dict:
+        import httpx
+        return {
+            "limits": httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            "timeout": httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            "headers": {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        }
+
+    def _async_http(self):
+        if self._async_client is None:
+            import httpx
+            self._async_client = httpx.AsyncClient(**self._options())
+        return self._async_client
+
+    def _http(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.Client(**self._options())
+        return self._client
+
+    def _payload(self, messages: List[BaseMessage], stop: Optional[List[str]], stream: bool) -> Dict:
+        payload = {
+            "model": self.model,
+            "messages": [{"role": ROLES.get(m.type, "user"), "content": m.content} for m in messages],
+            "temperature": self.temperature,
+            "stream": stream
+        }
+        if stop:
+            payload["stop"] = stop
+        return payload
+
+    @staticmethod
+    def _usage(usage: Optional[Dict]) -> Optional[Dict]:
+        if not usage:
+            return None
+        return {"input_tokens": usage.get("prompt_tokens", 0), "output_tokens": usage.get("completion_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0)}
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        response = self._http().post(f"{self.base_url}/chat/completions",
+                                     json=self._payload(messages, stop, stream=False))
+        if response.status_code >= 400:
+            raise ProviderError(response.status_code, response.text)
+        body = response.json()
+        message = AIMessage(content=body["choices"][0]["message"]["content"],
+                            usage_metadata=self._usage(body.get("usage")))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async with self._async_http().stream("POST", f"{self.base_url}/chat/completions",
+                                             json=self._payload(messages, stop, stream=True)) as response:
+            if response.status_code >= 400:
+                raise ProviderError(response.status_code, (await response.aread()).decode("utf-8", "replace"))
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                choices = event.get("choices") or [{}]
+                token = (choices[0].get("delta") or {}).get("content") or ""
+                usage = self._usage(event.get("usage"))
+                if not token and usage is None:
+                    continue
+                if token and run_manager:
+                    await run_manager.on_llm_new_token(token)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage))
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await collect(self._astream(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+async def collect(chunks: AsyncIterator[ChatGenerationChunk]) -> ChatResult:
+    """Réponse complète à partir d'un flux de morceaux."""
+    result = None
+    async for chunk in chunks:
+        result = chunk if result is None else result + chunk
+    message = result.message if result is not None else AIMessageChunk(content="")
+    return ChatResult(generations=[ChatGeneration(message=AIMessage(
+        content=message.content, usage_metadata=message.usage_metadata))])
+
+# ============================================================================
+# CLIENT RÉSILIENT
+# ============================================================================
+
+class ResilientChatModel(BaseChatModel):
+    """Délai global, couverture, nouvelles tentatives et disjoncteur autour de `provider`."""
+
+    provider: BaseChatModel
+    breaker: Any
+    # Budget d'un appel (secondes), du premier envoi au dernier token
+    deadline: float = 20.0
+    # Seconde tentative sans premier token après ce délai (0 : désactivé)
+    hedge_delay: float = 5.0
+    # Tentatives au plus par appel, couvertures et nouvelles tentatives comprises
+    max_attempts: int = 3
+    retry_backoff: float = 0.2
+
+    @property
+    def _llm_type(self) -> str:
+        return f"resilient-{self.provider._llm_type}"
+
+    async def _open(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict):
+        """Une tentative : flux du fournisseur et son premier morceau (None si la réponse est vide)."""
+        stream = self.provider._astream(messages, stop=stop, **kwargs)
+        try:
+            return stream, await stream.__anext__()
+        except StopAsyncIteration:
+            return stream, None
+        except BaseException:
+            await stream.aclose()
+            raise
+
+    async def _first_response(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict,
+                              deadline: float):
+        """Premier morceau de la tentative la plus rapide ; les autres sont annulées."""
+        loop = asyncio.get_running_loop()
+        pending: Dict[asyncio.Task, str] = {}
+        attempts, error = 0, None
+        next_attempt: Optional[float] = None
+
+        def launch(kind: str):
+            nonlocal attempts, next_attempt
+            attempts += 1
+            LLM_ATTEMPTS.inc(kind=kind)
+            pending[asyncio.ensure_future(self._open(messages, stop, kwargs))] = kind
+            next_attempt = loop.time() + self.hedge_delay if self.hedge_delay > 0 else None
+
+        launch("first")
+        try:
+            while True:
+                now = loop.time()
+                if now >= deadline:
+                    raise LLMUnavailable("deadline", error)
+                wake = deadline
+                if next_attempt is not None and attempts < self.max_attempts:
+                    wake = min(wake, next_attempt)
+                if pending:
+                    done, _ = await asyncio.wait(pending, timeout=max(0.0, wake - now),
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    done = set()
+                    await asyncio.sleep(max(0.0, wake - now))
+
+                for task in done:
+                    kind = pending.pop(task)
+                    if task.exception() is None:
+                        LLM_WINS.inc(kind=kind)
+                        return task.result()
+                    error = task.exception()
+                    if not is_retryable(error):
+                        raise error
+                    # Erreur transitoire : nouvelle tentative après un court délai
+                    retry_at = loop.time() + self.retry_backoff * 2 ** (attempts - 1)
+                    next_attempt = retry_at if next_attempt is None else min(next_attempt, retry_at)
+
+                if not pending and attempts >= self.max_attempts:
+                    raise LLMUnavailable("error", error)
+                if next_attempt is not None and loop.time() >= next_attempt and attempts < self.max_attempts:
+                    launch("retry" if error is not None and not pending else "hedge")
+        finally:
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # Tentative terminée mais pas retenue : erreur lue, flux (connexion poolée) fermé
+                    if task.exception() is None:
+                        await task.result()[0].aclose()
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if not self.breaker.allow():
+            LLM_REQUESTS.inc(result="circuit_open")
+            raise LLMUnavailable("circuit_open")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        try:
+            stream, chunk = await self._first_response(messages, stop, kwargs, deadline)
+        except LLMUnavailable as e:
+            self.breaker.failure()
+            LLM_REQUESTS.inc(result=e.reason)
+            raise
+        except Exception:
+            # Requête refusée (4xx) : le fournisseur répond, le disjoncteur reste fermé
+            self.breaker.success()
+            LLM_REQUESTS.inc(result="rejected")
+            raise
+
+        try:
+            while chunk is not None:
+                if chunk.text and run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise LLMUnavailable("deadline")
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), remaining)
+                except StopAsyncIteration:
+                    chunk = None
+                except asyncio.TimeoutError:
+                    raise LLMUnavailable("deadline")
+                except Exception as e:
+                    raise LLMUnavailable("error", e) from e
+        except LLMUnavailable as e:
+            self.breaker.failure()
+            LLM_REQUESTS.inc(result=e.reason)
+            raise
+        else:
+            self.breaker.success()
+            LLM_REQUESTS.inc(result="ok")
+        finally:
+            await stream.aclose()
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await collect(self._astream(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """Chemin synchrone (scripts) : disjoncteur seulement, délai du fournisseur."""
+        if not self.breaker.allow():
+            LLM_REQUESTS.inc(result="circuit_open")
+            raise LLMUnavailable("circuit_open")
+        try:
+            result = self.provider._generate(messages, stop=stop, **kwargs)
+        except Exception as e:
+            if not is_retryable(e):
+                self.breaker.success()
+                raise
+            self.breaker.failure()
+            LLM_REQUESTS.inc(result="error")
+            raise LLMUnavailable("error", e) from e
+        self.breaker.success()
+        LLM_REQUESTS.inc(result="ok")
+        return result
+
+def create_provider(config: Dict) -> BaseChatModel:
+    if config["provider"] == "http":
+        return HTTPChatModel(base_url=config["base_url"].rstrip("/"), model=config["model"],
+                             api_key=config["api_key"], pool_size=config["pool_size"],
+                             connect_timeout=config["connect_timeout"], read_timeout=config["deadline"])
+    if config["provider"] == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        # Nouvelles tentatives et délai gérés par ResilientChatModel
+        return ChatGoogleGenerativeAI(model=config["model"], temperature=0,
+                                      google_api_key=os.getenv("GOOGLE_API_KEY"),
+                                      max_retries=0, timeout=config["deadline"])
+    raise ValueError(f"Fournisseur LLM inconnu : {config['provider']}")
+
+def create_llm(config: Dict, provider: Optional[BaseChatModel] = None) -> ResilientChatModel:
+    """Fournisseur configuré (ou `provider`) derrière le client résilient."""
+    return ResilientChatModel(
+        provider=provider if provider is not None else create_provider(config),
+        breaker=CircuitBreaker(config["breaker_failures"], config["breaker_reset"]),
+        deadline=config["deadline"],
+        hedge_delay=config["hedge_delay"],
+        max_attempts=config["max_attempts"],
+        retry_backoff=config["retry_backoff"]
+    )
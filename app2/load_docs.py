@@ -1,40 +1,171 @@
+import glob
 import json
 import os
-from typing import List, Dict, Any
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional, TextIO
 from langchain_core.documents import Document
 from config import DATA_FOLDER, FILES, TEAM_ALIASES
+from alias_index import TEAM_INDEX
 
 # ============================================================================
-# UTILITAIRES GÉNÉRAUX
+# LECTURE DES SOURCES AU FIL DE L'EAU
 # ============================================================================
 
-def load_json_file(filename: str) -> List[Dict]:
-    """Charge un fichier JSON avec gestion d'erreurs."""
-    filepath = os.path.join(DATA_FOLDER, filename)
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print(f"⚠️ Fichier non trouvé : {filepath}")
-        return []
-    except json.JSONDecodeError:
-        print(f"⚠️ Erreur de décodage JSON : {filepath}")
-        return []
+# Taille des lectures du parseur incrémental (caractères)
+READ_CHUNK_SIZE = 1 << 16
+
+def _iter_json_array(f: TextIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Éléments d'un tableau JSON lus morceau par morceau : la mémoire est
+    bornée par le plus gros élément, pas par la taille du fichier. Un
+    fichier qui n'est pas un tableau est lu en entier.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+        return not eof
+
+    # Début du tableau
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        if pos < len(buffer) or not fill():
+            break
+    if pos >= len(buffer):
+        return
+    if buffer[pos] != "[":
+        value = json.loads(buffer[pos:] + f.read())
+        yield from value if isinstance(value, list) else [value]
+        return
+    pos += 1
+
+    while True:
+        # Séparateurs entre deux éléments
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ","):
+                pos += 1
+            if pos < len(buffer) or not fill():
+                break
+        if pos >= len(buffer):
+            raise json.JSONDecodeError("Tableau JSON non terminé", buffer, pos)
+        if buffer[pos] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+            # Un élément complet est suivi d'un séparateur ; sinon c'est le
+            # début d'un nombre coupé entre deux morceaux ("-4" de "-4.5")
+            if end == len(buffer) or not (buffer[end].isspace() or buffer[end] in ",]"):
+                raise json.JSONDecodeError("Élément incomplet ou mal séparé", buffer, end)
+        except ValueError:
+            if not fill():
+                raise
+            continue
+        yield value
+        pos = end
+
+def iter_json_records(filepath: str) -> Iterator[Dict]:
+    """Enregistrements d'un fichier JSON (tableau) ou JSON Lines (.jsonl), un par un."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        if filepath.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_array(f)
+
+def source_files(filename: str, folder: Optional[str] = None) -> List[str]:
+    """
+    Fichiers d'une source de config.FILES : un nom de fichier ou un motif
+    (ex: "matches_*.jsonl" pour une édition ou un flux d'événements par fichier).
+    """
+    pattern = os.path.join(folder or DATA_FOLDER, filename)
+    if glob.has_magic(filename):
+        return sorted(glob.glob(pattern))
+    return [pattern]
+
+def iter_source(filename: str, folder: Optional[str] = None) -> Iterator[Dict]:
+    """Enregistrements d'une source au fil de l'eau, avec gestion d'erreurs."""
+    paths = source_files(filename, folder)
+    if not paths:
+        print(f"⚠️ Aucun fichier pour : {os.path.join(folder or DATA_FOLDER, filename)}")
+    for filepath in paths:
+        try:
+            yield from iter_json_records(filepath)
+        except FileNotFoundError:
+            print(f"⚠️ Fichier non trouvé : {filepath}")
+        except json.JSONDecodeError:
+            print(f"⚠️ Erreur de décodage JSON : {filepath}")
+
+def load_json_file(filename: str, folder: Optional[str] = None) -> List[Dict]:
+    """Charge entièrement une source (fichier JSON ou motif) avec gestion d'erreurs."""
+    return list(iter_source(filename, folder))
+
+def iter_batches(items: Iterable, size: int) -> Iterator[List]:
+    """Lots d'au plus `size` éléments, sans matérialiser la séquence entière."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+# ============================================================================
+# UTILITAIRES GÉNÉRAUX
+# ============================================================================
 
 def get_team_aliases(team_name: str) -> List[str]:
     """Retourne toutes les variantes d'un nom d'équipe."""
-    for canonical, aliases in TEAM_ALIASES.items():
-        if team_name in aliases:
-            return aliases
+    canonical = TEAM_INDEX.canonical(team_name)
+    if canonical is not None:
+        return TEAM_ALIASES[canonical]
     return [team_name]
 
 def normalize_team_name(team_name: str) -> str:
-    """Normalise le nom d'une équipe vers sa version canonique."""
+    """Normalise le nom d'une équipe vers sa version canonique (casse et accents ignorés)."""
     team_name_clean = team_name.strip()
-    for canonical, aliases in TEAM_ALIASES.items():
-        if team_name_clean in aliases:
-            return canonical
-    return team_name_clean
+    return TEAM_INDEX.canonical(team_name_clean) or team_name_clean
+
+# ============================================================================
+# TABLES DE JOINTURE PAR ÉQUIPE
+# ============================================================================
+
+def _ranking_rows(entries: List[Dict]):
+    """Lignes d'un classement, qu'il soit groupé (Nom_Groupe + Classement) ou à plat."""
+    for entry in entries:
+        if 'Classement' in entry:
+            for row in entry.get('Classement', []):
+                yield {**row, 'Nom_Groupe': entry.get('Nom_Groupe', 'N/A')}
+        else:
+            yield entry
+
+def build_team_tables(data_sources: Dict) -> Dict[str, Dict]:
+    """
+    Joint équipes, sélectionneurs et effectifs par nom d'équipe canonique,
+    en une seule passe par source. Retourne {nom canonique: {'team',
+    'coach', 'squad'}}.
+    """
+    sources = [
+        ('team', data_sources.get('teams', []), 'Equipe'),
+        ('coach', data_sources.get('coaches', []), 'pays'),
+        ('squad', data_sources.get('squads', []), 'team')
+    ]
+    
+    tables: Dict[str, Dict] = {}
+    for field, rows, name_key in sources:
+        for row in rows:
+            canonical = normalize_team_name(row.get(name_key, ''))
+            if not canonical:
+                continue
+            record = tables.setdefault(canonical, {})
+            # Première occurrence conservée, comme l'ancienne recherche séquentielle
+            record.setdefault(field, row)
+    
+    return tables
 
 # ============================================================================
 # FORMATTERS - MATCHS
@@ -122,18 +253,14 @@ def format_match_summary(match: Dict) -> str:
 # FORMATTERS - ÉQUIPES
 # ============================================================================
 
-def format_team_complete(team_name: str, data_sources: Dict) -> str:
+def format_team_complete(team_name: str, team_tables: Dict[str, Dict]) -> str:
     """Format complet d'une équipe avec toutes les données croisées."""
     
-    # Recherche des données de l'équipe
-    team_info = next((t for t in data_sources['teams'] 
-                      if normalize_team_name(t.get('Equipe', '')) == normalize_team_name(team_name)), {})
-    
-    coach_info = next((c for c in data_sources['coaches'] 
-                       if normalize_team_name(c.get('pays', '')) == normalize_team_name(team_name)), {})
-    
-    squad_info = next((s for s in data_sources['squads'] 
-                       if normalize_team_name(s.get('team', '')) == normalize_team_name(team_name)), {})
+    # Données de l'équipe, jointes une fois pour toutes par build_team_tables
+    record = team_tables.get(normalize_team_name(team_name), {})
+    team_info = record.get('team', {})
+    coach_info = record.get('coach', {})
+    squad_info = record.get('squad', {})
     
     # Construction du texte
     text = f"═══════════════════════════════════════════════════════════\n"
@@ -209,13 +336,11 @@ def format_team_complete(team_name: str, data_sources: Dict) -> str:
     text += f"═══════════════════════════════════════════════════════════"
     return text
 
-def format_team_summary(team_name: str, data_sources: Dict) -> str:
+def format_team_summary(team_name: str, team_tables: Dict[str, Dict]) -> str:
     """Format résumé court d'une équipe."""
-    team_info = next((t for t in data_sources['teams'] 
-                      if normalize_team_name(t.get('Equipe', '')) == normalize_team_name(team_name)), {})
-    
-    coach_info = next((c for c in data_sources['coaches'] 
-                       if normalize_team_name(c.get('pays', '')) == normalize_team_name(team_name)), {})
+    record = team_tables.get(normalize_team_name(team_name), {})
+    team_info = record.get('team', {})
+    coach_info = record.get('coach', {})
     
     text = f"{team_name} - {team_info.get('Participation', 'N/A')} participation(s). "
     text += f"Meilleur résultat: {team_info.get('Meilleur_resultat', 'N/A')}. "
@@ -284,10 +409,8 @@ def format_stadium_info(stadium: Dict) -> str:
 # PROCESSEURS PRINCIPAUX
 # ============================================================================
 
-def process_matches(data: List[Dict]) -> List[Document]:
-    """Traite tous les matchs et crée des documents."""
-    documents = []
-    
+def process_matches(data: Iterable[Dict]) -> Iterator[Document]:
+    """Documents de chaque match, produits au fil de la lecture des matchs."""
     for match in data:
         if "equipe_domicile" not in match:
             continue
@@ -312,7 +435,7 @@ def process_matches(data: List[Dict]) -> List[Document]:
             "score": match.get("score", "-"),
             "source": "matches.json"
         }
-        documents.append(Document(page_content=content_detailed, metadata=metadata_detailed))
+        yield Document(page_content=content_detailed, metadata=metadata_detailed)
         
         # =========================
         # MATCH RÉSUMÉ (inchangé)
@@ -320,7 +443,7 @@ def process_matches(data: List[Dict]) -> List[Document]:
         content_summary = format_match_summary(match)
         metadata_summary = metadata_detailed.copy()
         metadata_summary["type"] = "match_summary"
-        documents.append(Document(page_content=content_summary, metadata=metadata_summary))
+        yield Document(page_content=content_summary, metadata=metadata_summary)
 
         # =========================
         # DOCUMENT ÉVÉNEMENT (FINAL / DEMI / QUART)
@@ -335,29 +458,24 @@ def process_matches(data: List[Dict]) -> List[Document]:
 🆔 Match : {match.get("match_n")}
 """.strip()
 
-            documents.append(
-                Document(
-                    page_content=event_text,
-                    metadata={
-                        "type": "event",
-                        "event": match.get("etape").lower().replace(" ", "_"),
-                        "phase": match.get("etape"),
-                        "date": match.get("date_iso", ""),
-                        "teams": metadata_detailed["teams"],
-                        "stadium": match.get("stade"),
-                        "source": "matches.json"
-                    }
-                )
+            yield Document(
+                page_content=event_text,
+                metadata={
+                    "type": "event",
+                    "event": match.get("etape").lower().replace(" ", "_"),
+                    "match_number": match.get("match_n", "N/A"),
+                    "phase": match.get("etape"),
+                    "date": match.get("date_iso", ""),
+                    "teams": metadata_detailed["teams"],
+                    "stadium": match.get("stade"),
+                    "source": "matches.json"
+                }
             )
-    
-    return documents
 
 
-def process_teams(data_sources: Dict) -> List[Document]:
+def process_teams(teams: List[Dict], team_tables: Dict[str, Dict]) -> Iterator[Document]:
     """Traite toutes les équipes et crée des documents."""
-    documents = []
-    
-    for team_data in data_sources['teams']:
+    for team_data in teams:
         team_name = team_data.get('Equipe', '')
         if not team_name:
             continue
@@ -365,7 +483,7 @@ def process_teams(data_sources: Dict) -> List[Document]:
         normalized_name = normalize_team_name(team_name)
         
         # Document complet
-        content_complete = format_team_complete(team_name, data_sources)
+        content_complete = format_team_complete(team_name, team_tables)
         metadata_complete = {
             "type": "team_complete",
             "team_name": normalized_name,
@@ -374,20 +492,16 @@ def process_teams(data_sources: Dict) -> List[Document]:
             "best_result": team_data.get('Meilleur_resultat', 'N/A'),
             "source": "multiple"
         }
-        documents.append(Document(page_content=content_complete, metadata=metadata_complete))
+        yield Document(page_content=content_complete, metadata=metadata_complete)
         
         # Document résumé
-        content_summary = format_team_summary(team_name, data_sources)
+        content_summary = format_team_summary(team_name, team_tables)
         metadata_summary = metadata_complete.copy()
         metadata_summary["type"] = "team_summary"
-        documents.append(Document(page_content=content_summary, metadata=metadata_summary))
-    
-    return documents
+        yield Document(page_content=content_summary, metadata=metadata_summary)
 
-def process_players(data: List[Dict]) -> List[Document]:
+def process_players(data: List[Dict]) -> Iterator[Document]:
     """Traite tous les joueurs et crée des documents."""
-    documents = []
-    
     for squad_data in data:
         team_name = squad_data.get('team', '')
         if not team_name:
@@ -417,14 +531,10 @@ def process_players(data: List[Dict]) -> List[Document]:
                     "source": "squads.json"
                 }
                 
-                documents.append(Document(page_content=content, metadata=metadata))
-    
-    return documents
+                yield Document(page_content=content, metadata=metadata)
 
-def process_standings(data: List[Dict]) -> List[Document]:
+def process_standings(data: List[Dict]) -> Iterator[Document]:
     """Traite les classements et crée des documents."""
-    documents = []
-    
     for group in data:
         content = format_group_standings(group)
         
@@ -437,14 +547,10 @@ def process_standings(data: List[Dict]) -> List[Document]:
             "source": "classements.json"
         }
         
-        documents.append(Document(page_content=content, metadata=metadata))
-    
-    return documents
+        yield Document(page_content=content, metadata=metadata)
 
-def process_stadiums(data: List[Dict]) -> List[Document]:
+def process_stadiums(data: Iterable[Dict]) -> Iterator[Document]:
     """Traite les stades et crée des documents."""
-    documents = []
-    
     for stadium in data:
         content = format_stadium_info(stadium)
         
@@ -456,67 +562,116 @@ def process_stadiums(data: List[Dict]) -> List[Document]:
             "source": "stades.json"
         }
         
-        documents.append(Document(page_content=content, metadata=metadata))
-    
+        yield Document(page_content=content, metadata=metadata)
+
+# ============================================================================
+# IDENTIFIANTS STABLES
+# ============================================================================
+
+# Champs de métadonnées qui identifient un document indépendamment de son
+# contenu (un score qui change ne doit pas changer l'identifiant du match)
+DOCUMENT_KEY_FIELDS = {
+    "match_detailed": ["match_number"],
+    "match_summary": ["match_number"],
+    "event": ["match_number", "event"],
+    "team_complete": ["team_name"],
+    "team_summary": ["team_name"],
+    "player": ["team", "player_name", "position"],
+    "standings": ["group"],
+    "stadium": ["stadium_name", "city"]
+}
+
+def document_key(doc: Document) -> str:
+    """Clé lisible et stable d'un document, ex: 'player:Maroc:Yassine Bounou:Gardien'."""
+    doc_type = doc.metadata.get("type", "unknown")
+    fields = DOCUMENT_KEY_FIELDS.get(doc_type)
+    if fields is None:
+        fields = sorted(k for k in doc.metadata if k != "type")
+    values = [str(doc.metadata.get(field, "")) for field in fields]
+    return ":".join([doc_type] + values)
+
+def with_document_ids(documents: Iterable[Document]) -> Iterator[Document]:
+    """Affecte à chaque document, au passage, un identifiant stable (doc.id), unique dans le flux."""
+    seen: Dict[str, int] = {}
+    for doc in documents:
+        key = document_key(doc)
+        count = seen.get(key, 0)
+        seen[key] = count + 1
+        doc.id = key if count == 0 else f"{key}#{count}"
+        yield doc
+
+def assign_document_ids(documents: List[Document]) -> List[Document]:
+    """Affecte à chaque document un identifiant stable (doc.id), unique dans le lot."""
+    for _ in with_document_ids(documents):
+        pass
     return documents
 
 # ============================================================================
 # FONCTION PRINCIPALE
 # ============================================================================
 
-def load_all_can2025_data() -> List[Document]:
+# Sources jointes par équipe (build_team_tables) : gardées en mémoire, leur
+# taille suit le nombre d'équipes. Les matchs et les stades sont lus au fil de l'eau
+REFERENCE_SOURCES = ["teams", "coaches", "squads", "standings", "best_thirds"]
+
+def load_data_sources() -> Dict[str, List[Dict]]:
+    """Charge tous les fichiers JSON déclarés dans config.FILES."""
+    return {name: load_json_file(filename) for name, filename in FILES.items()}
+
+def iter_can2025_documents(data_sources: Optional[Dict[str, Iterable[Dict]]] = None,
+                           folder: Optional[str] = None, verbose: bool = True) -> Iterator[Document]:
+    """
+    Documents de la CAN 2025 produits un par un, identifiants affectés. Sans
+    `data_sources`, les sources de config.FILES sont lues dans `folder`
+    (DATA_FOLDER par défaut) : seules les tables de jointure par équipe sont
+    chargées, les matchs et les stades passent enregistrement par
+    enregistrement jusqu'au consommateur (lots d'embedding, index).
+    """
+    log = print if verbose else (lambda *args: None)
+    log("🔄 Chargement des données CAN 2025...")
+
+    if data_sources is None:
+        reference = {name: load_json_file(FILES[name], folder) for name in REFERENCE_SOURCES}
+        matches = iter_source(FILES["matches"], folder)
+        stadiums = iter_source(FILES["stadiums"], folder)
+    else:
+        reference = data_sources
+        matches, stadiums = data_sources['matches'], data_sources['stadiums']
+
+    # Jointure unique des sources par équipe, partagée par les processeurs
+    team_tables = build_team_tables(reference)
+
+    sections = [
+        ("⚽ Traitement des matchs...", "de matchs", lambda: process_matches(matches)),
+        ("🏆 Traitement des équipes...", "d'équipes", lambda: process_teams(reference['teams'], team_tables)),
+        ("👤 Traitement des joueurs...", "de joueurs", lambda: process_players(reference['squads'])),
+        ("📊 Traitement des classements...", "de classements", lambda: process_standings(reference['standings'])),
+        ("🏟️ Traitement des stades...", "de stades", lambda: process_stadiums(stadiums))
+    ]
+
+    def documents() -> Iterator[Document]:
+        for title, label, process in sections:
+            log(f"  {title}")
+            count = 0
+            for doc in process():
+                count += 1
+                yield doc
+            log(f"    ✅ {count} documents {label} créés")
+
+    total = 0
+    for doc in with_document_ids(documents()):
+        total += 1
+        yield doc
+    log(f"\n✅ TOTAL: {total} documents créés avec succès!")
+
+def load_all_can2025_data(data_sources: Optional[Dict[str, List[Dict]]] = None) -> List[Document]:
     """
     Charge et traite TOUS les fichiers JSON de la CAN 2025.
     Retourne une liste de Documents LangChain prêts pour le RAG.
+    `data_sources` permet de fournir des données déjà chargées (tests, benchmarks).
+    L'indexation consomme plutôt iter_can2025_documents par lots.
     """
-    print("🔄 Chargement des données CAN 2025...")
-    
-    # Chargement de tous les fichiers
-    data_sources = {
-        'matches': load_json_file(FILES['matches']),
-        'teams': load_json_file(FILES['teams']),
-        'coaches': load_json_file(FILES['coaches']),
-        'squads': load_json_file(FILES['squads']),
-        'stadiums': load_json_file(FILES['stadiums']),
-        'standings': load_json_file(FILES['standings']),
-        'best_thirds': load_json_file(FILES['best_thirds'])
-    }
-    
-    all_documents = []
-    
-    # Traitement des matchs
-    print("  ⚽ Traitement des matchs...")
-    match_docs = process_matches(data_sources['matches'])
-    all_documents.extend(match_docs)
-    print(f"    ✅ {len(match_docs)} documents de matchs créés")
-    
-    # Traitement des équipes
-    print("  🏆 Traitement des équipes...")
-    team_docs = process_teams(data_sources)
-    all_documents.extend(team_docs)
-    print(f"    ✅ {len(team_docs)} documents d'équipes créés")
-    
-    # Traitement des joueurs
-    print("  👤 Traitement des joueurs...")
-    player_docs = process_players(data_sources['squads'])
-    all_documents.extend(player_docs)
-    print(f"    ✅ {len(player_docs)} documents de joueurs créés")
-    
-    # Traitement des classements
-    print("  📊 Traitement des classements...")
-    standing_docs = process_standings(data_sources['standings'])
-    all_documents.extend(standing_docs)
-    print(f"    ✅ {len(standing_docs)} documents de classements créés")
-    
-    # Traitement des stades
-    print("  🏟️ Traitement des stades...")
-    stadium_docs = process_stadiums(data_sources['stadiums'])
-    all_documents.extend(stadium_docs)
-    print(f"    ✅ {len(stadium_docs)} documents de stades créés")
-    
-    print(f"\n✅ TOTAL: {len(all_documents)} documents créés avec succès!")
-    
-    return all_documents
+    return list(iter_can2025_documents(data_sources))
 
 # ============================================================================
 # UTILITAIRES D'EXPORT
@@ -0,0 +1,172 @@
+"""
+Registre de métriques minimal pour l'API CAN 2025, exposé au format texte
+Prometheus sur /metrics (sans dépendance à prometheus_client).
+"""
+import threading
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(names: List[str], values: LabelValues) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+# ============================================================================
+# TYPES DE MÉTRIQUES
+# ============================================================================
+
+class Counter:
+    """Compteur monotone, éventuellement étiqueté."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Optional[List[str]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = list(labelnames or [])
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+class Gauge(Counter):
+    """Valeur instantanée, fixée explicitement ou lue via une fonction."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Optional[List[str]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def remove(self, **labels):
+        """Retire une série (ex: ancienne version d'un index)."""
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+    def set_function(self, function: Callable[[], float]):
+        """La valeur est recalculée à chaque lecture de /metrics."""
+        self._function = function
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        if self._function is not None:
+            return [(self.name, "", self._function())]
+        return super().samples()
+
+# Bornes par défaut des histogrammes de latence (secondes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Distribution d'observations par intervalles cumulés (buckets `le`), avec somme et total."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Optional[List[str]] = None,
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = list(labelnames or [])
+        self.buckets = tuple(sorted(buckets))
+        # Par étiquettes : [compte par bucket..., compte total, somme]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    def count(self, **labels) -> float:
+        state = self._values.get(self._key(labels))
+        return state[-2] if state else 0
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        samples = []
+        bucket_labels = self.labelnames + ["le"]
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                samples.append((f"{self.name}_bucket", _format_labels(bucket_labels, key + (_format_value(bound),)), count))
+            samples.append((f"{self.name}_bucket", _format_labels(bucket_labels, key + ("+Inf",)), state[-2]))
+            samples.append((f"{self.name}_count", _format_labels(self.labelnames, key), state[-2]))
+            samples.append((f"{self.name}_sum", _format_labels(self.labelnames, key), state[-1]))
+        return samples
+
+# ============================================================================
+# REGISTRE
+# ============================================================================
+
+class MetricsRegistry:
+    """Ensemble des métriques du processus, rendu au format Prometheus."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Union[Counter, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_cls, name: str, documentation: str, labelnames=None, **options):
+        with self._lock:
+            existing = self._metrics.get(name)
+            if existing is not None:
+                return existing
+            metric = metric_cls(name, documentation, labelnames, **options)
+            self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Optional[List[str]] = None) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Optional[List[str]] = None) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Optional[List[str]] = None,
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Sérialise toutes les métriques au format d'exposition texte Prometheus."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+# Registre global du processus
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,287 @@
+"""
+Encodeur MiniLM sans PyTorch : export ONNX (optionnellement quantifié int8)
+du même modèle, exécuté par onnxruntime derrière l'interface Embeddings de
+LangChain, et cache LRU des vecteurs des questions récentes.
+
+    <onnx_dir>/model.onnx       export float32 (même calcul que sentence-transformers)
+    <onnx_dir>/model_int8.onnx  quantification dynamique int8 des poids
+    <onnx_dir>/tokenizer.json   tokenizer du modèle (bibliothèque tokenizers)
+    <onnx_dir>/encoder.json     modèle source et écart mesuré au modèle PyTorch
+
+L'export (`python query_encoder.py export`) se fait une fois, sur une
+machine où torch est installé. Il compare chaque variante au modèle de
+référence et refuse de publier celle dont la similarité cosinus minimale
+descend sous `onnx_min_cosine`. Les vecteurs restent ainsi compatibles avec
+l'index, quel que soit l'encodeur utilisé à la construction ou à la requête.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+ENCODER_META = "encoder.json"
+MODEL_FILES = {False: "model.onnx", True: "model_int8.onnx"}
+TOKENIZER_FILE = "tokenizer.json"
+# Longueur maximale de sentence-transformers pour all-MiniLM-L6-v2
+MAX_LENGTH = 256
+
+# ============================================================================
+# ENCODEUR ONNX
+# ============================================================================
+
+def mean_pooling(hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Moyenne des états cachés sur les tokens réels puis normalisation L2 (pipeline MiniLM)."""
+    mask = mask[..., None].astype(np.float32)
+    pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+def read_encoder_meta(onnx_dir: str) -> Dict:
+    try:
+        with open(os.path.join(onnx_dir, ENCODER_META), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Embeddings MiniLM via onnxruntime : tokenisation, passe avant ONNX, mean
+    pooling et normalisation, comme sentence-transformers.
+    """
+
+    def __init__(self, onnx_dir: str, model_name: str, int8: bool = True, threads: int = 0,
+                 batch_size: int = 32, max_length: int = MAX_LENGTH):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        meta = read_encoder_meta(onnx_dir)
+        if meta.get("model") != model_name:
+            # Un autre modèle produirait des vecteurs incompatibles avec l'index
+            raise ValueError(f"Export ONNX de {onnx_dir} pour {meta.get('model')!r}, attendu {model_name!r} : "
+                             f"relancer `python query_encoder.py export`")
+        variant = "int8" if int8 else "fp32"
+        if variant not in meta.get("parity", {}):
+            raise ValueError(f"Variante ONNX {variant} absente de {onnx_dir} (export sans parité validée)")
+
+        self.model_name = model_name
+        self.int8 = int8
+        self.batch_size = max(1, batch_size)
+        self.tokenizer = Tokenizer.from_file(os.path.join(onnx_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(onnx_dir, MODEL_FILES[int8]), options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + self.batch_size])
+            feeds = {
+                "input_ids": np.asarray([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.asarray([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.asarray([e.type_ids for e in encodings], dtype=np.int64)
+            }
+            hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self._inputs})[0]
+            vectors.append(mean_pooling(hidden, feeds["attention_mask"]))
+        return np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+# ============================================================================
+# CACHE LRU DES QUESTIONS
+# ============================================================================
+
+class CachedEmbeddings(Embeddings):
+    """
+    Cache LRU des vecteurs de questions devant un encodeur : une question
+    déjà vue (reformulation identique, rafraîchissement, préchauffage) ne
+    repasse pas par le modèle. Les documents ne sont pas mis en cache.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_entries: int = 1024):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._vectors: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = text.strip()
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is not None:
+                self._vectors.move_to_end(key)
+                self.hits += 1
+                return list(vector)
+            self.misses += 1
+
+        vector = self.embeddings.embed_query(text)
+        self._store({key: vector})
+        return list(vector)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Vecteurs de plusieurs questions ; celles absentes du cache sont encodées en un seul lot."""
+        keys = [text.strip() for text in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                vector = self._vectors.get(key)
+                if vector is not None:
+                    self._vectors.move_to_end(key)
+                    found[key] = vector
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            # MiniLM n'a pas de préfixe de requête : même vecteur qu'embed_query
+            encoded = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            self._store(encoded)
+            found.update(encoded)
+        return [list(found[key]) for key in keys]
+
+    def _store(self, vectors: Dict[str, List[float]]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for key, vector in vectors.items():
+                self._vectors[key] = vector
+                self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+
+# ============================================================================
+# CHOIX DE L'ENCODEUR
+# ============================================================================
+
+def create_embeddings(model_name: str, config: Dict) -> Embeddings:
+    """Encodeur de `model_name` selon EMBEDDING_CONFIG["backend"] (torch ou onnx)."""
+    backend = config.get("backend", "torch")
+    if backend == "onnx":
+        return OnnxEmbeddings(config["onnx_dir"], model_name, int8=config["onnx_int8"],
+                              threads=config["onnx_threads"])
+    if backend != "torch":
+        raise ValueError(f"Encodeur inconnu : {backend} (attendu : torch, onnx)")
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+def encoder_id(config: Dict) -> str:
+    """Variante d'encodeur, pour le manifeste et le cache de vecteurs (torch, onnx, onnx-int8)."""
+    if config.get("backend", "torch") != "onnx":
+        return "torch"
+    return "onnx-int8" if config["onnx_int8"] else "onnx"
+
+def configured_factory(model_name: str) -> Embeddings:
+    """Fabrique de BatchEmbedder (processus de travail compris) suivant EMBEDDING_CONFIG."""
+    from config import EMBEDDING_CONFIG
+    return create_embeddings(model_name, EMBEDDING_CONFIG)
+
+# ============================================================================
+# EXPORT ET PARITÉ
+# ============================================================================
+
+def cosine_drift(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Similarité cosinus entre vecteurs de même rang (minimum et moyenne)."""
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = (reference * candidate).sum(axis=1)
+    return {"min_cosine": round(float(cosines.min()), 5), "mean_cosine": round(float(cosines.mean()), 5)}
+
+def parity_texts(index_dir: str, limit: int = 300) -> List[str]:
+    """Textes de contrôle : questions types et documents de l'index livré."""
+    from docstore import MmapDocstore, has_docstore
+    texts = [
+        "Qui a gagné la finale de la CAN 2025 au Maroc ?",
+        "Score Maroc Comores",
+        "Quel est le classement du groupe A ?",
+        "Qui est le sélectionneur du Sénégal ?",
+        "Achraf Hakimi"
+    ]
+    if has_docstore(index_dir):
+        store = MmapDocstore(index_dir)
+        step = max(1, len(store) // limit)
+        texts += [store.text(position) for position in range(0, len(store), step)][:limit]
+    return texts
+
+def export_onnx(model_name: str, onnx_dir: str, texts: List[str], min_cosine: float) -> Dict:
+    """
+    Exporte `model_name` en ONNX (float32 et int8), mesure l'écart de chaque
+    variante au modèle sentence-transformers sur `texts` et n'enregistre que
+    les variantes au-dessus de `min_cosine`.
+    """
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(onnx_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(onnx_dir)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    sample = tokenizer(["CAN 2025"], return_tensors="pt")
+    fp32_path = os.path.join(onnx_dir, MODEL_FILES[False])
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in names), fp32_path,
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]},
+            opset_version=17
+        )
+    quantize_dynamic(fp32_path, os.path.join(onnx_dir, MODEL_FILES[True]), weight_type=QuantType.QInt8)
+
+    # Métadonnées provisoires pour pouvoir charger les deux variantes
+    meta = {"model": model_name, "max_length": MAX_LENGTH, "parity": {"fp32": {}, "int8": {}}}
+    with open(os.path.join(onnx_dir, ENCODER_META), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    reference = np.asarray(HuggingFaceEmbeddings(model_name=model_name).embed_documents(texts), dtype=np.float32)
+    parity = {}
+    for int8, variant in ((False, "fp32"), (True, "int8")):
+        drift = cosine_drift(reference, OnnxEmbeddings(onnx_dir, model_name, int8=int8).encode(texts))
+        drift["texts"] = len(texts)
+        if drift["min_cosine"] >= min_cosine:
+            parity[variant] = drift
+            print(f"✅ ONNX {variant} : cosinus min {drift['min_cosine']}, moyen {drift['mean_cosine']}")
+        else:
+            os.remove(os.path.join(onnx_dir, MODEL_FILES[int8]))
+            print(f"❌ ONNX {variant} écarté : cosinus min {drift['min_cosine']} < {min_cosine}")
+
+    meta["parity"] = parity
+    meta["min_cosine"] = min_cosine
+    with open(os.path.join(onnx_dir, ENCODER_META), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+if __name__ == "__main__":
+    import sys
+    from config import EMBEDDING_CONFIG, EMBEDDING_MODEL, INDEX_DIR
+    from index_store import active_index_dir
+
+    if sys.argv[1:2] != ["export"]:
+        print("Usage : python query_encoder.py export")
+        sys.exit(2)
+    result = export_onnx(EMBEDDING_MODEL, EMBEDDING_CONFIG["onnx_dir"], parity_texts(active_index_dir(INDEX_DIR)),
+                         EMBEDDING_CONFIG["onnx_min_cosine"])
+    sys.exit(0 if result["parity"] else 1)
@@ -1,55 +1,177 @@
-import os
+import time
+_import_started = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from fastapi.middleware.cors import CORSMiddleware
+from config import (CACHE_CONFIG, CONTEXT_CONFIG, EMBEDDING_CONFIG, EMBEDDING_MODEL, INDEX_DIR, LLM_CONFIG,
+                    RETRIEVAL_CONFIG, SERVER_CONFIG, SESSION_CONFIG, TRACING_CONFIG)
+from answer_cache import AnswerCache, normalize_query, query_numbers
+from batch import BatchJob, BatchJobStore, dedupe_queries
+from coalescing import Flight, Publish, SingleFlight
+from context_packing import ContextPacker, ContextStats, format_source
+from docstore import load_vector_store
+from ann_index import apply_search_settings
+from index_store import load_manifest
+from index_reload import IndexGeneration, IndexReloader
+from llm_client import LLMUnavailable, create_llm
+from metrics import REGISTRY
+from query_encoder import CachedEmbeddings, create_embeddings, encoder_id
+from lexical_index import BM25Index
+from load_docs import load_data_sources
+from retrieval import HybridRetriever, estimate_tokens
+from structured_qa import IntentRouter, TournamentIndex
+from sessions import ChatSession, PreparedQuestion, SessionStore, entity_key
+from serving import ConcurrencyLimiter, ServerBusy, create_executor, run_in_pool, sse_event
+from startup import StartupLoader, StartupReport
+from tracing import (REQUEST_ID, RequestTrace, SlowRequestProfiler, configure_json_logs, error_status,
+                     new_request_id, record_error, span)
 
 load_dotenv()
-app = FastAPI(title="CAN 2025 API")
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # DEV ONLY
-    allow_credentials=False,  # IMPORTANT avec *
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Les modèles et l'index sont chargés en arrière-plan au démarrage (voir
+# startup.py) : l'import de ce module reste rapide et /healthz répond tout
+# de suite, /readyz une fois le préchauffage terminé
+embedding_model = None
+llm = None
+vector_db = None
+index_version = None
+hybrid_retriever = None
+rag_chain = None
+answer_cache = None
+intent_router = None
+
 # 1. Configuration des modèles
-# IMPORTANT : Doit être identique au script d'indexation
-embedding_model = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
+def import_dependencies():
+    """Imports lourds différés : encodeur (torch ou onnxruntime), client du LLM, FAISS."""
+    # Importés ici pour que leur coût apparaisse dans l'étape "imports"
+    if LLM_CONFIG["provider"] == "gemini":
+        import langchain_google_genai
+    else:
+        import httpx
+    if EMBEDDING_CONFIG["backend"] == "onnx":
+        import onnxruntime
+        import tokenizers
+    else:
+        import langchain_huggingface
+    import faiss
+    import langchain_community.vectorstores
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-3-pro-preview",
-    temperature=0,
-    google_api_key=os.getenv("GOOGLE_API_KEY")
-)
+def load_models():
+    global embedding_model
+    # IMPORTANT : Doit être identique au script d'indexation. Encodeur torch ou
+    # ONNX (parité vérifiée à l'export), derrière un cache LRU des questions
+    embedding_model = CachedEmbeddings(
+        create_embeddings(EMBEDDING_MODEL, EMBEDDING_CONFIG),
+        max_entries=EMBEDDING_CONFIG["query_cache_size"]
+    )
+    REGISTRY.gauge("rag_query_vectors_cached", "Vecteurs de questions en cache").set_function(
+        lambda: len(embedding_model))
+    REGISTRY.gauge("rag_query_vector_hits", "Questions servies par le cache de vecteurs").set_function(
+        lambda: embedding_model.hits)
+    REGISTRY.gauge("rag_query_vector_misses", "Questions encodées par le modèle").set_function(
+        lambda: embedding_model.misses)
+
+def load_llm():
+    global llm, rag_chain
+    # Client du LLM (connexions gRPC/HTTP) : créé dans chaque worker, jamais
+    # avant un fork. Délai, couverture et disjoncteur : voir llm_client.py
+    llm = create_llm(LLM_CONFIG)
+    rag_chain = build_rag_chain(llm)
 
 # 2. Chargement de la base de données
-vector_db = FAISS.load_local(
-    "faiss_index_can2025", 
-    embedding_model, 
-    allow_dangerous_deserialization=True
-)
+def build_retriever(path: str):
+    """Retriever hybride d'une version de l'index (dossier résolu, voir index_reload.py)."""
+    # Docstore mappé (docstore.py) : seuls identifiants et métadonnées sont
+    # chargés, les textes sont lus à la demande pour les documents retrouvés.
+    # Vecteurs mappés en lecture seule (RAG_MMAP_INDEX) : partagés entre workers
+    vector_db = load_vector_store(path, embedding_model, mmap=SERVER_CONFIG["mmap_index"])
+    # Type d'index (flat, hnsw, ivfpq, sq8) choisi à la construction : seuls
+    # les paramètres de recherche non sérialisés par FAISS sont ré-appliqués
+    manifest = load_manifest(path)
+    apply_search_settings(vector_db.index, manifest.get("index") if manifest else None)
+    built_with = manifest.get("encoder", "torch") if manifest else "torch"
+    if built_with != encoder_id(EMBEDDING_CONFIG):
+        print(f"ℹ️ Index encodé avec {built_with}, questions avec {encoder_id(EMBEDDING_CONFIG)}")
 
-# Augmentez le K pour être sûr de couvrir les phases finales si le fichier est fragmenté
-retriever = vector_db.as_retriever(
-    search_type="similarity", # Plus direct pour les dates/phases spécifiques
-    search_kwargs={"k": 20}    # Récupère plus de contexte
-)
+    # Les entités de la question (équipes, joueurs, groupe, phase) pré-filtrent
+    # les candidats via les métadonnées ; sans entité, k large pour être sûr de
+    # couvrir les phases finales si le fichier est fragmenté
+    lexical_index = None
+    if RETRIEVAL_CONFIG["lexical"]:
+        lexical_index = BM25Index.load(path)
+        if lexical_index is None:
+            # Index antérieur à lexical.json : construit depuis le docstore FAISS
+            print("⚠️ Index lexical absent, construction depuis le docstore FAISS...")
+            doc_ids = list(vector_db.index_to_docstore_id.values())
+            lexical_index = BM25Index.build(doc_ids, (vector_db.docstore.search(i).page_content for i in doc_ids))
+
+    retriever = HybridRetriever(
+        vector_db,
+        k=RETRIEVAL_CONFIG["k"],
+        filtered_k=RETRIEVAL_CONFIG["filtered_k"],
+        metadata_filter=RETRIEVAL_CONFIG["metadata_filter"],
+        lexical_index=lexical_index,
+        rrf_k=RETRIEVAL_CONFIG["rrf_k"]
+    )
+    # Une nouvelle version n'est mise en service que préchauffée
+    if index_reloader.current is not None and SERVER_CONFIG["warmup"]:
+        retriever.search(WARMUP_QUERY, embedding_model.embed_query(WARMUP_QUERY))
+    return retriever
+
+def activate_index(generation: IndexGeneration):
+    """Nouvelle version active : pointeurs par défaut et cache de réponses."""
+    global vector_db, index_version, hybrid_retriever
+    hybrid_retriever = generation.retriever
+    vector_db = hybrid_retriever.vector_db
+    index_version = generation.version
+    if answer_cache is not None:
+        answer_cache.set_index_version(generation.version)
+
+# Les requêtes empruntent la version active (lease) et la gardent jusqu'au
+# bout ; une version publiée ensuite est chargée en arrière-plan puis
+# remplace l'active sans interrompre les requêtes en cours
+index_reloader = IndexReloader(INDEX_DIR, build_retriever, on_swap=activate_index)
+
+def load_index():
+    global answer_cache
+    index_reloader.load()
+    answer_cache = create_answer_cache(index_version)
+    index_reloader.watch(SERVER_CONFIG["index_poll_interval"])
+
+# Embedding de la question + recherche FAISS : travail CPU, exécuté dans un
+# pool de threads dédié pour ne jamais bloquer la boucle d'événements
+retrieval_executor = create_executor(SERVER_CONFIG["retrieval_workers"], name="rag-retrieval")
+
+def retrieve(inputs: dict):
+    trace = inputs.get("trace")
+    # Réutilise l'embedding déjà calculé pour le cache sémantique s'il existe
+    vector = inputs.get("vector")
+    if vector is None:
+        with span(trace, "embedding"):
+            vector = embedding_model.embed_query(inputs["question"])
+    # Version de l'index empruntée par la requête, sinon la version active
+    generation = inputs.get("index")
+    retriever = generation.retriever if generation is not None else hybrid_retriever
+    with span(trace, "retrieval"):
+        return retriever.search(inputs["question"], vector)
+
+async def aretrieve(inputs: dict):
+    return await run_in_pool(retrieval_executor, retrieve, inputs)
 
 # 3. Prompt et Chaîne RAG
 template = """Tu es un expert de la CAN 2025. Réponds précisément à la question en utilisant le contexte fourni.
 Si tu ne sais pas, dis que tu n'as pas l'information.
 
-CONTEXTE :
+{history}CONTEXTE :
 {context}
 
 QUESTION :
@@ -59,28 +181,726 @@ RÉPONSE :"""
 
 prompt = ChatPromptTemplate.from_template(template)
 
-def format_docs(docs):
-    return "\n\n".join(f"--- SOURCE: {d.metadata.get('source')} ---\n{d.page_content}" for d in docs)
+# Une variante par match/équipe/joueur, sans doublons ni bandeaux décoratifs,
+# dans la limite du budget de tokens (voir context_packing.py)
+context_packer = ContextPacker(
+    max_tokens=CONTEXT_CONFIG["max_tokens"],
+    dedup_threshold=CONTEXT_CONFIG["dedup_threshold"]
+)
+context_tokens = REGISTRY.counter(
+    "rag_context_tokens_total", "Tokens de contexte estimés, avant et après assemblage", ["stage"])
+context_documents = REGISTRY.counter(
+    "rag_context_documents_total", "Documents de contexte, avant et après assemblage", ["stage"])
+
+def format_docs(docs, stats: Optional[dict] = None) -> str:
+    """Contexte du prompt ; `stats` reçoit les tailles avant/après assemblage de la requête."""
+    if CONTEXT_CONFIG["packing"]:
+        context, packed = context_packer.pack(docs)
+    else:
+        context = "\n\n".join(format_source(d) for d in docs)
+        tokens = estimate_tokens(context)
+        packed = ContextStats(len(docs), len(docs), tokens, tokens)
+    context_tokens.inc(packed.tokens_in, stage="retrieved")
+    context_tokens.inc(packed.tokens_out, stage="packed")
+    context_documents.inc(packed.documents_in, stage="retrieved")
+    context_documents.inc(packed.documents_out, stage="packed")
+    if stats is not None:
+        stats.update(packed.as_dict())
+    return context
+
+def traced_format_docs(inputs: dict, docs) -> str:
+    trace = inputs.get("trace")
+    stats = inputs.get("context_stats")
+    if stats is None:
+        stats = {}
+    with span(trace, "context"):
+        context = format_docs(docs, stats)
+    if trace is not None:
+        trace.record_context(stats)
+    return context
+
+def keep_docs(inputs: dict, docs):
+    """Documents du contexte rendus à l'appelant (session : réutilisés par une relance)."""
+    if "retrieved" in inputs:
+        inputs["retrieved"][:] = docs
+    return docs
+
+def build_context(inputs: dict) -> str:
+    docs = inputs["docs"] if "docs" in inputs else retrieve(inputs)
+    return traced_format_docs(inputs, keep_docs(inputs, docs))
+
+async def abuild_context(inputs: dict) -> str:
+    docs = inputs["docs"] if "docs" in inputs else await aretrieve(inputs)
+    return traced_format_docs(inputs, keep_docs(inputs, docs))
+
+def format_history(inputs: dict) -> str:
+    history = inputs.get("history")
+    return f"HISTORIQUE DE LA CONVERSATION :\n{history}\n\n" if history else ""
+
+def build_rag_chain(llm):
+    # Entrée de la chaîne : {"question": str, "vector": embedding optionnel,
+    # "docs": documents déjà retrouvés (lots, relance d'une session),
+    # "retrieved": liste optionnelle remplie avec les documents du contexte,
+    # "history": historique de session, "index": IndexGeneration empruntée
+    # (sinon l'active), "context_stats": dict optionnel rempli avec la taille
+    # du contexte, "trace": RequestTrace optionnelle}
+    return (
+        RunnablePassthrough.assign(context=RunnableLambda(build_context, afunc=abuild_context),
+                                   history=RunnableLambda(format_history))
+        | prompt
+        | llm
+        | StrOutputParser()
+    )
+
+# 4. Cache de réponses (exact puis sémantique), invalidé avec l'index
+def create_answer_cache(version: str):
+    if not CACHE_CONFIG["enabled"]:
+        return None
+    cache = AnswerCache(
+        max_entries=CACHE_CONFIG["max_entries"],
+        max_bytes=CACHE_CONFIG["max_bytes"],
+        ttl_seconds=CACHE_CONFIG["ttl_seconds"],
+        semantic_threshold=CACHE_CONFIG["semantic_threshold"],
+        index_version=version,
+        signature=cache_signature
+    )
+    REGISTRY.gauge("rag_cache_entries", "Entrées du cache de réponses").set_function(lambda: len(cache))
+    REGISTRY.gauge("rag_cache_bytes", "Taille estimée du cache de réponses").set_function(lambda: cache.size_bytes)
+    return cache
+
+def cache_signature(query: str) -> tuple:
+    """Entités détectées et nombres cités : le cache sémantique ne confond pas deux équipes ou deux matchs."""
+    with index_reloader.lease() as generation:
+        return entity_key(generation.retriever.analyze(query)), query_numbers(query)
+
+async def lookup_semantic_cache(query: str, trace: Optional[RequestTrace] = None):
+    """Calcule l'embedding de la question et consulte le cache sémantique."""
+    if answer_cache is None:
+        return None, None
+    with span(trace, "embedding"):
+        vector = await run_in_pool(retrieval_executor, embedding_model.embed_query, query)
+    with span(trace, "cache"):
+        return answer_cache.get_semantic(vector, query), vector
+
+# 5. Réponses structurées : les questions factuelles (score, classement,
+# capacité d'un stade, sélectionneur) sont servies depuis les JSON, sans LLM
+def load_structured_data():
+    global intent_router
+    if not SERVER_CONFIG["structured_answers"]:
+        return
+    intent_router = IntentRouter(TournamentIndex(load_data_sources()))
+    print(f"⚡ Réponses structurées : {len(intent_router.index.matches)} matchs, "
+          f"{len(intent_router.index.standings)} groupes, {len(intent_router.index.stadiums)} stades")
+
+answers_served = REGISTRY.counter("rag_answers_total", "Réponses servies par chemin", ["path"])
+
+def degraded_answer(docs) -> str:
+    """Réponse sans LLM : les premiers documents retrouvés, assemblés comme le contexte du prompt."""
+    if not docs:
+        return "Le service de génération est momentanément indisponible, réessayez dans quelques instants."
+    return ("Le service de génération est momentanément indisponible. "
+            "Voici les extraits les plus pertinents trouvés :\n\n"
+            + format_docs(docs[:LLM_CONFIG["degraded_snippets"]]))
+
+def route_structured(query: str):
+    return intent_router.route(query) if intent_router is not None else None
+
+def answer_payload(response: str, path: str, version: str, context: Optional[dict] = None) -> dict:
+    """
+    Corps de réponse de /chat ; `path` indique qui a servi la réponse
+    (structured, cache, rag, degraded), `version` l'index FAISS en service et
+    `context` la taille du contexte RAG.
+    """
+    answers_served.inc(path=path)
+    payload = {"response": response, "path": path, "index_version": version}
+    if context:
+        payload["context"] = context
+    return payload
+
+# Préchauffage : premier embedding (tokenizer, graphe torch), première
+# recherche FAISS/BM25 et premier routage avant d'annoncer /readyz
+WARMUP_QUERY = "Qui a gagné la finale de la CAN 2025 au Maroc ?"
+
+def warmup():
+    for _ in range(2):
+        vector = embedding_model.embed_query(WARMUP_QUERY)
+        format_docs(hybrid_retriever.search(WARMUP_QUERY, vector))
+    route_structured(WARMUP_QUERY)
+
+startup_report = StartupReport()
+startup_report.add("module_import", time.perf_counter() - _import_started)
+startup_stages = [
+    ("imports", import_dependencies),
+    ("model_load", load_models),
+    ("llm_client", load_llm),
+    ("index_load", load_index),
+    ("structured_data", load_structured_data)
+]
+if SERVER_CONFIG["warmup"]:
+    startup_stages.append(("warmup", warmup))
+startup = StartupLoader(startup_stages, startup_report)
+
+def preload_before_fork():
+    """
+    Mode multi-workers : imports et encodeur torch chargés une fois dans le
+    processus parent. Une session onnxruntime crée ses threads dès sa
+    construction et n'est pas sûre à dupliquer : elle est chargée par worker.
+    Aucun encodage n'a lieu avant le fork (préchauffage dans les workers).
+    """
+    stages = ["imports"]
+    if SERVER_CONFIG["preload"] and EMBEDDING_CONFIG["backend"] == "torch":
+        stages.append("model_load")
+    startup.preload(stages)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup.start()
+    yield
+
+app = FastAPI(title="CAN 2025 API", lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # DEV ONLY
+    allow_credentials=False,  # IMPORTANT avec *
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """Identifiant de requête (repris de X-Request-ID ou généré), renvoyé dans la réponse et les logs."""
+    request_id = new_request_id(request.headers.get("X-Request-ID"))
+    token = REQUEST_ID.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        REQUEST_ID.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+@app.get("/healthz")
+async def healthz():
+    """Le processus répond (liveness), même pendant le chargement."""
+    return {"status": "ok"}
 
-rag_chain = (
-    {"context": retriever | format_docs, "question": RunnablePassthrough()}
-    | prompt
-    | llm
-    | StrOutputParser()
+@app.get("/readyz")
+async def readyz():
+    """Modèles, index et préchauffage terminés (readiness) ; 503 sinon."""
+    status = startup.status()
+    if index_reloader.current is not None:
+        status["index_version"] = index_reloader.current.version
+    if llm is not None:
+        # Disjoncteur ouvert : le serveur reste prêt, en mode dégradé
+        status["llm_circuit"] = llm.breaker.state
+    return JSONResponse(status_code=200 if startup.ready else 503, content=status)
+
+def not_ready_response() -> JSONResponse:
+    content = {"response": "Le serveur démarre, réessayez dans quelques instants."}
+    content.update(startup.status())
+    return JSONResponse(status_code=503, content=content, headers={"Retry-After": "2"})
+
+# 6. API Endpoint
+# Nombre de questions traitées en parallèle borné : au-delà, file d'attente
+# puis 429 pour que le client réessaie plutôt que de saturer le worker
+limiter = ConcurrencyLimiter(
+    max_in_flight=SERVER_CONFIG["max_in_flight"],
+    max_queue=SERVER_CONFIG["max_queue"],
+    queue_timeout=SERVER_CONFIG["queue_timeout"]
 )
 
-# 4. API Endpoint
+def busy_response(e: ServerBusy) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={
+            "response": "Le serveur est très sollicité, réessayez dans quelques instants.",
+            "queue_depth": e.queue_depth,
+            "in_flight": e.in_flight
+        },
+        headers={"Retry-After": "1"}
+    )
+
+# Instrumentation : une trace par requête (durée de chaque étape, documents,
+# tokens, erreurs) exposée sur /metrics et en une ligne de log JSON
+configure_json_logs(TRACING_CONFIG["json_logs"])
+profiler = SlowRequestProfiler(
+    threshold_ms=TRACING_CONFIG["profile_slow_ms"],
+    sample_rate=TRACING_CONFIG["profile_sample_rate"],
+    output_dir=TRACING_CONFIG["profile_dir"]
+)
+
+def start_trace(endpoint: str) -> RequestTrace:
+    trace = RequestTrace(endpoint)
+    profiler.start(trace)
+    return trace
+
+def done(trace: RequestTrace, payload: dict) -> dict:
+    trace.finish(200, path=payload["path"])
+    return payload
+
+def error_response(trace: RequestTrace, e: Exception) -> JSONResponse:
+    """502 pour une erreur du LLM, 504 pour un délai dépassé, 500 sinon."""
+    status = error_status(e)
+    trace.finish(status, error=e)
+    return JSONResponse(status_code=status, content={
+        "response": f"Erreur serveur : {str(e)}",
+        "error": type(e).__name__,
+        "request_id": trace.request_id
+    })
+
+def traced_busy_response(trace: RequestTrace, e: ServerBusy) -> JSONResponse:
+    trace.finish(429)
+    return busy_response(e)
+
+# Sessions : historique compact côté serveur, relances réécrites avec les
+# entités du tour précédent et documents réutilisés (voir sessions.py)
+def create_session_store():
+    if not SESSION_CONFIG["enabled"]:
+        return None
+    store = SessionStore(
+        max_sessions=SESSION_CONFIG["max_sessions"],
+        max_bytes=SESSION_CONFIG["max_bytes"],
+        idle_ttl=SESSION_CONFIG["idle_ttl"],
+        history_turns=SESSION_CONFIG["history_turns"],
+        history_max_tokens=SESSION_CONFIG["history_max_tokens"],
+        summary_max_tokens=SESSION_CONFIG["summary_max_tokens"]
+    )
+    REGISTRY.gauge("rag_sessions", "Sessions de conversation en mémoire").set_function(lambda: len(store))
+    REGISTRY.gauge("rag_session_bytes", "Taille estimée des sessions").set_function(lambda: store.size_bytes)
+    return store
+
+session_store = create_session_store()
+
 class Question(BaseModel):
     query: str
+    # Renvoyé par la réponse précédente ; absent pour une nouvelle conversation
+    session_id: Optional[str] = None
+    # Le client suit une conversation : session créée si session_id est absent.
+    # Sans l'un ni l'autre, la question est traitée sans état côté serveur
+    use_session: bool = False
+
+def start_turn(question: Question, generation: IndexGeneration, trace: RequestTrace):
+    """Session de la question et question préparée (réécrite, historique, documents réutilisables)."""
+    if session_store is None or not (question.session_id or question.use_session):
+        return None, PreparedQuestion(question.query, question.query, None, "")
+    with trace.span("session"):
+        session = session_store.get_or_create(question.session_id)
+        turn = session_store.prepare(session, question.query, generation.retriever.analyze, generation.version)
+    trace.fields["session_turn"] = "reused" if turn.docs is not None else "rewritten" if turn.is_rewritten else "new"
+    return session, turn
+
+def end_turn(session: Optional[ChatSession], turn: PreparedQuestion, answer: str, version: str,
+             docs: Optional[List] = None) -> dict:
+    """Enregistre l'échange dans la session ; champs de session de la réponse."""
+    if session is None:
+        return {}
+    session_store.record(session, turn, answer, docs, version)
+    fields = {"session_id": session.id}
+    if turn.is_rewritten:
+        fields["rewritten_query"] = turn.rewritten
+    return fields
+
+def chain_inputs(turn: PreparedQuestion, vector, generation: IndexGeneration, context_stats: dict,
+                 trace: RequestTrace) -> dict:
+    inputs = {"question": turn.rewritten, "vector": vector, "index": generation, "history": turn.history,
+              "retrieved": [], "context_stats": context_stats, "trace": trace}
+    if turn.docs is not None:
+        # Relance sur les mêmes entités : documents du tour précédent, sans nouvelle recherche
+        inputs["docs"] = turn.docs
+    return inputs
+
+# Coalescence : une même question (clé du cache de réponses + version de
+# l'index) posée pendant son calcul rejoint ce calcul, tokens compris, au
+# lieu de relancer recherche et génération (voir coalescing.py)
+flights = SingleFlight()
+
+def flight_key(turn: PreparedQuestion, version: str):
+    """Clé de partage ; None pour une relance, dont la réponse dépend de l'historique."""
+    if not SERVER_CONFIG["coalesce"] or turn.follow_up:
+        return None
+    return normalize_query(turn.rewritten), version
+
+async def compute_answer(turn: PreparedQuestion, generation: IndexGeneration, trace: RequestTrace,
+                         use_cache: bool, publish: Publish) -> dict:
+    """
+    Cache sémantique puis chaîne RAG, tokens publiés au fil de l'eau. Rend
+    la place du limiteur et la génération de l'index empruntées pour le calcul.
+    """
+    try:
+        query = turn.rewritten
+        vector = None
+        if use_cache:
+            cached, vector = await lookup_semantic_cache(query, trace)
+            if cached is not None:
+                await publish(cached)
+                return {"path": "cache", "response": cached, "context": None, "retrieved": None}
+
+        tokens, context_stats = [], {}
+        inputs = chain_inputs(turn, vector, generation, context_stats, trace)
+        try:
+            async for token in rag_chain.astream(inputs, config=trace.llm_config()):
+                if token:
+                    tokens.append(token)
+                    await publish(token)
+        except LLMUnavailable as e:
+            # Mode dégradé, seulement si aucun token n'est encore parti ; pas mis en cache
+            if tokens or not LLM_CONFIG["degraded_answers"]:
+                raise
+            trace.fields["llm_unavailable"] = e.reason
+            response = degraded_answer(inputs["retrieved"])
+            await publish(response)
+            return {"path": "degraded", "response": response, "context": context_stats,
+                    "retrieved": inputs["retrieved"]}
+        response = "".join(tokens)
+        if use_cache:
+            answer_cache.put(query, response, vector, index_version=generation.version)
+        return {"path": "rag", "response": response, "context": context_stats, "retrieved": inputs["retrieved"]}
+    finally:
+        limiter.release()
+        index_reloader.release(generation)
+
+async def answer_flight(turn: PreparedQuestion, generation: IndexGeneration, trace: RequestTrace,
+                        use_cache: bool) -> Flight:
+    """
+    Calcul en cours pour la même question, sinon nouveau calcul après une
+    place du limiteur (ServerBusy si saturé). La clé est réservée avant
+    l'attente : les questions identiques s'y rattachent sans prendre de
+    place et seul le leader peut être refusé (ses rattachées partagent son
+    429). Le calcul garde sa propre
+    génération de l'index et se termine même si le client part.
+    """
+    key = flight_key(turn, generation.version)
+    while True:
+        flight = flights.join(key)
+        if flight is None:
+            break
+        if await flight.started():
+            trace.fields["coalesced"] = True
+            return flight
+        # Leader refusé faute de place : même réponse (429) pour la même
+        # question ; leader parti avant de démarrer : nouvelle tentative
+        if isinstance(flight.error, ServerBusy):
+            raise flight.error
+
+    flight = flights.reserve(key)
+    try:
+        await limiter.acquire()
+    except BaseException as e:
+        await flights.abandon(flight, e)
+        raise
+    index_reloader.acquire(generation)
+    return flights.run(flight, lambda publish: compute_answer(turn, generation, trace, use_cache, publish))
 
 @app.post("/chat")
 async def chat(question: Question):
+    if not startup.ready:
+        return not_ready_response()
+    trace = start_trace("/chat")
+    try:
+        with index_reloader.lease() as generation:
+            version = generation.version
+            session, turn = start_turn(question, generation, trace)
+            query = turn.rewritten
+            with trace.span("route"):
+                structured = route_structured(query)
+            if structured is not None:
+                return done(trace, {**answer_payload(structured.text, "structured", version),
+                                    **end_turn(session, turn, structured.text, version)})
+
+            # Une relance dépend de l'historique : pas de cache de réponses
+            use_cache = answer_cache is not None and not turn.follow_up
+            if use_cache:
+                with trace.span("cache"):
+                    cached = answer_cache.get_exact(query)
+                if cached is not None:
+                    return done(trace, {**answer_payload(cached, "cache", version),
+                                        **end_turn(session, turn, cached, version)})
+
+            flight = await answer_flight(turn, generation, trace, use_cache)
+            result = await flight.wait()
+
+        return done(trace, {**answer_payload(result["response"], result["path"], version, result["context"]),
+                            **end_turn(session, turn, result["response"], version, result["retrieved"])})
+    except ServerBusy as e:
+        return traced_busy_response(trace, e)
+    except Exception as e:
+        return error_response(trace, e)
+
+@app.delete("/chat/session/{session_id}")
+async def delete_session(session_id: str):
+    """Termine une conversation (nouvelle conversation côté client)."""
+    if session_store is None or not session_store.delete(session_id):
+        return JSONResponse(status_code=404, content={"response": "Session inconnue ou expirée."})
+    return {"session_id": session_id, "deleted": True}
+
+@app.post("/chat/stream")
+async def chat_stream(question: Question):
+    """
+    Variante streaming de /chat : les tokens sont émis en Server-Sent Events
+    (`event: token`) dès que Gemini les produit, puis `event: done` avec le
+    chemin qui a servi la réponse, la version de l'index et la session.
+    """
+    if not startup.ready:
+        return not_ready_response()
+    trace = start_trace("/chat/stream")
+    # L'index emprunté reste chargé jusqu'au dernier token
+    generation = index_reloader.acquire()
+    version = generation.version
     try:
-        response = rag_chain.invoke(question.query)
-        return {"response": response}
+        session, turn = start_turn(question, generation, trace)
+        query = turn.rewritten
+        with trace.span("route"):
+            structured = route_structured(query)
+        if structured is not None:
+            index_reloader.release(generation)
+            trace.finish(200, path="structured")
+            return sse_response(single_answer_stream(
+                structured.text, "structured", version, end_turn(session, turn, structured.text, version)))
+
+        use_cache = answer_cache is not None and not turn.follow_up
+        if use_cache:
+            with trace.span("cache"):
+                cached = answer_cache.get_exact(query)
+            if cached is not None:
+                index_reloader.release(generation)
+                trace.finish(200, path="cache")
+                return sse_response(single_answer_stream(
+                    cached, "cache", version, end_turn(session, turn, cached, version)))
+
+        flight = await answer_flight(turn, generation, trace, use_cache)
+    except ServerBusy as e:
+        index_reloader.release(generation)
+        return traced_busy_response(trace, e)
     except Exception as e:
-        return {"response": f"Erreur serveur : {str(e)}"}
+        index_reloader.release(generation)
+        return error_response(trace, e)
+
+    async def event_stream():
+        # Les en-têtes (200) sont déjà partis : une erreur devient un
+        # événement `error`, la trace garde le code qu'aurait eu /chat
+        status, path, error = 200, None, None
+        try:
+            # Calcul partagé : une question rattachée reçoit aussi les tokens déjà émis
+            async for token in flight.stream():
+                yield sse_event({"token": token}, event="token")
+            result = await flight.wait()
+            path = result["path"]
+            answers_served.inc(path=path)
+            done_event = {"path": path, "index_version": version}
+            if result["context"] is not None:
+                done_event["context"] = result["context"]
+            yield sse_event({**done_event, **end_turn(session, turn, result["response"], version,
+                                                      result["retrieved"])}, event="done")
+        except Exception as e:
+            status, error = error_status(e), e
+            yield sse_event({"response": f"Erreur serveur : {str(e)}", "error": type(e).__name__,
+                             "request_id": trace.request_id}, event="error")
+        finally:
+            index_reloader.release(generation)
+            trace.finish(status, path=path, error=error)
+
+    return sse_response(event_stream())
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def single_answer_stream(answer: str, path: str, version: str, session: Optional[dict] = None):
+    """Rejoue une réponse déjà connue (cache, réponse structurée) en un seul token SSE."""
+    answers_served.inc(path=path)
+    yield sse_event({"token": answer}, event="token")
+    yield sse_event({"path": path, "index_version": version, **(session or {})}, event="done")
+
+# 7. Questions par lots : dédoublonnage, un seul encodage et une seule
+# recherche FAISS multi-requêtes, générations via rag_chain.abatch bornées
+# par batch_concurrency. Les gros lots passent en job d'arrière-plan
+batch_jobs = BatchJobStore(ttl_seconds=SERVER_CONFIG["batch_job_ttl"])
+# Un job à la fois : les suivants restent "pending"
+batch_job_slots = asyncio.Semaphore(1)
+batch_tasks = set()
+
+class BatchQuestions(BaseModel):
+    queries: List[str]
+    # true : exécution en arrière-plan, résultats via GET /chat/batch/{job_id}
+    background: bool = False
+
+def error_item(e: Exception, trace: RequestTrace) -> dict:
+    record_error(trace.endpoint, e)
+    return {"error": f"Erreur serveur : {str(e)}", "error_type": type(e).__name__}
+
+async def generate_batch(questions: List[str], vectors: List[List[float]], generation: IndexGeneration,
+                         trace: RequestTrace) -> List[dict]:
+    """Recherche multi-requêtes puis générations parallèles ; une erreur n'affecte que sa question."""
+    with trace.span("retrieval"):
+        docs = await run_in_pool(retrieval_executor, generation.retriever.search_batch, questions, vectors)
+    inputs = [{"question": q, "vector": v, "docs": d, "context_stats": {}, "trace": trace}
+              for q, v, d in zip(questions, vectors, docs)]
+    outputs = await rag_chain.abatch(
+        inputs, config=trace.llm_config(max_concurrency=SERVER_CONFIG["batch_concurrency"]),
+        return_exceptions=True)
+
+    answers = []
+    for item, output in zip(inputs, outputs):
+        if isinstance(output, LLMUnavailable) and LLM_CONFIG["degraded_answers"]:
+            answers.append(answer_payload(degraded_answer(item["docs"]), "degraded", generation.version))
+            continue
+        if isinstance(output, Exception):
+            answers.append(error_item(output, trace))
+            continue
+        if answer_cache is not None:
+            answer_cache.put(item["question"], output, item["vector"], index_version=generation.version)
+        answers.append(answer_payload(output, "rag", generation.version, item["context_stats"]))
+    return answers
+
+async def answer_batch(queries: List[str], trace: RequestTrace) -> List[dict]:
+    """Une réponse ou une erreur par question reçue, dans l'ordre ; les doublons sont traités une fois."""
+    with index_reloader.lease() as generation:
+        return await answer_batch_with(queries, generation, trace)
+
+async def answer_batch_with(queries: List[str], generation: IndexGeneration, trace: RequestTrace) -> List[dict]:
+    version = generation.version
+    unique, positions = dedupe_queries(queries)
+    answers: Dict[int, dict] = {}
+    pending: List[int] = []
+    for i, query in enumerate(unique):
+        try:
+            with trace.span("route"):
+                structured = route_structured(query)
+            if structured is not None:
+                answers[i] = answer_payload(structured.text, "structured", version)
+                continue
+            with trace.span("cache"):
+                cached = answer_cache.get_exact(query) if answer_cache is not None else None
+            if cached is not None:
+                answers[i] = answer_payload(cached, "cache", version)
+                continue
+            pending.append(i)
+        except Exception as e:
+            answers[i] = error_item(e, trace)
+
+    if pending:
+        try:
+            with trace.span("embedding"):
+                vectors = await run_in_pool(retrieval_executor, embedding_model.embed_queries,
+                                            [unique[i] for i in pending])
+            to_generate = []
+            for i, vector in zip(pending, vectors):
+                with trace.span("cache"):
+                    cached = answer_cache.get_semantic(vector, unique[i]) if answer_cache is not None else None
+                if cached is not None:
+                    answers[i] = answer_payload(cached, "cache", version)
+                else:
+                    to_generate.append((i, vector))
+            if to_generate:
+                generated = await generate_batch([unique[i] for i, _ in to_generate],
+                                                 [vector for _, vector in to_generate], generation, trace)
+                answers.update((i, answer) for (i, _), answer in zip(to_generate, generated))
+        except Exception as e:
+            for i in pending:
+                answers.setdefault(i, error_item(e, trace))
+    return [{"query": query, **answers[p]} for query, p in zip(queries, positions)]
+
+async def run_batch_job(job: BatchJob, queries: List[str]):
+    async with batch_job_slots:
+        job.status = "running"
+        # Même request_id que le POST qui a créé le job
+        trace = RequestTrace("/chat/batch/job")
+        results = []
+        try:
+            # Par tranches de batch_max_size : avancement visible, mémoire bornée
+            step = SERVER_CONFIG["batch_max_size"]
+            for start in range(0, len(queries), step):
+                results += await answer_batch(queries[start:start + step], trace)
+                job.completed = len(results)
+        except Exception as e:
+            trace.finish(error_status(e), error=e)
+            batch_jobs.finish(job, error=str(e))
+            return
+        trace.finish(200)
+        batch_jobs.finish(job, results)
+
+@app.post("/chat/batch")
+async def chat_batch(batch: BatchQuestions):
+    """
+    Réponses à une liste de questions. Avec `background`, le lot devient un
+    job (202) dont l'avancement et les résultats se lisent sur
+    GET /chat/batch/{job_id}.
+    """
+    if not startup.ready:
+        return not_ready_response()
+    if not batch.queries:
+        return JSONResponse(status_code=400, content={"response": "Aucune question dans le lot."})
+    limit = SERVER_CONFIG["batch_job_max_size" if batch.background else "batch_max_size"]
+    if len(batch.queries) > limit:
+        hint = "" if batch.background else " (ou background=true)"
+        return JSONResponse(status_code=413,
+                            content={"response": f"Lot de {len(batch.queries)} questions, maximum {limit}{hint}."})
+
+    if batch.background:
+        job = batch_jobs.create(len(batch.queries))
+        task = asyncio.create_task(run_batch_job(job, batch.queries))
+        batch_tasks.add(task)
+        task.add_done_callback(batch_tasks.discard)
+        return JSONResponse(status_code=202, content={**job.as_dict(), "status_url": f"/chat/batch/{job.id}"})
+
+    trace = start_trace("/chat/batch")
+    try:
+        async with limiter.slot():
+            results = await answer_batch(batch.queries, trace)
+    except ServerBusy as e:
+        return traced_busy_response(trace, e)
+    except Exception as e:
+        return error_response(trace, e)
+    trace.finish(200)
+    return {"results": results, "total": len(results)}
+
+@app.get("/chat/batch/{job_id}")
+async def chat_batch_status(job_id: str):
+    job = batch_jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"response": "Job inconnu ou expiré."})
+    return job.as_dict()
+
+# 8. Administration : version de l'index et rechargement à chaud à la demande
+# (après embeddings.py ou download_faiss.py, sans attendre la surveillance)
+def admin_allowed(request: Request) -> bool:
+    token = SERVER_CONFIG["admin_token"]
+    if token:
+        return request.headers.get("X-Admin-Token") == token
+    return request.client is not None and request.client.host in ("127.0.0.1", "::1", "localhost")
+
+@app.get("/admin/index")
+async def admin_index(request: Request):
+    if not admin_allowed(request):
+        return JSONResponse(status_code=403, content={"response": "Accès refusé."})
+    return index_reloader.status()
+
+@app.post("/admin/index/reload")
+async def admin_index_reload(request: Request):
+    """Charge en arrière-plan la version publiée de l'index (202) ; 409 si un chargement est en cours."""
+    if not admin_allowed(request):
+        return JSONResponse(status_code=403, content={"response": "Accès refusé."})
+    if not startup.ready:
+        return not_ready_response()
+    started = index_reloader.reload()
+    return JSONResponse(status_code=202 if started else 409, content=index_reloader.status())
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    if SERVER_CONFIG["workers"] > 1:
+        from workers import serve
+        if session_store is not None:
+            # Le noyau répartit les connexions sans affinité : une relance peut
+            # arriver sur un worker qui ne connaît pas la session
+            print("⚠️ Sessions propres à chaque worker : les relances exigent un répartiteur "
+                  "à affinité (RAG_WORKERS=1 ou RAG_SESSIONS=0 sinon)")
+        serve(app, host="127.0.0.1", port=8000, workers=SERVER_CONFIG["workers"], preload=preload_before_fork)
+    else:
+        import uvicorn
+        uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
@@ -0,0 +1,277 @@
+"""
+Recherche hybride métadonnées + vecteurs pour la chaîne RAG.
+
+1. Analyse de la question : équipes, joueurs, groupes, phases et types de
+   documents détectés (index d'alias, expressions régulières).
+2. Index inversé des métadonnées de l'index FAISS : (facette, valeur) ->
+   positions des vecteurs.
+3. Les entités détectées restreignent l'ensemble candidat avant le calcul
+   de similarité FAISS (IDSelectorBatch), ce qui permet un k plus petit.
+4. Optionnellement, les classements dense (FAISS) et lexical (BM25) sont
+   fusionnés par Reciprocal Rank Fusion.
+"""
+import math
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from langchain_core.documents import Document
+
+from alias_index import TEAM_INDEX, AliasIndex, normalize_key
+from ann_index import search_subset
+from lexical_index import BM25Index
+
+def estimate_tokens(text: str) -> int:
+    """Estimation grossière du nombre de tokens (≈ 4 caractères par token)."""
+    return math.ceil(len(text) / 4)
+
+# ============================================================================
+# ANALYSE DE LA QUESTION
+# ============================================================================
+
+# Ordre important : "demi finale" doit être reconnu avant "finale"
+PHASE_PATTERNS = [
+    ("troisieme_place", r"\b(troisieme place|3e place|petite finale)\b"),
+    ("demi", r"\bdemi\w*( finales?)?\b"),
+    ("quarts", r"\bquarts?( de finale)?\b"),
+    ("huitiemes", r"\b(huitiemes?|8es?)( de finale)?\b"),
+    ("finale", r"\bfinale\b"),
+    ("groupes", r"\bphase de groupes?\b")
+]
+
+GROUP_PATTERN = re.compile(r"\bgroupe ([a-h])\b")
+
+# Mots-clés -> types de documents visés
+TYPE_KEYWORDS = [
+    ({"stadium"}, r"\b(stades?|capacite|enceinte)\b"),
+    ({"standings"}, r"\b(classements?|points?)\b"),
+    ({"team_complete", "team_summary"}, r"\b(selectionneur|entraineur|coach|palmares|effectif)\b"),
+    ({"player"}, r"\b(joueurs?|gardiens?|defenseurs?|attaquants?|milieux? de terrain)\b")
+]
+# Types dont les métadonnées portent un groupe ou une phase (voir MetadataIndex)
+STAGED_TYPES = {"match_detailed", "match_summary", "event", "standings"}
+
+def detect_phases(normalized: str) -> Set[str]:
+    phases = set()
+    text = normalized
+    for phase, pattern in PHASE_PATTERNS:
+        if re.search(pattern, text):
+            phases.add(phase)
+            text = re.sub(pattern, " ", text)
+    return phases
+
+@dataclass
+class QueryAnalysis:
+    teams: List[str] = field(default_factory=list)
+    players: List[str] = field(default_factory=list)
+    groups: Set[str] = field(default_factory=set)
+    phases: Set[str] = field(default_factory=set)
+    doc_types: Set[str] = field(default_factory=set)
+
+    @property
+    def has_entities(self) -> bool:
+        return bool(self.teams or self.players or self.groups or self.phases or self.doc_types)
+
+def analyze_query(query: str, player_index: Optional[AliasIndex] = None) -> QueryAnalysis:
+    """Détecte les entités citées dans une question."""
+    normalized = normalize_key(query)
+    analysis = QueryAnalysis(
+        teams=TEAM_INDEX.find_in_text(query, fuzzy=True),
+        groups={f"groupe {g}" for g in GROUP_PATTERN.findall(normalized)},
+        phases=detect_phases(normalized)
+    )
+    if player_index is not None:
+        analysis.players = player_index.find_in_text(query)
+    for doc_types, pattern in TYPE_KEYWORDS:
+        if re.search(pattern, normalized):
+            analysis.doc_types |= doc_types
+    return analysis
+
+# ============================================================================
+# INDEX INVERSÉ DES MÉTADONNÉES
+# ============================================================================
+
+def phase_of(label: str) -> Optional[str]:
+    """Phase canonique d'une étiquette de métadonnée ("Quarts de finale" -> "quarts")."""
+    phases = detect_phases(normalize_key(label))
+    if not phases and normalize_key(label).startswith("groupe"):
+        return "groupes"
+    return next(iter(phases), None)
+
+def build_player_index(metadatas: Iterable[Dict]) -> AliasIndex:
+    """Index d'alias des joueurs : nom complet et nom de famille s'il est non ambigu."""
+    full_names = sorted({meta["player_name"] for meta in metadatas
+                         if meta.get("type") == "player" and meta.get("player_name")})
+    surnames: Dict[str, List[str]] = defaultdict(list)
+    for name in full_names:
+        parts = name.split()
+        if len(parts) > 1 and len(parts[-1]) >= 4:
+            surnames[normalize_key(parts[-1])].append(name)
+
+    aliases = {name: [name] for name in full_names}
+    for surname, owners in surnames.items():
+        if len(owners) == 1 and TEAM_INDEX.canonical(surname) is None:
+            aliases[owners[0]].append(surname)
+    return AliasIndex(aliases)
+
+class MetadataIndex:
+    """Postings (facette, valeur normalisée) -> positions des vecteurs FAISS."""
+
+    def __init__(self, metadatas: Dict[int, Dict]):
+        self._postings: Dict[tuple, Set[int]] = defaultdict(set)
+        for position, meta in metadatas.items():
+            self._add("type", meta.get("type"), position)
+            for key in ("team_name", "team", "team_home", "team_away"):
+                self._add("team", meta.get(key), position)
+            for team in meta.get("teams", []) or []:
+                self._add("team", team, position)
+            self._add("player", meta.get("player_name"), position)
+            for key in ("group", "phase", "event"):
+                label = meta.get(key)
+                if not label or label == "N/A":
+                    continue
+                if normalize_key(label).startswith("groupe "):
+                    self._add("group", label, position)
+                self._add("phase", phase_of(label), position)
+
+    def _add(self, facet: str, value: Optional[str], position: int):
+        if value and value != "N/A":
+            self._postings[(facet, normalize_key(value))].add(position)
+
+    def lookup(self, facet: str, values) -> Set[int]:
+        result: Set[int] = set()
+        for value in values:
+            result |= self._postings.get((facet, normalize_key(value)), set())
+        return result
+
+    def candidates(self, analysis: QueryAnalysis) -> Optional[Set[int]]:
+        """
+        Ensemble candidat : entités (équipes ∪ joueurs) ∩ groupe/phase ∩ types.
+        Les contraintes sont relâchées de la plus fine à la plus large si
+        l'intersection est vide ; None signifie « pas de filtre ».
+        """
+        constraints = []
+        if analysis.teams or analysis.players:
+            entities = self.lookup("team", analysis.teams) | self.lookup("player", analysis.players)
+            # "Maroc vs Comores" : d'abord les documents qui citent toutes les équipes
+            if len(analysis.teams) > 1:
+                together = set.intersection(*(self.lookup("team", [t]) for t in analysis.teams))
+                entities = together or entities
+            constraints.append(entities)
+        if analysis.groups or analysis.phases:
+            constraints.append(self.lookup("group", analysis.groups) | self.lookup("phase", analysis.phases))
+        if analysis.doc_types:
+            constraints.append(self.lookup("type", analysis.doc_types))
+        constraints = [c for c in constraints if c]
+
+        while constraints:
+            result = set.intersection(*constraints)
+            if result:
+                return result
+            constraints.pop()
+        return None
+
+# ============================================================================
+# RECHERCHE HYBRIDE
+# ============================================================================
+
+def reciprocal_rank_fusion(rankings: List[List[int]], rrf_k: int = 60) -> List[int]:
+    """Fusion RRF : score(d) = somme sur les classements de 1 / (rrf_k + rang)."""
+    scores: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] += 1.0 / (rrf_k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+class HybridRetriever:
+    """
+    Pré-filtre par métadonnées puis similarité FAISS restreinte aux candidats,
+    fusionnée avec le classement BM25 si un index lexical est fourni.
+    """
+
+    def __init__(self, vector_db, k: int = 20, filtered_k: int = 8, metadata_filter: bool = True,
+                 lexical_index: Optional[BM25Index] = None, rrf_k: int = 60):
+        self.vector_db = vector_db
+        self.k = k
+        self.filtered_k = filtered_k
+        self.metadata_filter = metadata_filter
+        self.lexical_index = lexical_index
+        self.rrf_k = rrf_k
+        # Seules les métadonnées sont lues au démarrage : les textes (docstore
+        # mappé) ne sont chargés que pour les documents retournés
+        docstore = vector_db.docstore
+        get_metadata = getattr(docstore, "get_metadata", None) or (lambda doc_id: docstore.search(doc_id).metadata)
+        self.metadata = {
+            position: get_metadata(doc_id)
+            for position, doc_id in vector_db.index_to_docstore_id.items()
+        }
+        self._positions = {doc_id: position for position, doc_id in vector_db.index_to_docstore_id.items()}
+        self.metadata_index = MetadataIndex(self.metadata)
+        self.player_index = build_player_index(self.metadata.values())
+
+    def analyze(self, query: str) -> QueryAnalysis:
+        return analyze_query(query, self.player_index)
+
+    def _plan(self, query: str):
+        """Candidats du pré-filtre (None : tout l'index), k final et profondeur de chaque classement."""
+        candidates = None
+        if self.metadata_filter:
+            candidates = self.metadata_index.candidates(self.analyze(query))
+        k = self.k if candidates is None else min(self.filtered_k, len(candidates))
+        # Avec fusion, chaque classement est plus profond que le k final
+        depth = k if self.lexical_index is None else 2 * k
+        if candidates is not None:
+            depth = min(depth, len(candidates))
+        return candidates, k, depth
+
+    def _subset_ranking(self, query_vector: np.ndarray, candidates: Set[int], depth: int) -> List[int]:
+        ids = np.fromiter(candidates, dtype=np.int64)
+        _, positions = search_subset(self.vector_db.index, query_vector, depth, ids)
+        return [int(p) for p in positions[0] if p != -1]
+
+    def _finish(self, query: str, ranking: List[int], candidates: Optional[Set[int]],
+                k: int, depth: int) -> List[Document]:
+        if self.lexical_index is not None:
+            allowed = None
+            if candidates is not None:
+                allowed = {self.vector_db.index_to_docstore_id[p] for p in candidates}
+            lexical = [self._positions[doc_id] for doc_id, _ in self.lexical_index.search(query, depth, allowed)
+                       if doc_id in self._positions]
+            ranking = reciprocal_rank_fusion([ranking, lexical], self.rrf_k)
+        mapping = self.vector_db.index_to_docstore_id
+        return [self.vector_db.docstore.search(mapping[p]) for p in ranking[:k]]
+
+    def search(self, query: str, vector: List[float]) -> List[Document]:
+        candidates, k, depth = self._plan(query)
+        query_vector = np.asarray([vector], dtype=np.float32)
+        if candidates is None:
+            _, positions = self.vector_db.index.search(query_vector, depth)
+            ranking = [int(p) for p in positions[0] if p != -1]
+        else:
+            ranking = self._subset_ranking(query_vector, candidates, depth)
+        return self._finish(query, ranking, candidates, k, depth)
+
+    def search_batch(self, queries: List[str], vectors: List[List[float]]) -> List[List[Document]]:
+        """
+        Même résultat que `search` pour chaque question. Les questions sans
+        pré-filtre partagent une seule recherche FAISS multi-requêtes ; celles
+        pré-filtrées gardent leur recherche restreinte (un sous-ensemble par
+        question).
+        """
+        plans = [self._plan(query) for query in queries]
+        matrix = np.asarray(vectors, dtype=np.float32)
+        rankings: List[List[int]] = [[] for _ in queries]
+
+        unfiltered = [i for i, (candidates, _, _) in enumerate(plans) if candidates is None]
+        if unfiltered:
+            depth = max(plans[i][2] for i in unfiltered)
+            _, positions = self.vector_db.index.search(matrix[unfiltered], depth)
+            for row, i in enumerate(unfiltered):
+                rankings[i] = [int(p) for p in positions[row][:plans[i][2]] if p != -1]
+        for i, (candidates, _, depth) in enumerate(plans):
+            if candidates is not None:
+                rankings[i] = self._subset_ranking(matrix[i:i + 1], candidates, depth)
+
+        return [self._finish(query, ranking, *plan) for query, ranking, plan in zip(queries, rankings, plans)]
@@ -0,0 +1,98 @@
+"""
+Primitives de service pour l'API CAN 2025 : pool de threads dimensionné
+pour le travail CPU (embedding + FAISS), limiteur de requêtes en vol et
+encodage des événements SSE.
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+# ============================================================================
+# POOL DE THREADS
+# ============================================================================
+
+def create_executor(max_workers: int, name: str = "rag-worker") -> ThreadPoolExecutor:
+    """Crée un pool de threads de taille fixe pour le travail bloquant."""
+    return ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=name)
+
+async def run_in_pool(executor: ThreadPoolExecutor, func: Callable, *args) -> Any:
+    """Exécute une fonction bloquante dans le pool sans bloquer la boucle d'événements."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, func, *args)
+
+# ============================================================================
+# LIMITEUR DE CONCURRENCE (BACKPRESSURE)
+# ============================================================================
+
+class ServerBusy(Exception):
+    """Levée quand la file d'attente est pleine ou que l'attente a expiré."""
+
+    def __init__(self, queue_depth: int, in_flight: int):
+        super().__init__(f"Serveur saturé ({in_flight} en cours, {queue_depth} en attente)")
+        self.queue_depth = queue_depth
+        self.in_flight = in_flight
+
+class ConcurrencyLimiter:
+    """
+    Borne le nombre de requêtes traitées simultanément.
+    Au-delà de `max_in_flight`, les requêtes attendent dans une file de taille
+    `max_queue` pendant au plus `queue_timeout` secondes, sinon ServerBusy.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._in_flight = 0
+        self._waiting = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
+
+    def _busy(self) -> ServerBusy:
+        return ServerBusy(queue_depth=self._waiting, in_flight=self._in_flight)
+
+    async def acquire(self):
+        """Attend une place de traitement ; lève ServerBusy si la file est pleine."""
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            raise self._busy()
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._busy()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+
+    def release(self):
+        """Libère une place obtenue via acquire()."""
+        self._in_flight -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Réserve une place de traitement pour la durée du bloc `async with`."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+# ============================================================================
+# SERVER-SENT EVENTS
+# ============================================================================
+
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Encode un événement SSE ; la charge utile JSON préserve les retours à la ligne."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,272 @@
+"""
+Sessions de conversation côté serveur pour /chat et /chat/stream.
+
+Chaque session garde un historique compact et borné : les N derniers
+échanges tels quels et un résumé glissant des plus anciens (question et
+première phrase de la réponse), dans un budget de tokens. Une relance
+(« et en demi-finale ? ») est réécrite avec les entités du tour précédent
+qu'elle ne nomme pas (équipes, joueurs, groupe, phase, type de document),
+de façon déterministe, sans appel au LLM. Si les entités de la question
+réécrite sont celles du tour précédent, sur la même version de l'index,
+ses documents sont réutilisés au lieu d'une nouvelle recherche.
+
+Les sessions vivent en mémoire du worker : éviction après inactivité
+(TTL), puis LRU au-delà du nombre maximal de sessions ou du plafond
+mémoire.
+"""
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from alias_index import normalize_key
+from metrics import REGISTRY
+from retrieval import STAGED_TYPES, TYPE_KEYWORDS, QueryAnalysis, estimate_tokens
+
+SESSION_EVICTIONS = REGISTRY.counter("rag_session_evictions_total", "Sessions retirées", ["reason"])
+SESSION_TURNS = REGISTRY.counter(
+    "rag_session_turns_total", "Questions posées dans une session, par traitement", ["kind"])
+
+# Relance : commence par une conjonction ou renvoie à ce qui précède
+FOLLOW_UP = re.compile(r"^(et|mais|aussi|puis|alors|ensuite|sinon|pareil)\b|"
+                       r"\b(il|ils|elle|elles|lui|leur|leurs|eux|son|sa|ses|celui|celle|ceux|"
+                       r"ce match|cette equipe|ce joueur|ce stade|cette rencontre)\b")
+_VALID_SESSION_ID = re.compile(r"^[\w.-]{1,64}$")
+# Au plus autant de mots : question trop courte pour se suffire à elle-même
+SHORT_QUESTION_WORDS = 4
+
+PHASE_LABELS = {
+    "troisieme_place": "match pour la troisième place",
+    "demi": "demi-finale",
+    "quarts": "quarts de finale",
+    "huitiemes": "huitièmes de finale",
+    "finale": "finale",
+    "groupes": "phase de groupes"
+}
+
+def first_sentence(text: str, max_chars: int = 200) -> str:
+    sentence = re.split(r"(?<=[.!?])\s", " ".join(text.split()), maxsplit=1)[0]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars - 1] + "…"
+
+def type_terms(normalized: str) -> List[str]:
+    """Mots-clés qui ont désigné un type de document (« sélectionneur », « stade »...)."""
+    terms = []
+    for _, pattern in TYPE_KEYWORDS:
+        found = re.search(pattern, normalized)
+        if found:
+            terms.append(found.group(0))
+    return terms
+
+def entity_key(analysis: QueryAnalysis) -> Tuple:
+    return (tuple(sorted(analysis.teams)), tuple(sorted(analysis.players)), tuple(sorted(analysis.groups)),
+            tuple(sorted(analysis.phases)), tuple(sorted(analysis.doc_types)))
+
+# ============================================================================
+# SESSION
+# ============================================================================
+
+@dataclass
+class Turn:
+    question: str
+    answer: str
+
+@dataclass
+class PreparedQuestion:
+    """Question d'un tour : réécrite si c'est une relance, historique et documents réutilisables."""
+    question: str
+    rewritten: str
+    analysis: Optional[QueryAnalysis]
+    history: str
+    docs: Optional[List[Document]] = None
+    # Relance d'un échange précédent : la réponse dépend de l'historique
+    follow_up: bool = False
+
+    @property
+    def is_rewritten(self) -> bool:
+        return self.rewritten != self.question
+
+@dataclass
+class ChatSession:
+    id: str
+    max_turns: int
+    summary: List[str] = field(default_factory=list)
+    turns: Deque[Turn] = field(default_factory=deque)
+    # Tour précédent : analyse de la question réécrite, mots qui ont nommé
+    # ses entités, documents retrouvés et version de l'index
+    analysis: Optional[QueryAnalysis] = None
+    terms: Dict[str, List[str]] = field(default_factory=dict)
+    docs: Optional[List[Document]] = None
+    index_version: Optional[str] = None
+    last_used: float = 0.0
+    size: int = 0
+
+    def compute_size(self) -> int:
+        """Estimation en octets (textes de l'historique et des documents gardés)."""
+        size = sum(len(line) for line in self.summary)
+        size += sum(len(t.question) + len(t.answer) for t in self.turns)
+        size += sum(len(d.page_content) for d in self.docs or [])
+        self.size = size
+        return size
+
+class SessionStore:
+    """
+    Sessions en mémoire, LRU + TTL d'inactivité, plafond en nombre et en
+    octets. `analyze` détecte les entités d'une question
+    (HybridRetriever.analyze).
+    """
+
+    def __init__(self, max_sessions: int, max_bytes: int, idle_ttl: float, history_turns: int,
+                 history_max_tokens: int, summary_max_tokens: int,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.history_turns = history_turns
+        self.history_max_tokens = history_max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self._clock = clock
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get_or_create(self, session_id: Optional[str]) -> ChatSession:
+        """
+        Session existante, ou nouvelle session. Un identifiant inconnu
+        (expiré, autre worker) est repris tel quel, sans historique.
+        """
+        if session_id and not _VALID_SESSION_ID.match(session_id):
+            session_id = None
+        with self._lock:
+            self._prune()
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = ChatSession(id=session_id or uuid.uuid4().hex, max_turns=self.history_turns)
+                self._sessions[session.id] = session
+            self._sessions.move_to_end(session.id)
+            session.last_used = self._clock()
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id not in self._sessions:
+                return False
+            self._remove(session_id, reason="deleted")
+            return True
+
+    # ------------------------------------------------------------------
+    # Tour de conversation
+    # ------------------------------------------------------------------
+
+    def prepare(self, session: ChatSession, question: str, analyze: Callable[[str], QueryAnalysis],
+                index_version: str) -> PreparedQuestion:
+        """Réécrit une relance, rend l'historique et les documents du tour précédent s'ils restent valables."""
+        analysis = analyze(question)
+        rewritten = question
+        follow_up = bool(session.turns) and self._is_follow_up(question)
+        if follow_up and session.analysis is not None:
+            inherited = self._inherited_terms(session, analysis)
+            if inherited:
+                rewritten = f"{question} ({', '.join(inherited)})"
+                analysis = analyze(rewritten)
+
+        docs = None
+        if (session.docs is not None and session.index_version == index_version
+                and analysis.has_entities and entity_key(analysis) == entity_key(session.analysis)):
+            docs = session.docs
+        SESSION_TURNS.inc(kind="reused" if docs is not None else "rewritten" if rewritten != question else "new")
+        return PreparedQuestion(question, rewritten, analysis, self.render_history(session), docs, follow_up)
+
+    def record(self, session: ChatSession, prepared: PreparedQuestion, answer: str,
+               docs: Optional[List[Document]], index_version: str):
+        """Ajoute l'échange ; les tours sortis de la fenêtre passent dans le résumé."""
+        with self._lock:
+            session.turns.append(Turn(prepared.question, answer))
+            while len(session.turns) > session.max_turns:
+                old = session.turns.popleft()
+                session.summary.append(f"- {old.question} → {first_sentence(old.answer)}")
+            while session.summary and estimate_tokens("\n".join(session.summary)) > self.summary_max_tokens:
+                session.summary.pop(0)
+            session.analysis = prepared.analysis
+            normalized = normalize_key(prepared.rewritten)
+            session.terms = {
+                "teams": prepared.analysis.teams,
+                "players": prepared.analysis.players,
+                "groups": [g.title() for g in prepared.analysis.groups],
+                "phases": [PHASE_LABELS[p] for p in sorted(prepared.analysis.phases) if p in PHASE_LABELS],
+                "doc_types": type_terms(normalized)
+            }
+            session.docs = docs
+            session.index_version = index_version
+            session.last_used = self._clock()
+            if session.id in self._sessions:
+                self._bytes -= session.size
+                self._bytes += session.compute_size()
+                self._evict()
+
+    def render_history(self, session: ChatSession) -> str:
+        """Résumé puis derniers échanges, les plus anciens retirés d'abord au-delà du budget."""
+        turns = [f"Utilisateur : {t.question}\nAssistant : {t.answer}" for t in session.turns]
+        while True:
+            parts = []
+            if session.summary:
+                parts.append("Plus tôt :\n" + "\n".join(session.summary))
+            parts += turns
+            text = "\n\n".join(parts)
+            if len(turns) <= 1 or estimate_tokens(text) <= self.history_max_tokens:
+                return text
+            turns.pop(0)
+
+    def _is_follow_up(self, question: str) -> bool:
+        normalized = normalize_key(question)
+        return bool(FOLLOW_UP.search(normalized)) or len(normalized.split()) <= SHORT_QUESTION_WORDS
+
+    @staticmethod
+    def _inherited_terms(session: ChatSession, analysis: QueryAnalysis) -> List[str]:
+        """Entités du tour précédent que la relance ne remplace pas."""
+        inherited = []
+        if not (analysis.teams or analysis.players):
+            inherited += session.terms.get("teams", []) + session.terms.get("players", [])
+        # "et ses joueurs ?" après une demi-finale : joueurs et stades n'ont pas de phase
+        staged = not analysis.doc_types or bool(analysis.doc_types & STAGED_TYPES)
+        if not (analysis.groups or analysis.phases) and staged:
+            inherited += session.terms.get("groups", []) + session.terms.get("phases", [])
+        if not analysis.doc_types:
+            inherited += session.terms.get("doc_types", [])
+        return inherited
+
+    # ------------------------------------------------------------------
+    # Éviction
+    # ------------------------------------------------------------------
+
+    def _remove(self, session_id: str, reason: str):
+        session = self._sessions.pop(session_id)
+        self._bytes -= session.size
+        SESSION_EVICTIONS.inc(reason=reason)
+
+    def _prune(self):
+        now = self._clock()
+        # Ordre LRU : les sessions inactives sont en tête
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used <= self.idle_ttl:
+                break
+            self._remove(session.id, reason="idle")
+        self._evict()
+
+    def _evict(self):
+        while len(self._sessions) > self.max_sessions:
+            self._remove(next(iter(self._sessions)), reason="lru")
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            self._remove(next(iter(self._sessions)), reason="memory")
@@ -0,0 +1,109 @@
+"""
+Démarrage différé du serveur : les étapes lourdes (imports, modèles, index
+FAISS, préchauffage) s'exécutent dans un thread de fond pendant que l'API
+répond déjà à /healthz. /readyz ne passe à 200 qu'une fois toutes les
+étapes terminées, préchauffage compris : la première vraie requête ne
+tombe jamais sur un chemin froid.
+"""
+import asyncio
+import threading
+import time
+import traceback
+from typing import Callable, Dict, List, Optional, Tuple
+
+class StartupReport:
+    """Durée de chaque étape du démarrage, dans l'ordre d'exécution."""
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+        self._origin = time.perf_counter()
+
+    def add(self, name: str, seconds: float):
+        self.stages.append((name, seconds))
+
+    @property
+    def total(self) -> float:
+        return sum(seconds for _, seconds in self.stages)
+
+    def as_dict(self) -> Dict:
+        return {
+            "stages": {name: round(seconds, 3) for name, seconds in self.stages},
+            "total_seconds": round(self.total, 3)
+        }
+
+    def render(self) -> str:
+        lines = ["⏱️ Rapport de démarrage :"]
+        lines += [f"  {name:<20}{seconds * 1000:>9.0f} ms" for name, seconds in self.stages]
+        lines.append(f"  {'total':<20}{self.total * 1000:>9.0f} ms")
+        return "\n".join(lines)
+
+class StartupLoader:
+    """
+    Exécute des étapes (nom, fonction) dans l'ordre, dans un thread de fond.
+    États : pending -> loading -> ready | failed.
+    """
+
+    def __init__(self, stages: List[Tuple[str, Callable[[], None]]], report: Optional[StartupReport] = None):
+        self.stages = stages
+        self.report = report or StartupReport()
+        self.state = "pending"
+        self.current_stage: Optional[str] = None
+        self.error: Optional[str] = None
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def start(self) -> threading.Thread:
+        """Lance le chargement en arrière-plan (idempotent)."""
+        if self._thread is None:
+            self.state = "loading"
+            self._thread = threading.Thread(target=self.run, name="rag-startup", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def preload(self, names: List[str]):
+        """
+        Exécute tout de suite, dans le thread appelant, les premières étapes
+        si elles figurent dans `names` (ex: avant le fork des workers) ;
+        start() ne relance que les suivantes.
+        """
+        while self.stages and self.stages[0][0] in names:
+            name, func = self.stages.pop(0)
+            start = time.perf_counter()
+            func()
+            self.report.add(name, time.perf_counter() - start)
+
+    def run(self):
+        try:
+            for name, func in self.stages:
+                self.current_stage = name
+                start = time.perf_counter()
+                func()
+                self.report.add(name, time.perf_counter() - start)
+        except Exception as e:
+            self.state = "failed"
+            self.error = f"{self.current_stage}: {e}"
+            print(f"❌ Échec du démarrage ({self.current_stage}) : {e}")
+            traceback.print_exc()
+            return
+        self.current_stage = None
+        self.state = "ready"
+        self._ready.set()
+        print(self.report.render())
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Attend la fin du chargement sans bloquer la boucle d'événements."""
+        return await asyncio.get_running_loop().run_in_executor(None, self._ready.wait, timeout)
+
+    def status(self) -> Dict:
+        status = {"status": self.state}
+        if self.current_stage:
+            status["stage"] = self.current_stage
+        if self.error:
+            status["error"] = self.error
+        if self.report.stages:
+            status["startup"] = self.report.as_dict()
+        return status
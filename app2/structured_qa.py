@@ -0,0 +1,257 @@
+"""
+Réponses factuelles directes depuis les sources JSON, sans appel au LLM.
+
+1. TournamentIndex : moteur de requête en mémoire sur matchs, classements,
+   stades et sélectionneurs, indexé par équipe, numéro de match, groupe,
+   phase, date et stade.
+2. IntentRouter : reconnaît les questions factuelles (score, classement,
+   capacité d'un stade, sélectionneur) et y répond de façon déterministe ;
+   None pour les questions ouvertes, qui passent par la chaîne RAG.
+"""
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from alias_index import TEAM_INDEX, AliasIndex, normalize_key
+from load_docs import _ranking_rows, build_team_tables, normalize_team_name
+from retrieval import GROUP_PATTERN, detect_phases, phase_of
+
+MONTHS = ["janvier", "fevrier", "mars", "avril", "mai", "juin", "juillet",
+          "aout", "septembre", "octobre", "novembre", "decembre"]
+
+MATCH_NUMBER = re.compile(r"\bmatch (?:n |numero |no )?(\d{1,2})\b")
+DATE_PATTERN = re.compile(r"\b(\d{1,2}) (" + "|".join(MONTHS) + r")\b")
+STADIUM_PREFIX = re.compile(r"^(grand stade de |grand stade |stade |complexe sportif )", re.IGNORECASE)
+
+# Questions ouvertes : toujours traitées par la chaîne RAG
+OPEN_ENDED = re.compile(r"\b(pourquoi|comment|analyse\w*|compar\w*|expliqu\w*|pronostic\w*|predi\w*|"
+                        r"favoris?|meilleur\w*|avis|penses?|resume\w*|raconte\w*|histoire|parcours)\b")
+STANDINGS_KEYWORDS = re.compile(r"\b(classements?|classes?|premiers?|deuxiemes?|derniers?|points?|leader)\b")
+COACH_KEYWORDS = re.compile(r"\b(selectionneurs?|entraineurs?|coachs?)\b")
+CAPACITY_KEYWORDS = re.compile(r"\b(capacite|places|spectateurs|contenance|combien de personnes)\b")
+# "où" seul est trop ambigu une fois les accents retirés ("ou" : conjonction)
+MATCH_KEYWORDS = re.compile(r"\b(scores?|resultats?|gagne\w*|vainqueurs?|perdu|quand|dates?|heure|horaire|"
+                            r"ou se (?:joue\w*|deroule\w*)|ou (?:a|aura) lieu|stades?|lieu|affiche|matchs?|"
+                            r"joue\w*|buteurs?|buts?|marque\w*)\b")
+# Les JSON ne décrivent que la CAN 2025 (décembre 2025 - janvier 2026) : une
+# autre année ou une question sur le passé ("ancien", "depuis"...) passe par la chaîne RAG
+TOURNAMENT_YEARS = {"2025", "2026"}
+YEAR_PATTERN = re.compile(r"\b(?:19|20)\d{2}\b")
+HISTORY_QUALIFIERS = re.compile(r"\b(ancien\w*|precedent\w*|editions?|depuis|historique\w*|records?|"
+                                r"carriere|autrefois)\b")
+
+def _match_number(match: Dict) -> Optional[int]:
+    found = re.search(r"\d+", match.get("match_n", ""))
+    return int(found.group()) if found else None
+
+def _date_key(text: str) -> Optional[Tuple[int, str]]:
+    found = DATE_PATTERN.search(normalize_key(text or ""))
+    return (int(found.group(1)), found.group(2)) if found else None
+
+def _stadium_name(label: str) -> str:
+    """"Stade Ibn-Batouta,Tanger" -> "Stade Ibn-Batouta"."""
+    return (label or "").split(",")[0].strip()
+
+@dataclass
+class StructuredAnswer:
+    text: str
+    intent: str
+
+# ============================================================================
+# MOTEUR DE REQUÊTE
+# ============================================================================
+
+class TournamentIndex:
+    """Index en mémoire des sources JSON (format de config.FILES)."""
+
+    def __init__(self, data_sources: Dict[str, List[Dict]]):
+        self.matches = [m for m in data_sources.get("matches", []) if "equipe_domicile" in m]
+        self.by_number: Dict[int, Dict] = {}
+        self.by_team: Dict[str, List[Dict]] = defaultdict(list)
+        self.by_group: Dict[str, List[Dict]] = defaultdict(list)
+        self.by_phase: Dict[str, List[Dict]] = defaultdict(list)
+        self.by_date: Dict[Tuple[int, str], List[Dict]] = defaultdict(list)
+        self.by_stadium: Dict[str, List[Dict]] = defaultdict(list)
+
+        for match in self.matches:
+            number = _match_number(match)
+            if number is not None:
+                self.by_number.setdefault(number, match)
+            for side in ("equipe_domicile", "equipe_exterieur"):
+                self.by_team[normalize_team_name(match.get(side, ""))].append(match)
+            etape = match.get("etape", "")
+            if normalize_key(etape).startswith("groupe "):
+                self.by_group[normalize_key(etape)].append(match)
+            phase = phase_of(etape) or phase_of(match.get("phase", ""))
+            if phase:
+                self.by_phase[phase].append(match)
+            date = _date_key(match.get("date", ""))
+            if date:
+                self.by_date[date].append(match)
+            self.by_stadium[normalize_key(_stadium_name(match.get("stade", "")))].append(match)
+
+        self.standings = {normalize_key(g.get("Nom_Groupe", "")): g for g in data_sources.get("standings", [])}
+        self.group_of_team = {
+            normalize_team_name(row.get("Equipe", "")): normalize_key(row["Nom_Groupe"])
+            for row in _ranking_rows(data_sources.get("standings", []))
+        }
+        self.team_tables = build_team_tables(data_sources)
+
+        self.stadiums = {s.get("Stade", ""): s for s in data_sources.get("stadiums", []) if s.get("Stade")}
+        self.stadium_index = self._build_stadium_index()
+
+    def _build_stadium_index(self) -> AliasIndex:
+        """Alias des stades : nom complet, nom sans "Stade", ville si elle n'a qu'un stade."""
+        cities: Dict[str, List[str]] = defaultdict(list)
+        for name, stadium in self.stadiums.items():
+            cities[normalize_key(stadium.get("Ville", ""))].append(name)
+        aliases = {}
+        for name, stadium in self.stadiums.items():
+            names = [name]
+            short = STADIUM_PREFIX.sub("", name)
+            if short != name and len(short) >= 4:
+                names.append(short)
+            city = stadium.get("Ville", "")
+            if city and len(cities[normalize_key(city)]) == 1 and TEAM_INDEX.canonical(city) is None:
+                names.append(city)
+            aliases[name] = names
+        return AliasIndex(aliases)
+
+    def find_matches(self, number: Optional[int] = None, teams: Optional[List[str]] = None,
+                     group: Optional[str] = None, phases: Optional[Set[str]] = None,
+                     date: Optional[Tuple[int, str]] = None, stadium: Optional[str] = None) -> List[Dict]:
+        """Intersection des index pour chaque critère fourni, dans l'ordre des matchs."""
+        constraints = []
+        if number is not None:
+            constraints.append([self.by_number[number]] if number in self.by_number else [])
+        for team in teams or []:
+            constraints.append(self.by_team.get(team, []))
+        if group:
+            constraints.append(self.by_group.get(normalize_key(group), []))
+        if phases:
+            constraints.append([m for p in phases for m in self.by_phase.get(p, [])])
+        if date:
+            constraints.append(self.by_date.get(date, []))
+        if stadium:
+            constraints.append(self.by_stadium.get(normalize_key(stadium), []))
+        if not constraints:
+            return []
+
+        selected = set.intersection(*(set(map(id, c)) for c in constraints))
+        return [m for m in self.matches if id(m) in selected]
+
+# ============================================================================
+# FORMATAGE DES RÉPONSES
+# ============================================================================
+
+def format_match_answer(match: Dict) -> str:
+    home, away = match.get("equipe_domicile", "N/A"), match.get("equipe_exterieur", "N/A")
+    score = (match.get("score") or "").strip()
+    played = bool(re.search(r"\d", score))
+    stage = " - ".join(p for p in (match.get("phase"), match.get("etape")) if p)
+
+    text = f"**{match.get('match_n', 'Match')}** ({stage}) : "
+    text += f"{home} {score} {away}\n" if played else f"{home} vs {away} (pas encore joué)\n"
+    text += f"📅 {match.get('date', 'N/A')} · 🏟️ {match.get('stade', 'N/A')}"
+
+    scorers = [f"{b.get('joueur')} {b.get('minute')}' ({home})" for b in match.get("buteurs_domicile", [])]
+    scorers += [f"{b.get('joueur')} {b.get('minute')}' ({away})" for b in match.get("buteurs_exterieur", [])]
+    if scorers:
+        text += f"\n⚽ Buteurs : {', '.join(scorers)}"
+    return text
+
+def format_standings_answer(group: Dict) -> str:
+    lines = [f"📊 Classement du {group.get('Nom_Groupe', 'groupe')} :"]
+    for row in group.get("Classement", []):
+        lines.append(
+            f"{row.get('Rang', '')}. {row.get('Equipe', 'N/A')} — {row.get('Pts', '0')} pts "
+            f"({row.get('Gagnes', '0')}V {row.get('Nuls', '0')}N {row.get('Perdus', '0')}D, "
+            f"diff. {row.get('Diff', '0')})"
+        )
+    return "\n".join(lines)
+
+def format_coach_answer(team: str, coach: Dict) -> str:
+    text = f"👔 Le sélectionneur de {team} est **{coach.get('selectionneur', 'N/A')}**"
+    if coach.get("categorie"):
+        text += f" ({coach['categorie']})"
+    return text + "."
+
+def format_stadium_answer(stadium: Dict) -> str:
+    return (f"🏟️ Le **{stadium.get('Stade', 'N/A')}** ({stadium.get('Ville', 'N/A')}) "
+            f"a une capacité de {stadium.get('Capacité', 'N/A')} spectateurs.")
+
+# ============================================================================
+# ROUTEUR D'INTENTIONS
+# ============================================================================
+
+class IntentRouter:
+    """Répond aux questions factuelles depuis TournamentIndex, None sinon."""
+
+    # Au-delà, la question est trop large pour une réponse factuelle (ex: "matchs du Maroc")
+    max_listed_matches = 4
+
+    def __init__(self, index: TournamentIndex):
+        self.index = index
+
+    def route(self, query: str) -> Optional[StructuredAnswer]:
+        normalized = normalize_key(query)
+        if (not self.index.matches and not self.index.stadiums) or OPEN_ENDED.search(normalized):
+            return None
+        if self._out_of_scope(normalized):
+            return None
+
+        teams = TEAM_INDEX.find_in_text(query, fuzzy=True)
+        groups = [f"groupe {g}" for g in GROUP_PATTERN.findall(normalized)]
+
+        if STANDINGS_KEYWORDS.search(normalized):
+            answer = self._standings(groups, teams)
+            if answer:
+                return answer
+        if COACH_KEYWORDS.search(normalized) and len(teams) == 1:
+            coach = self.index.team_tables.get(teams[0], {}).get("coach")
+            if coach:
+                return StructuredAnswer(format_coach_answer(teams[0], coach), "coach")
+        stadiums = self.index.stadium_index.find_in_text(query)
+        if CAPACITY_KEYWORDS.search(normalized) and len(stadiums) == 1:
+            return StructuredAnswer(format_stadium_answer(self.index.stadiums[stadiums[0]]), "stadium")
+        if MATCH_KEYWORDS.search(normalized):
+            return self._match(normalized, teams, groups, stadiums)
+        return None
+
+    @staticmethod
+    def _out_of_scope(normalized: str) -> bool:
+        """Qualificatif que les tables ne savent pas traiter ("sélectionneur du Sénégal en 2019")."""
+        if any(year not in TOURNAMENT_YEARS for year in YEAR_PATTERN.findall(normalized)):
+            return True
+        return bool(HISTORY_QUALIFIERS.search(normalized))
+
+    def _standings(self, groups: List[str], teams: List[str]) -> Optional[StructuredAnswer]:
+        if not groups and len(teams) == 1:
+            groups = [self.index.group_of_team.get(teams[0], "")]
+        if len(groups) != 1 or groups[0] not in self.index.standings:
+            return None
+        return StructuredAnswer(format_standings_answer(self.index.standings[groups[0]]), "standings")
+
+    def _match(self, normalized: str, teams: List[str], groups: List[str],
+               stadiums: List[str]) -> Optional[StructuredAnswer]:
+        number = MATCH_NUMBER.search(normalized)
+        # "groupes" reste une contrainte : phase_of("Groupe X") range ces matchs dans by_phase
+        phases = detect_phases(normalized)
+        date = _date_key(normalized)
+        if not (number or teams or phases or date):
+            return None
+
+        matches = self.index.find_matches(
+            number=int(number.group(1)) if number else None,
+            teams=teams,
+            group=groups[0] if len(groups) == 1 else None,
+            phases=phases,
+            date=date,
+            stadium=stadiums[0] if len(stadiums) == 1 else None
+        )
+        # Plusieurs matchs d'une seule équipe sans autre critère : question trop ouverte
+        too_broad = len(matches) > 1 and len(teams) < 2 and not (phases or date)
+        if not matches or len(matches) > self.max_listed_matches or too_broad:
+            return None
+        return StructuredAnswer("\n\n".join(format_match_answer(m) for m in matches), "match")
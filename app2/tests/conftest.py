@@ -0,0 +1,5 @@
+"""Les tests importent les modules de app2 comme le serveur (lancé depuis app2)."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,41 @@
+"""Cache de réponses : le niveau sémantique ne confond pas deux questions d'entités ou de nombres différents."""
+import numpy as np
+
+from answer_cache import AnswerCache, query_numbers
+from retrieval import analyze_query
+from sessions import entity_key
+
+def signature(query: str):
+    return entity_key(analyze_query(query)), query_numbers(query)
+
+def make_cache(**kwargs) -> AnswerCache:
+    return AnswerCache(max_entries=100, max_bytes=1 << 20, ttl_seconds=3600, semantic_threshold=0.9,
+                       index_version="v1", **kwargs)
+
+# Deux questions presque identiques pour l'encodeur : même vecteur
+VECTOR = np.ones(8, dtype=np.float32)
+
+def test_numbers_must_match():
+    cache = make_cache(signature=signature)
+    cache.put("question unique numero 1 sur le Maroc", "réponse 1", VECTOR)
+    assert cache.get_semantic(VECTOR, "question unique numero 2 sur le Maroc") is None
+    assert cache.get_semantic(VECTOR, "Question unique numéro 1 sur le Maroc ?") == "réponse 1"
+
+def test_entities_must_match():
+    cache = make_cache(signature=signature)
+    cache.put("Quel est le sélectionneur du Maroc ?", "Walid Regragui", VECTOR)
+    assert cache.get_semantic(VECTOR, "Quel est le sélectionneur du Sénégal ?") is None
+    assert cache.get_semantic(VECTOR, "Qui est le sélectionneur du Maroc") == "Walid Regragui"
+
+def test_best_entry_with_matching_signature_wins():
+    cache = make_cache(signature=signature)
+    closer = VECTOR.copy()
+    closer[0] += 0.1
+    cache.put("Score du match 1", "2-0", VECTOR)
+    cache.put("Score du match 2", "1-1", closer)
+    assert cache.get_semantic(closer, "Score du match 1") == "2-0"
+
+def test_default_signature_compares_numbers():
+    cache = make_cache()
+    cache.put("Qui a gagné la CAN 2023 ?", "Côte d'Ivoire", VECTOR)
+    assert cache.get_semantic(VECTOR, "Qui a gagné la CAN 2025 ?") is None
@@ -0,0 +1,94 @@
+"""Coalescence des questions identiques face au limiteur de concurrence (rag_chain.answer_flight)."""
+import asyncio
+
+import pytest
+
+import rag_chain as server
+from index_reload import IndexGeneration
+from serving import ConcurrencyLimiter, ServerBusy
+from sessions import PreparedQuestion
+from tracing import RequestTrace
+
+class StubChain:
+    """Chaîne RAG simulée : quelques tokens après un délai, appels comptés."""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls = 0
+
+    async def astream(self, inputs, config=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        for token in ("Réponse ", "à ", inputs["question"]):
+            yield token
+
+@pytest.fixture
+def chain(monkeypatch):
+    stub = StubChain()
+    monkeypatch.setattr(server, "rag_chain", stub)
+    monkeypatch.setitem(server.SERVER_CONFIG, "coalesce", True)
+    # Chaque test installe son limiteur (créé dans sa boucle) ; restauré ensuite
+    monkeypatch.setattr(server, "limiter", server.limiter)
+    return stub
+
+async def ask(question: str, generation: IndexGeneration):
+    turn = PreparedQuestion(question, question, None, "")
+    flight = await server.answer_flight(turn, generation, RequestTrace("/chat"), use_cache=False)
+    return await flight.wait()
+
+async def burst(questions: list, max_in_flight: int, max_queue: int):
+    generation = IndexGeneration("v1", "/tmp/index", retriever=None)
+    server.limiter = ConcurrencyLimiter(max_in_flight=max_in_flight, max_queue=max_queue, queue_timeout=5)
+    results = await asyncio.gather(*(ask(q, generation) for q in questions), return_exceptions=True)
+    return results, generation
+
+def test_identical_burst_takes_one_slot(chain):
+    results, generation = asyncio.run(burst(["Qui a gagné la CAN 2025 ?"] * 200, max_in_flight=1, max_queue=0))
+    busy = [r for r in results if isinstance(r, ServerBusy)]
+    assert not busy
+    assert chain.calls == 1
+    assert {r["response"] for r in results} == {"Réponse à Qui a gagné la CAN 2025 ?"}
+    assert server.limiter.in_flight == 0
+    assert generation.users == 0
+
+def test_only_leaders_are_rejected(chain):
+    questions = [f"Question {i % 4} sur le Maroc" for i in range(200)]
+
+    async def scenario():
+        generation = IndexGeneration("v1", "/tmp/index", retriever=None)
+        server.limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=1, queue_timeout=5)
+        # Place occupée : un seul leader tient dans la file, les 3 autres sont refusés
+        await server.limiter.acquire()
+        asyncio.get_running_loop().call_later(0.05, server.limiter.release)
+        return await asyncio.gather(*(ask(q, generation) for q in questions), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    rejected = {q for q, r in zip(questions, results) if isinstance(r, ServerBusy)}
+    answered = [r for r in results if isinstance(r, dict)]
+    assert chain.calls == 1
+    assert len(rejected) == 3
+    # Les rattachées de la question admise n'ont pris aucune place : toutes servies
+    assert len(answered) == 50
+    assert server.limiter.in_flight == 0
+    assert not server.flights._flights
+
+def test_followers_survive_a_leader_leaving(chain):
+
+    async def scenario():
+        generation = IndexGeneration("v1", "/tmp/index", retriever=None)
+        server.limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=4, queue_timeout=5)
+        blocker = asyncio.create_task(ask("question longue", generation))
+        await asyncio.sleep(0.01)
+        # Le leader attend sa place puis se déconnecte ; sa rattachée reprend le calcul
+        leader = asyncio.create_task(ask("Où joue le Maroc ?", generation))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(ask("où joue le maroc", generation))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(blocker, leader, follower, return_exceptions=True)
+
+    blocker, leader, follower = asyncio.run(scenario())
+    assert isinstance(blocker, dict)
+    assert isinstance(leader, asyncio.CancelledError)
+    assert follower["response"] == "Réponse à où joue le maroc"
+    assert chain.calls == 2
@@ -0,0 +1,21 @@
+"""Docstore mappé de l'index FAISS."""
+import pytest
+from langchain_core.documents import Document
+
+from docstore import MmapDocstore, ReadOnlyDocstore, write_docstore
+
+def test_roundtrip_and_read_only(tmp_path):
+    documents = [Document(id="a", page_content="Maroc 2 - 0 Comores", metadata={"type": "match_summary"}),
+                 Document(id="b", page_content="", metadata={"type": "stadium"})]
+    write_docstore(str(tmp_path), documents)
+    store = MmapDocstore(str(tmp_path))
+
+    assert len(store) == 2
+    assert store.search("a").page_content == "Maroc 2 - 0 Comores"
+    assert store.search("b").metadata == {"type": "stadium"}
+    assert store.search("z") == "ID z not found."
+
+    with pytest.raises(ReadOnlyDocstore, match="lecture seule"):
+        store.add({"c": Document(page_content="nouveau")})
+    with pytest.raises(PermissionError):
+        store.delete(["a"])
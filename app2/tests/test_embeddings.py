@@ -0,0 +1,25 @@
+"""Ré-indexation incrémentale (embeddings.update_index)."""
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+import embeddings
+from benchmarks.stubs import HashingEmbeddings
+from index_store import content_hash
+
+def doc(doc_id, text):
+    return Document(id=doc_id, page_content=text, metadata={"type": "test"})
+
+def test_sources_changed_between_passes(tmp_path, monkeypatch):
+    indexed = [doc("a", "Maroc - Comores 2-0"), doc("b", "Groupe A")]
+    vector_db = FAISS.from_documents(indexed, HashingEmbeddings(), ids=["a", "b"])
+    manifest = {"documents": {d.id: content_hash(d) for d in indexed}}
+
+    # Entre le premier passage (empreintes) et le second, "b" change et "c" apparaît
+    current = [indexed[0], doc("b", "Groupe A (mis à jour)"), doc("c", "Finale")]
+    monkeypatch.setattr(embeddings, "iter_can2025_documents", lambda verbose=False: iter(current))
+    hashes, settings = embeddings.update_index(vector_db, manifest, str(tmp_path))
+
+    assert hashes == {d.id: content_hash(d) for d in current}
+    assert settings["type"] == "flat"
+    assert vector_db.index.ntotal == 3
+    assert vector_db.docstore.search("b").page_content == "Groupe A (mis à jour)"
@@ -0,0 +1,63 @@
+"""Publication atomique d'une version de l'index à côté de l'index livré."""
+import os
+
+from index_store import active_index_dir, current_link, publish_index, versions_dir
+
+def make_index(path, content):
+    os.makedirs(path)
+    with open(os.path.join(path, "index.faiss"), "w") as f:
+        f.write(content)
+
+def read_index(path):
+    with open(os.path.join(path, "index.faiss")) as f:
+        return f.read()
+
+def test_seed_index_is_never_moved(tmp_path):
+    seed = str(tmp_path / "faiss_index_can2025")
+    make_index(seed, "seed")
+    assert active_index_dir(seed) == seed
+
+    staging = str(tmp_path / "staging-1")
+    make_index(staging, "v1")
+    publish_index(staging, seed, "v1")
+
+    # L'index suivi par git reste un dossier intact ; le lien publié est à côté
+    assert os.path.isdir(seed) and not os.path.islink(seed)
+    assert read_index(seed) == "seed"
+    assert active_index_dir(seed) == current_link(seed)
+    assert read_index(active_index_dir(seed)) == "v1"
+    assert os.listdir(versions_dir(seed)) == ["v1"]
+
+def test_republish_and_prune(tmp_path):
+    seed = str(tmp_path / "faiss_index_can2025")
+    make_index(seed, "seed")
+    for version in ("v1", "v2", "v3"):
+        staging = str(tmp_path / f"staging-{version}")
+        make_index(staging, version)
+        publish_index(staging, seed, version, keep=2)
+    assert read_index(active_index_dir(seed)) == "v3"
+    assert sorted(os.listdir(versions_dir(seed))) == ["v2", "v3"]
+
+    # Même version republiée : le dossier actif (peut-être mappé) est gardé tel quel
+    staging = str(tmp_path / "staging-again")
+    make_index(staging, "autre contenu")
+    publish_index(staging, seed, "v3", keep=2)
+    assert read_index(active_index_dir(seed)) == "v3"
+    assert not os.path.exists(staging)
+    assert read_index(seed) == "seed"
+
+def test_reloader_follows_published_version(tmp_path):
+    from index_reload import IndexReloader
+
+    seed = str(tmp_path / "faiss_index_can2025")
+    make_index(seed, "seed")
+    reloader = IndexReloader(seed, loader=read_index)
+    reloader.load()
+    assert reloader.current.retriever == "seed"
+
+    staging = str(tmp_path / "staging-1")
+    make_index(staging, "v1")
+    publish_index(staging, seed, "v1")
+    assert reloader.fingerprint() != reloader._fingerprint
+    reloader.load()
+    assert reloader.current.retriever == "v1"
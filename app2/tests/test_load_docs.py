@@ -0,0 +1,12 @@
+"""Documents produits à partir des sources JSON."""
+from benchmarks.synthetic import generate_tournament
+from load_docs import build_team_tables, format_team_complete
+
+def test_team_document_has_no_standings():
+    data = generate_tournament()
+    tables = build_team_tables(data)
+    text = format_team_complete("Maroc", tables)
+    # Le classement vit dans les documents "standings", pas dans la fiche équipe
+    assert "PHASE DE GROUPES" not in text
+    assert "SÉLECTIONNEUR" in text and "EFFECTIF COMPLET" in text
+    assert set(tables["Maroc"]) == {"team", "coach", "squad"}
@@ -0,0 +1,88 @@
+"""
+Parité des encodeurs torch (sentence-transformers) et ONNX : mêmes vecteurs
+à `onnx_min_cosine` près et même top-k sur un petit corpus fixe. Utilise
+l'export de EMBEDDING_CONFIG["onnx_dir"], sinon en produit un si torch et
+transformers sont installés ; ignoré sans ces dépendances ou sans le
+modèle en cache local (aucun téléchargement pendant les tests).
+"""
+import os
+
+import numpy as np
+import pytest
+
+from config import EMBEDDING_CONFIG, EMBEDDING_MODEL
+from query_encoder import MODEL_FILES, OnnxEmbeddings, export_onnx, read_encoder_meta
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+pytest.importorskip("sentence_transformers")
+langchain_huggingface = pytest.importorskip("langchain_huggingface")
+
+QUERIES = [
+    "Qui a gagné la finale de la CAN 2025 au Maroc ?",
+    "Score Maroc Comores",
+    "Quel est le classement du groupe A ?",
+    "Qui est le sélectionneur du Sénégal ?",
+    "Capacité du stade Prince Moulay Abdellah",
+    "Achraf Hakimi",
+]
+CORPUS = [
+    "Match d'ouverture : Maroc 2 - 0 Comores au stade Prince Moulay Abdellah de Rabat.",
+    "Finale de la CAN 2025 : Sénégal contre Maroc au stade Prince Moulay Abdellah.",
+    "Classement du Groupe A : Maroc 7 pts, Mali 5 pts, Zambie 2 pts, Comores 1 pt.",
+    "Classement du Groupe C : Nigeria 9 pts, Tunisie 4 pts, Tanzanie 2 pts, Ouganda 1 pt.",
+    "Sénégal : sélectionneur Pape Thiaw, entraîneur local.",
+    "Maroc : sélectionneur Walid Regragui, palmarès 1976.",
+    "Stade Prince Moulay Abdellah, Rabat : capacité 69 500 spectateurs.",
+    "Grand Stade de Tanger : capacité 75 600 spectateurs.",
+    "Achraf Hakimi, défenseur du Maroc, joue au Paris Saint-Germain.",
+    "Sadio Mané, attaquant du Sénégal, joue à Al-Nassr.",
+    "Demi-finale : Nigeria 1 - 1 Maroc, qualification aux tirs au but.",
+    "Huitièmes de finale : Égypte 3 - 1 Bénin à Agadir.",
+]
+TOP_K = 5
+
+@pytest.fixture(scope="module", autouse=True)
+def model_available():
+    if os.path.isdir(EMBEDDING_MODEL):
+        return
+    from huggingface_hub import try_to_load_from_cache
+    if not isinstance(try_to_load_from_cache(EMBEDDING_MODEL, "config.json"), str):
+        pytest.skip(f"{EMBEDDING_MODEL} absent du cache Hugging Face local")
+
+@pytest.fixture(scope="module")
+def onnx_dir(tmp_path_factory):
+    configured = EMBEDDING_CONFIG["onnx_dir"]
+    if read_encoder_meta(configured).get("model") == EMBEDDING_MODEL:
+        return configured
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    directory = str(tmp_path_factory.mktemp("onnx"))
+    export_onnx(EMBEDDING_MODEL, directory, QUERIES + CORPUS, EMBEDDING_CONFIG["onnx_min_cosine"])
+    return directory
+
+@pytest.fixture(scope="module")
+def reference():
+    torch_model = langchain_huggingface.HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    return (np.asarray(torch_model.embed_documents(QUERIES), dtype=np.float32),
+            np.asarray(torch_model.embed_documents(CORPUS), dtype=np.float32))
+
+def top_k(queries: np.ndarray, corpus: np.ndarray) -> list:
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    return np.argsort(-(queries @ corpus.T), axis=1, kind="stable")[:, :TOP_K].tolist()
+
+@pytest.mark.parametrize("int8", sorted(MODEL_FILES))
+def test_onnx_matches_torch(onnx_dir, reference, int8):
+    variant = "int8" if int8 else "fp32"
+    if variant not in read_encoder_meta(onnx_dir).get("parity", {}):
+        pytest.skip(f"variante {variant} écartée à l'export")
+    encoder = OnnxEmbeddings(onnx_dir, EMBEDDING_MODEL, int8=int8)
+    queries, corpus = encoder.encode(QUERIES), encoder.encode(CORPUS)
+    torch_queries, torch_corpus = reference
+
+    vectors, torch_vectors = np.vstack([queries, corpus]), np.vstack([torch_queries, torch_corpus])
+    cosines = (vectors * torch_vectors).sum(axis=1) / (
+        np.linalg.norm(vectors, axis=1) * np.linalg.norm(torch_vectors, axis=1))
+    assert cosines.min() >= EMBEDDING_CONFIG["onnx_min_cosine"]
+    assert top_k(queries, corpus) == top_k(torch_queries, torch_corpus)
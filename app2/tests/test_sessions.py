@@ -0,0 +1,60 @@
+"""Relances de session : réécriture et réutilisation des documents du tour précédent."""
+from langchain_core.documents import Document
+
+from retrieval import analyze_query
+from sessions import SessionStore
+
+SEMI_FINAL_DOCS = [Document(page_content="Demi-finale : Maroc 2 - 1 Nigeria", metadata={"type": "match_summary"})]
+
+def make_store() -> SessionStore:
+    return SessionStore(max_sessions=10, max_bytes=1 << 20, idle_ttl=3600, history_turns=4,
+                        history_max_tokens=1000, summary_max_tokens=200)
+
+def ask(store, session, question, docs=None):
+    turn = store.prepare(session, question, analyze_query, "v1")
+    store.record(session, turn, "réponse", docs if docs is not None else turn.docs, "v1")
+    return turn
+
+def test_same_entities_reuse_documents():
+    store = make_store()
+    session = store.get_or_create(None)
+    ask(store, session, "Le Maroc en demi-finale", SEMI_FINAL_DOCS)
+    turn = ask(store, session, "et le score ?")
+    assert turn.docs is SEMI_FINAL_DOCS
+
+def test_players_follow_up_searches_again():
+    store = make_store()
+    session = store.get_or_create(None)
+    ask(store, session, "Le Maroc en demi-finale", SEMI_FINAL_DOCS)
+    turn = store.prepare(session, "et ses joueurs ?", analyze_query, "v1")
+    assert turn.docs is None
+    assert "player" in turn.analysis.doc_types
+    assert turn.analysis.teams == ["Maroc"]
+    # Les fiches joueurs n'ont pas de phase : la demi-finale n'est pas héritée
+    assert not turn.analysis.phases
+
+def test_new_index_version_searches_again():
+    store = make_store()
+    session = store.get_or_create(None)
+    ask(store, session, "Le Maroc en demi-finale", SEMI_FINAL_DOCS)
+    assert store.prepare(session, "et le score ?", analyze_query, "v2").docs is None
+
+def test_stateless_questions_create_no_session(monkeypatch):
+    import rag_chain as server
+    from index_reload import IndexGeneration
+    from tracing import RequestTrace
+
+    class Retriever:
+        analyze = staticmethod(analyze_query)
+
+    store = make_store()
+    monkeypatch.setattr(server, "session_store", store)
+    generation = IndexGeneration("v1", "/tmp/index", Retriever())
+    session, turn = server.start_turn(server.Question(query="Le Maroc en demi-finale"), generation,
+                                      RequestTrace("/chat"))
+    assert session is None and turn.history == ""
+    assert len(store) == 0
+
+    session, _ = server.start_turn(server.Question(query="Le Maroc en demi-finale", use_session=True),
+                                   generation, RequestTrace("/chat"))
+    assert session is not None and len(store) == 1
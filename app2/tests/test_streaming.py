@@ -0,0 +1,69 @@
+"""/chat/stream : tokens en Server-Sent Events, puis `done` ; 429 avant tout en-tête si le serveur est saturé."""
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import rag_chain as server
+from index_reload import IndexGeneration
+from retrieval import analyze_query
+from serving import ConcurrencyLimiter, ServerBusy
+
+TOKENS = ["La ", "finale ", "a ", "lieu ", "à ", "Rabat."]
+
+class StubChain:
+    async def astream(self, inputs, config=None):
+        for token in TOKENS:
+            yield token
+
+class StubRetriever:
+    analyze = staticmethod(analyze_query)
+
+@pytest.fixture
+def client(monkeypatch):
+    ready = threading.Event()
+    ready.set()
+    monkeypatch.setattr(server.startup, "_ready", ready)
+    monkeypatch.setattr(server.index_reloader, "_current", IndexGeneration("v1", "/tmp/index", StubRetriever()))
+    monkeypatch.setattr(server, "rag_chain", StubChain())
+    monkeypatch.setattr(server, "answer_cache", None)
+    monkeypatch.setattr(server, "intent_router", None)
+    monkeypatch.setattr(server, "limiter", ConcurrencyLimiter(max_in_flight=4, max_queue=4, queue_timeout=5))
+    # Sans `with` : pas de démarrage (modèles, index) pour ces tests
+    return TestClient(server.app)
+
+def parse_events(text: str) -> list:
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+def test_tokens_then_done(client):
+    response = client.post("/chat/stream", json={"query": "Où a lieu la finale ?"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_events(response.text)
+    assert [data["token"] for event, data in events if event == "token"] == TOKENS
+    event, done = events[-1]
+    assert event == "done"
+    assert done["path"] == "rag" and done["index_version"] == "v1"
+    assert "session_id" not in done
+    assert server.index_reloader.current.users == 0
+
+def test_session_id_in_done_event(client):
+    response = client.post("/chat/stream", json={"query": "Où a lieu la finale ?", "use_session": True})
+    event, done = parse_events(response.text)[-1]
+    assert event == "done" and done["session_id"]
+
+def test_busy_before_headers(client, monkeypatch):
+    async def busy():
+        raise ServerBusy(queue_depth=4, in_flight=4)
+
+    monkeypatch.setattr(server.limiter, "acquire", busy)
+    response = client.post("/chat/stream", json={"query": "Où a lieu la finale ?"})
+    assert response.status_code == 429
+    assert response.headers["retry-after"]
+    assert server.index_reloader.current.users == 0
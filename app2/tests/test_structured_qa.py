@@ -0,0 +1,52 @@
+"""Routage des questions factuelles (structured_qa.IntentRouter) sur un tournoi synthétique."""
+import pytest
+
+from benchmarks.synthetic import generate_tournament
+from structured_qa import IntentRouter, TournamentIndex
+
+@pytest.fixture(scope="module")
+def data():
+    return generate_tournament()
+
+@pytest.fixture(scope="module")
+def router(data):
+    return IntentRouter(TournamentIndex(data))
+
+def intent(router, query):
+    answer = router.route(query)
+    return answer.intent if answer else None
+
+@pytest.mark.parametrize("query, expected", [
+    ("Quel est le sélectionneur du Sénégal ?", "coach"),
+    ("Classement du groupe A", "standings"),
+    ("Capacité du Stade 1", "stadium"),
+    ("Score du match 1", "match"),
+    ("Score du match 1 de la CAN 2025", "match"),
+    ("Où a lieu le match 3 ?", "match"),
+])
+def test_factual_questions(router, query, expected):
+    assert intent(router, query) == expected
+
+def test_where_is_played(router, data):
+    match = data["matches"][0]
+    answer = router.route(f"Où se joue {match['equipe_domicile']} - {match['equipe_exterieur']} ?")
+    assert answer.intent == "match"
+    assert match["stade"] in answer.text
+
+@pytest.mark.parametrize("query", [
+    # "ou" conjonction : pas une question de lieu
+    "Maroc ou Burkina Faso ?",
+    # Autre édition ou question sur le passé : les tables ne décrivent que la CAN 2025
+    "Sélectionneur du Sénégal en 2019",
+    "Ancien sélectionneur du Sénégal",
+    "Score du Maroc à la CAN 2019",
+    "Pourquoi le Maroc est favori ?",
+])
+def test_falls_back_to_rag(router, query):
+    assert router.route(query) is None
+
+def test_group_stage_keeps_phase_constraint(router, data):
+    team = data["matches"][0]["equipe_domicile"]
+    answer = router.route(f"Résultats du {team} en phase de groupes")
+    assert answer is not None
+    assert "Groupe" in answer.text
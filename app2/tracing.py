@@ -0,0 +1,251 @@
+"""
+Instrumentation du chemin de requête : identifiant de requête, durée de
+chaque étape (routage, cache, embedding, recherche, contexte, LLM), nombre
+de documents et de tokens, usage de tokens du LLM et classes d'erreurs.
+
+Chaque étape alimente un histogramme de /metrics dès qu'elle se termine ;
+la requête complète produit une ligne de log JSON. Un profileur
+échantillonneur optionnel (pyinstrument) enregistre les requêtes lentes.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from metrics import REGISTRY
+
+STAGE_SECONDS = REGISTRY.histogram("rag_stage_seconds", "Durée de chaque étape du pipeline RAG", ["stage"])
+REQUEST_SECONDS = REGISTRY.histogram("rag_request_seconds", "Durée des requêtes", ["endpoint", "status"])
+RETRIEVED_DOCUMENTS = REGISTRY.histogram(
+    "rag_retrieved_documents", "Documents retrouvés par question", buckets=(0, 1, 2, 5, 10, 20, 50))
+CONTEXT_TOKENS = REGISTRY.histogram(
+    "rag_context_tokens", "Tokens de contexte estimés par question, avant et après assemblage", ["stage"],
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000))
+LLM_TOKENS = REGISTRY.counter("rag_llm_tokens_total", "Tokens facturés par le LLM", ["kind"])
+ERRORS = REGISTRY.counter("rag_errors_total", "Erreurs par endpoint et classe d'exception", ["endpoint", "error"])
+
+# Identifiant de la requête HTTP en cours (en-tête X-Request-ID)
+REQUEST_ID: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_VALID_REQUEST_ID = re.compile(r"^[\w.-]{1,64}$")
+
+def new_request_id(header: Optional[str] = None) -> str:
+    """Reprend l'identifiant fourni par le client s'il est raisonnable, sinon en génère un."""
+    if header and _VALID_REQUEST_ID.match(header):
+        return header
+    return uuid.uuid4().hex
+
+def error_status(e: BaseException) -> int:
+    """Code HTTP d'une exception : 504 délai dépassé, 502 erreur du LLM, 500 sinon."""
+    # Exception qui porte son code (ex: llm_client.LLMUnavailable)
+    status = getattr(e, "http_status", None)
+    if isinstance(status, int):
+        return status
+    if isinstance(e, (TimeoutError, asyncio.TimeoutError)):
+        return 504
+    if type(e).__module__.startswith(("google.", "langchain_google_genai")):
+        return 502
+    return 500
+
+def record_error(endpoint: str, e: BaseException):
+    ERRORS.inc(endpoint=endpoint, error=type(e).__name__)
+
+# ============================================================================
+# LOGS JSON
+# ============================================================================
+
+request_logger = logging.getLogger("rag.requests")
+
+def configure_json_logs(enabled: bool):
+    """Une ligne JSON par requête sur la sortie standard (sans préfixe de format)."""
+    request_logger.disabled = not enabled
+    if enabled and not request_logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        request_logger.addHandler(handler)
+        request_logger.setLevel(logging.INFO)
+        request_logger.propagate = False
+
+# ============================================================================
+# TRACE D'UNE REQUÊTE
+# ============================================================================
+
+class RequestTrace:
+    """
+    Mesures d'une requête. `span` peut être appelé depuis les threads du pool
+    de recherche ; les durées d'une même étape s'additionnent (lots).
+    """
+
+    def __init__(self, endpoint: str, request_id: Optional[str] = None):
+        self.endpoint = endpoint
+        self.request_id = request_id or REQUEST_ID.get() or new_request_id()
+        self.started = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self.fields: Dict[str, Any] = {}
+        self.finished = False
+        self._lock = threading.Lock()
+        self._profile = None
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(stage, time.perf_counter() - start)
+
+    def add_span(self, stage: str, seconds: float):
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        with self._lock:
+            self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def add_tokens(self, kind: str, count: int):
+        LLM_TOKENS.inc(count, kind=kind)
+        with self._lock:
+            key = f"llm_{kind}_tokens"
+            self.fields[key] = self.fields.get(key, 0) + count
+
+    def record_context(self, stats: Optional[Dict]):
+        """Tailles du contexte d'une question (voir format_docs)."""
+        if not stats:
+            return
+        RETRIEVED_DOCUMENTS.observe(stats["documents_in"])
+        CONTEXT_TOKENS.observe(stats["tokens_in"], stage="retrieved")
+        CONTEXT_TOKENS.observe(stats["tokens_out"], stage="packed")
+        with self._lock:
+            for key in ("documents_in", "documents_out", "tokens_in", "tokens_out"):
+                self.fields[f"context_{key}"] = self.fields.get(f"context_{key}", 0) + stats[key]
+
+    def llm_config(self, **config) -> Dict:
+        """Config LangChain qui rattache les appels LLM à cette trace."""
+        return {**config, "callbacks": [LLMUsageCallback(self)]}
+
+    def finish(self, status: int, path: Optional[str] = None, error: Optional[BaseException] = None) -> float:
+        """Clôt la trace (une seule fois) : histogramme de la requête, erreurs et ligne de log."""
+        if self.finished:
+            return 0.0
+        self.finished = True
+        duration = time.perf_counter() - self.started
+        REQUEST_SECONDS.observe(duration, endpoint=self.endpoint, status=str(status))
+        if error is not None:
+            record_error(self.endpoint, error)
+        if self._profile is not None:
+            self._profile(self, duration)
+
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "request_id": self.request_id,
+            "endpoint": self.endpoint,
+            "status": status,
+            "duration_ms": round(duration * 1000, 1),
+            "spans_ms": {stage: round(seconds * 1000, 1) for stage, seconds in self.spans.items()}
+        }
+        if path:
+            entry["path"] = path
+        if error is not None:
+            entry["error"] = type(error).__name__
+            entry["message"] = str(error)[:200]
+        entry.update(self.fields)
+        request_logger.info(json.dumps(entry, ensure_ascii=False))
+        return duration
+
+def span(trace: Optional[RequestTrace], stage: str):
+    """`trace.span(stage)`, sans effet hors requête (préchauffage, benchmarks)."""
+    return trace.span(stage) if trace is not None else nullcontext()
+
+class LLMUsageCallback(BaseCallbackHandler):
+    """Durée de chaque appel LLM, délai avant le premier token et tokens facturés."""
+
+    run_inline = True
+
+    def __init__(self, trace: RequestTrace):
+        self.trace = trace
+        self._started: Dict[Any, float] = {}
+        self._first_token: set = set()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token: str, *, run_id, **kwargs):
+        if run_id not in self._first_token and run_id in self._started:
+            self._first_token.add(run_id)
+            self.trace.add_span("llm_first_token", time.perf_counter() - self._started[run_id])
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start = self._started.pop(run_id, None)
+        self._first_token.discard(run_id)
+        if start is not None:
+            self.trace.add_span("llm", time.perf_counter() - start)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.trace.add_tokens("input", usage.get("input_tokens", 0))
+                    self.trace.add_tokens("output", usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error: BaseException, *, run_id, **kwargs):
+        start = self._started.pop(run_id, None)
+        self._first_token.discard(run_id)
+        if start is not None:
+            self.trace.add_span("llm", time.perf_counter() - start)
+
+# ============================================================================
+# PROFILAGE DES REQUÊTES LENTES
+# ============================================================================
+
+class SlowRequestProfiler:
+    """
+    Profileur échantillonneur (pyinstrument, optionnel) du thread de la boucle
+    d'événements, démarré pour une fraction `sample_rate` des requêtes. Le
+    profil n'est écrit dans `output_dir` que si la requête dépasse
+    `threshold_ms`. Un seul profil à la fois : pyinstrument ne sait pas
+    imbriquer deux profileurs sur un même thread.
+    """
+
+    def __init__(self, threshold_ms: float, sample_rate: float = 1.0, output_dir: str = "profiles"):
+        self.threshold = threshold_ms / 1000
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.enabled = threshold_ms > 0
+        self._active = False
+        if self.enabled:
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                print("⚠️ Profilage des requêtes lentes désactivé : pip install pyinstrument")
+                self.enabled = False
+
+    def start(self, trace: RequestTrace):
+        """À appeler dans le thread de la boucle d'événements, au début du traitement."""
+        if not self.enabled or self._active or random.random() >= self.sample_rate:
+            return
+        from pyinstrument import Profiler
+        profiler = Profiler(interval=0.005, async_mode="disabled")
+        profiler.start()
+        self._active = True
+
+        def stop(trace: RequestTrace, duration: float):
+            self._active = False
+            profiler.stop()
+            if duration < self.threshold:
+                return
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"{trace.endpoint.strip('/').replace('/', '_')}-{trace.request_id}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_text(unicode=True, show_all=False))
+            trace.fields["profile"] = path
+
+        trace._profile = stop
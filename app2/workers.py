@@ -0,0 +1,112 @@
+"""
+Serveur pré-forké pour l'API CAN 2025 : un socket d'écoute ouvert par le
+processus parent, partagé par N workers uvicorn forkés.
+
+Le parent exécute avant le fork les étapes de démarrage sans état
+dangereux à dupliquer (imports, poids de l'encodeur torch) : leurs pages
+restent partagées en copie sur écriture. Tout ce qui crée des threads ou des
+connexions (client Gemini, session onnxruntime, pool OpenMP lors du premier
+encodage, pool de threads de recherche) n'est créé que dans les workers.
+L'index FAISS est mappé en lecture seule par chaque worker
+(RAG_MMAP_INDEX) : une seule copie dans le cache de pages.
+
+Le parent ne sert aucune requête ; il relance un worker mort et propage
+SIGTERM/SIGINT à tous les workers. Linux/macOS uniquement (os.fork).
+"""
+import os
+import signal
+import socket
+import time
+import traceback
+from typing import Callable, Dict, Optional
+
+# Un worker mort plus tôt que ce délai après son lancement est relancé avec
+# une pause, pour ne pas boucler sur un démarrage qui échoue
+MIN_UPTIME = 5.0
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Socket TCP en écoute, hérité par les workers."""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+class PreforkServer:
+    """
+    `workers` processus uvicorn servant `app` sur un même socket.
+    `preload` s'exécute une fois dans le parent, avant le premier fork.
+    """
+
+    def __init__(self, app, host: str, port: int, workers: int,
+                 preload: Optional[Callable[[], None]] = None, log_level: str = "info"):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.preload = preload
+        self.log_level = log_level
+        self.children: Dict[int, float] = {}
+        self._sock: Optional[socket.socket] = None
+        self._stopping = False
+
+    def _serve(self):
+        """Corps d'un worker : uvicorn sur le socket hérité."""
+        import uvicorn
+        # uvicorn installe ses propres gestionnaires (arrêt gracieux)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        config = uvicorn.Config(self.app, host=self.host, port=self.port, log_level=self.log_level)
+        uvicorn.Server(config).run(sockets=[self._sock])
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._serve()
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+        return pid
+
+    def stop(self, signum=None, frame=None):
+        """Arrête les workers ; chacun termine ses requêtes en cours."""
+        self._stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        self._sock = bind_socket(self.host, self.port)
+        if self.preload is not None:
+            self.preload()
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.workers):
+            self.spawn()
+        print(f"👷 {self.workers} workers sur http://{self.host}:{self.port} (parent {os.getpid()})")
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.pop(pid, None)
+            if started is None or self._stopping:
+                continue
+            print(f"⚠️ Worker {pid} arrêté (code {os.waitstatus_to_exitcode(status)}), relance")
+            if time.monotonic() - started < MIN_UPTIME:
+                time.sleep(1)
+            if not self._stopping:
+                self.spawn()
+        self._sock.close()
+
+def serve(app, host: str, port: int, workers: int, preload: Optional[Callable[[], None]] = None):
+    PreforkServer(app, host, port, workers, preload).run()
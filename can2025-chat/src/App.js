@@ -13,7 +13,10 @@ const ChatInterface = () => {
   ]);
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  const [isStreaming, setIsStreaming] = useState(false);
   const messagesEndRef = useRef(null);
+  // Session côté serveur (historique de la conversation), renvoyée par `done`
+  const sessionIdRef = useRef(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -37,6 +40,60 @@ const ChatInterface = () => {
     { text: "Informations sur le Gabon", icon: <Sparkles className="w-3 h-3" /> }
   ];
 
+  // Ajoute un fragment de texte au dernier message (réponse en cours de streaming)
+  const appendToLastMessage = (text) => {
+    setMessages(prev => {
+      const last = prev[prev.length - 1];
+      return [...prev.slice(0, -1), { ...last, content: last.content + text }];
+    });
+  };
+
+  // Lit le flux SSE de /chat/stream et affiche les tokens au fil de l'eau
+  const readEventStream = async (response) => {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let started = false;
+
+    // Le message assistant n'apparaît qu'avec le premier token
+    const emit = (text) => {
+      if (!started) {
+        started = true;
+        setIsStreaming(true);
+        setMessages(prev => [...prev, { role: 'assistant', content: text }]);
+      } else {
+        appendToLastMessage(text);
+      }
+    };
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+      for (const rawEvent of events) {
+        let eventName = 'message';
+        let data = '';
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event:')) eventName = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+        }
+        if (!data) continue;
+        const payload = JSON.parse(data);
+        if (eventName === 'token') {
+          emit(payload.token);
+        } else if (eventName === 'done') {
+          if (payload.session_id) sessionIdRef.current = payload.session_id;
+        } else if (eventName === 'error') {
+          emit(`\n\n${payload.response || 'Désolé, une erreur est survenue.'}`);
+        }
+      }
+    }
+    if (!started) emit('Désolé, une erreur est survenue.');
+  };
+
   const handleSend = async () => {
     if (!input.trim() || isLoading) return;
     const userMessage = { role: 'user', content: input };
@@ -45,16 +102,20 @@ const ChatInterface = () => {
     setIsLoading(true);
 
     try {
-      const response = await fetch('http://127.0.0.1:8000/chat', {
+      const response = await fetch('http://127.0.0.1:8000/chat/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ query: input }),
+        body: JSON.stringify({ query: input, session_id: sessionIdRef.current, use_session: true }),
       });
-      const data = await response.json();
-      setMessages(prev => [...prev, {
-        role: 'assistant',
-        content: data.response || 'Désolé, une erreur est survenue.'
-      }]);
+      if (!response.ok || !response.body) {
+        const data = await response.json().catch(() => ({}));
+        setMessages(prev => [...prev, {
+          role: 'assistant',
+          content: data.response || 'Désolé, une erreur est survenue.'
+        }]);
+        return;
+      }
+      await readEventStream(response);
     } catch (error) {
       setMessages(prev => [...prev, {
         role: 'assistant',
@@ -62,6 +123,7 @@ const ChatInterface = () => {
       }]);
     } finally {
       setIsLoading(false);
+      setIsStreaming(false);
     }
   };
 
@@ -126,7 +188,7 @@ const ChatInterface = () => {
             </div>
           ))}
           
-          {isLoading && (
+          {isLoading && !isStreaming && (
             <div className="flex justify-start">
               <div className="bg-white rounded-2xl rounded-bl-none p-4 shadow-sm border border-gray-100 flex items-center gap-3">
                 <Loader2 className="w-5 h-5 animate-spin text-[#004d3d]" />